@@ -1,9 +1,19 @@
+import asyncio
+import inspect
+import time
 from abc import ABC, abstractmethod
+from typing import Callable
 from ai.base_model import BaseAIModel
-from ai.message import AgentMessage
-from ai.tool_definitions import Tool, ToolCall, ToolResult
+from ai.blobs import get_blob_store
+from ai.cancellation import CancelToken, StreamLimits
+from ai.inference import PROFILES, InferenceProfile
+from ai.message import AgentMessage, MessageHistory
+from ai.tool_definitions import Tool, ToolCall, ToolResult, validate_tool_arguments
+from ai.tool_loops import ToolLoopDetector
+from ai.tracing import span
 from program_state import ProgramState
 from tools import TOOLS
+from tools.encoding import DEFAULT_TOKEN_BUDGET, FileReadLedger, PageStore
 from tools.todos import ToDoItem
 
 
@@ -11,8 +21,20 @@ class BaseAgent(ABC):
     def __init__(self, ai_model: BaseAIModel, tools: list[Tool]) -> None:
         self.model = ai_model
         self.tools = [tool.model_dump() for tool in tools]
-        self.messages: list[AgentMessage] = []
+        self.messages: list[AgentMessage] = MessageHistory(blobs=get_blob_store())
         self.todos: list[ToDoItem] = []
+        self.stream_limits = StreamLimits(max_seconds=600, max_tokens=4096)
+        # Model settings for each phase: "gating", "todo" and "review"
+        self.profiles: dict[str, InferenceProfile] = dict(PROFILES)
+        self._cancel_token: CancelToken | None = None
+        # Longer tool results are paged, the model can ask for the rest
+        self.tool_output_budget = DEFAULT_TOKEN_BUDGET
+        self.pages = PageStore()
+        self.file_reads = FileReadLedger()
+        self.tool_loops = ToolLoopDetector(telemetry=ai_model.telemetry)
+        # Progress goes to stdout, and to listeners such as the review server
+        self.verbose = True
+        self.listeners: list[Callable[[str, dict], None]] = []
 
     @abstractmethod
     async def invoke(
@@ -20,6 +42,46 @@ class BaseAgent(ABC):
     ) -> ProgramState:
         pass
 
+    def _emit(self, event: str, **data) -> None:
+        for listener in self.listeners:
+            listener(event, data)
+
+    def _print(self, *args, **kwargs) -> None:
+        if self.verbose:
+            print(*args, **kwargs)
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Stops the generation of the current turn, if there is one"""
+        if self._cancel_token:
+            self._cancel_token.cancel(reason)
+
+    def _new_cancel_token(self) -> CancelToken:
+        self._cancel_token = CancelToken()
+        return self._cancel_token
+
+    def snapshot(self) -> dict:
+        """Everything needed to continue this session later, as plain data"""
+        return {
+            "messages": list(self.messages),
+            "todos": [todo.model_dump() for todo in self.todos],
+            "file_reads": self.file_reads.to_dict(),
+            "pages": self.pages.to_dict(),
+        }
+
+    def restore(self, snapshot: dict) -> None:
+        self.close()
+        self.messages = MessageHistory(snapshot["messages"], get_blob_store())
+        self.todos[:] = [ToDoItem(**todo) for todo in snapshot["todos"]]
+        self.file_reads = FileReadLedger.from_dict(snapshot["file_reads"])
+        self.pages = PageStore.from_dict(snapshot["pages"])
+
+    def read_more(self, handle: str, page: int) -> str:
+        return self.pages.get(handle, page)
+
+    def close(self) -> None:
+        """Gives back what the session holds outside the process, its blobs"""
+        self.messages.release()  # type: ignore[attr-defined]
+
     def add_user_message(self, user_message: AgentMessage) -> None:
         self.messages.append(user_message)
 
@@ -34,11 +96,44 @@ class BaseAgent(ABC):
         tool = TOOLS.get(tool_call.function.name)
         if not tool:
             return ToolResult(ok=None, err=Exception("No tool selected"))
+        started = time.perf_counter()
         try:
-            result = tool(**tool_call.function.arguments)
+            with span(tool_call.function.name, "tool"):
+                arguments = validate_tool_arguments(
+                    tool_call.function.name, tool_call.function.arguments
+                )
+                result = tool(**arguments)
             return ToolResult(ok=result, err=None)
         except Exception as e:
             return ToolResult(ok=None, err=e)
+        finally:
+            self._record_tool_time(tool_call.function.name, started)
+
+    async def _call_tool_async(self, tool_call: ToolCall) -> ToolResult:
+        """
+        Async tools are awaited, sync ones run on a worker thread so the event
+        loop keeps reading the model's stream meanwhile
+        """
+        tool = TOOLS.get(tool_call.function.name)
+        if not inspect.iscoroutinefunction(tool):
+            return await asyncio.to_thread(self._call_tool, tool_call)
+
+        started = time.perf_counter()
+        try:
+            with span(tool_call.function.name, "tool"):
+                arguments = validate_tool_arguments(
+                    tool_call.function.name, tool_call.function.arguments
+                )
+                result = await tool(**arguments)
+            return ToolResult(ok=result, err=None)
+        except Exception as e:
+            return ToolResult(ok=None, err=e)
+        finally:
+            self._record_tool_time(tool_call.function.name, started)
+
+    def _record_tool_time(self, tool_name: str, started: float) -> None:
+        if self.model.telemetry:
+            self.model.telemetry.record_tool(tool_name, time.perf_counter() - started)
 
     def _get_undone_todos(self) -> list[ToDoItem]:
         return [todo for todo in self.todos if not todo.is_complete]
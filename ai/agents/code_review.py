@@ -1,12 +1,19 @@
 import json
+import time
 from typing import Callable
 
-from pydantic import BaseModel
 from ai.agents.base_agent import BaseAgent
 from ai.base_model import BaseAIModel
+from ai.cancellation import StreamLimits
 from ai.message import AgentMessage
-from ai.tool_definitions import Tool, ToolCall
+from ai.tool_definitions import (
+    Tool,
+    ToolArgumentError,
+    ToolCall,
+    validate_tool_arguments,
+)
 from tools import TOOLS
+from tools.encoding import PageStore, encode_tool_result
 
 CODING_AGENT_INSTRUCTIONS = """
 You are a Python code reviewer. Your job is to inspect a repository and report bad practices, bugs, and refactors, and suggest cleaner implementations.
@@ -63,6 +70,8 @@ class CodeReviewAgent(BaseAgent):
         self.instructions = instructions
         self.tools = [tool.model_dump() for tool in tools]
         self.retry_tracker = ToolRetryTracker()
+        self.pages = PageStore()
+        self._cancel_token = None
 
     async def invoke(
         self, messages: list[AgentMessage]
@@ -92,7 +101,12 @@ class CodeReviewAgent(BaseAgent):
                     },
                 )
 
-        stream = self.model.chat(messages, self.tools)  # type: ignore
+        stream = self.model.chat(
+            messages,  # type: ignore
+            self.tools,  # type: ignore
+            limits=StreamLimits(max_seconds=600, max_tokens=4096),
+            cancel=self._new_cancel_token(),
+        )
 
         tools: list[ToolCall] = []
         current_content = ""
@@ -155,16 +169,28 @@ class CodeReviewAgent(BaseAgent):
 
         for tool in tools_to_call:
             print(f"calling tool: {tool.function.name}")
-            tool_function = TOOLS.get(tool.function.name)
+            # Paged results belong to this agent, not to the tools module
+            tool_function = (
+                self.read_more
+                if tool.function.name == "read_more"
+                else TOOLS.get(tool.function.name)
+            )
 
             if not tool_function:
                 results.append(f"ERROR: Tool '{tool.function.name}' does not exist!")
                 continue
 
-            result, is_success = self.try_to_call_tool(
-                tool_function,
-                tool.function.arguments,
-            )
+            try:
+                arguments = validate_tool_arguments(
+                    tool.function.name, tool.function.arguments
+                )
+            except ToolArgumentError as e:
+                results.append(f"✗ {tool.function.name}: {e}")
+                return ("\n".join(results), False)
+
+            started = time.perf_counter()
+            result, is_success = self.try_to_call_tool(tool_function, arguments)
+            self._record_tool_time(tool.function.name, started)
 
             status = "✓" if is_success else "✗"
             results.append(f"{status} {tool.function.name}: {result}")
@@ -181,17 +207,11 @@ class CodeReviewAgent(BaseAgent):
         try:
             result = function(**kwargs)
 
-            if isinstance(result, BaseModel):
-                result = result.model_dump_json()
-            elif isinstance(result, dict):
+            if isinstance(result, dict):
                 result = json.dumps(result)
-            elif not isinstance(result, str):
-                try:
-                    result = str(result)
-                except Exception:
-                    return ("TOOL RESULT WITH WRONG TYPE", False)
 
-            return (result, True)
+            encoded = encode_tool_result(function.__name__, result, pages=self.pages)
+            return (encoded.text, True)
 
         except Exception as e:
             message = "While calling the tool, we encountered an error: " + str(e)
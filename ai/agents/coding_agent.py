@@ -1,11 +1,17 @@
 from typing import Any
 from pydantic import ValidationError
 from ai.agents.base_agent import BaseAgent
-from ai.agents.decisions import AgentDecision
 from ai.base_model import BaseAIModel
-from ai.ollama_response import OllamaResponse
-from ai.tool_definitions import Tool, ToolCall
+from ai.graph.engine import GraphEngine
+from ai.graph.nodes import DecisionNode
+from ai.inference import use_profile
+from ai.scheduler import Priority, use_priority
+from ai.tool_definitions import Tool, ToolCall, ToolResult
+from ai.tool_dispatch import ToolDispatcher
+from ai.tool_loops import LoopCheck
+from ai.tracing import span
 from program_state import ProgramState
+from tools.encoding import EncodedOutput, encode_tool_result
 from tools.todos import SupportsToDoMixin
 
 CODING_AGENT_INSTRUCTIONS = """
@@ -38,15 +44,25 @@ When you receive the output of explore_structure:
 - Do not ask the user what to do with it.
 """
 
+# Only when the session has a semantic index and advertises the tool
+SEMANTIC_SEARCH_INSTRUCTIONS = """semantic_search:
+- To find the code related to a concern, use semantic_search instead of opening files one by one.
+"""
+
 
 class CodeReviewAgent(SupportsToDoMixin, BaseAgent):
     def __init__(self, ai_model: BaseAIModel, tools: list[Tool]) -> None:
         super().__init__(ai_model, tools)
         self.todos_created = False
+
+        instructions = CODING_AGENT_INSTRUCTIONS
+        if any(tool.function.name == "semantic_search" for tool in tools):
+            instructions += SEMANTIC_SEARCH_INSTRUCTIONS
+
         self.messages.extend(
             [
                 {
-                    "content": CODING_AGENT_INSTRUCTIONS,
+                    "content": instructions,
                     "role": "system",
                     "images": None,
                     "tool_calls": None,
@@ -66,7 +82,20 @@ class CodeReviewAgent(SupportsToDoMixin, BaseAgent):
             ]
         )
 
+    def snapshot(self) -> dict:
+        return {**super().snapshot(), "todos_created": self.todos_created}
+
+    def restore(self, snapshot: dict) -> None:
+        super().restore(snapshot)
+        self.todos_created = snapshot["todos_created"]
+
     async def invoke(self) -> ProgramState:
+        with span("invoke", "agent") as trace:
+            state = await self._invoke()
+            trace["state"] = state.name
+            return state
+
+    async def _invoke(self) -> ProgramState:
         user_message = self._get_user_last_message()
 
         if not user_message:
@@ -78,50 +107,60 @@ class CodeReviewAgent(SupportsToDoMixin, BaseAgent):
             if not await self.is_propmt_relevant(user_message["content"]):
                 return ProgramState.USER_CONTROL
 
-            response = self.model.chat(self.messages, tools=self.tools)  # type: ignore
-            async for next_item in response:
-                if tool_calls := next_item.message.tool_calls:
-                    tool_call = ToolCall(**tool_calls[0])
+            response = self.model.chat(
+                self.messages,  # type: ignore
+                tools=self.tools,  # type: ignore
+                limits=self.stream_limits,
+                cancel=self._new_cancel_token(),
+            )
+            with use_profile(self.profiles["todo"]):
+                async for next_item in response:
+                    if tool_calls := next_item.message.tool_calls:
+                        tool_call = ToolCall(**tool_calls[0])
 
-                    if tool_call.function.name != "write_todos":
-                        print("|nee ok|")
-                        # Reject and remind
-                        self.messages.append(
-                            {
-                                "role": "assistant",
-                                "content": "You must create todos first using write_todos before proceeding with other tools.",
-                                "images": None,
-                                "tool_calls": None,
-                            }
-                        )
-                        return ProgramState.AGENT_CONTROL
+                        if tool_call.function.name != "write_todos":
+                            self._print("|nee ok|")
+                            # Reject and remind
+                            self.messages.append(
+                                {
+                                    "role": "assistant",
+                                    "content": "You must create todos first using write_todos before proceeding with other tools.",
+                                    "images": None,
+                                    "tool_calls": None,
+                                }
+                            )
+                            return ProgramState.AGENT_CONTROL
+
+                        # Execute write_todos
+                        tool_res = self._call_tool(tool_call)
 
-                    # Execute write_todos
-                    tool_res = self._call_tool(tool_call)
+                        if not tool_res.is_ok():
+                            self.messages.append(
+                                {
+                                    "role": "tool",
+                                    "content": f"Error creating todos: {tool_res.get_err()}",
+                                    "images": None,
+                                    "tool_calls": None,
+                                }
+                            )
+                            return ProgramState.AGENT_CONTROL
 
-                    if not tool_res.is_ok():
+                        self.todos_created = True
+                        self._emit(
+                            "todos", todos=[todo.model_dump() for todo in self.todos]
+                        )
                         self.messages.append(
                             {
                                 "role": "tool",
-                                "content": f"Error creating todos: {tool_res.get_err()}",
+                                "content": f"Todos created successfully: {len(self.todos)} items",
                                 "images": None,
                                 "tool_calls": None,
                             }
                         )
                         return ProgramState.AGENT_CONTROL
-
-                    self.todos_created = True
-                    self.messages.append(
-                        {
-                            "role": "tool",
-                            "content": f"Todos created successfully: {len(self.todos)} items",
-                            "images": None,
-                            "tool_calls": None,
-                        }
-                    )
-                    return ProgramState.AGENT_CONTROL
-                else:
-                    print(next_item.message.content, end="")
+                    else:
+                        self._print(next_item.message.content, end="")
+                        self._emit("content", text=next_item.message.content)
 
             return ProgramState.USER_CONTROL
 
@@ -129,25 +168,63 @@ class CodeReviewAgent(SupportsToDoMixin, BaseAgent):
 
         # 1. Check for completion
         if not self._get_undone_todos():
-            print("\nAll tasks in the todo list are complete.")
+            self._print("\nAll tasks in the todo list are complete.")
+            self._emit("complete")
             return ProgramState.USER_CONTROL
 
         # 2. Generate Model Response
-        print("\nThinking...")
+        self._print("\nThinking...")
         # Convert AgentMessage (TypedDict) to regular dict format for the model
-        response = self.model.chat(self.messages, tools=self.tools)  # type: ignore
+        response = self.model.chat(
+            self.messages,  # type: ignore
+            tools=self.tools,  # type: ignore
+            limits=self.stream_limits,
+            cancel=self._new_cancel_token(),
+        )
 
         content_buffer = ""
         tool_calls = []
+        loops: list[LoopCheck] = []
+
+        async def call(tool_call: ToolCall) -> ToolResult:
+            name, arguments = tool_call.function.name, tool_call.function.arguments
+            # The calls run in order, so loops lines up with tool_calls
+            loops.append(check := self.tool_loops.check(name, arguments))
+            if check.cached is not None:
+                return check.cached
+
+            result = await self._call_tool_async(tool_call)
+            self.tool_loops.record(name, arguments, result)
+            return result
 
-        async for chunk in response:
-            if chunk.message.content:
-                print(chunk.message.content, end="", flush=True)
-                content_buffer += chunk.message.content
-            if chunk.message.tool_calls:
-                tool_calls.extend(chunk.message.tool_calls)
+        # Tools start as soon as their call arrives, not when the stream ends
+        dispatcher = ToolDispatcher(call)
 
-        print()  # Newline for clean output
+        with use_profile(self.profiles["review"]):
+            try:
+                async for chunk in response:
+                    if chunk.message.content:
+                        self._print(chunk.message.content, end="", flush=True)
+                        self._emit("content", text=chunk.message.content)
+                        content_buffer += chunk.message.content
+                    if chunk.message.tool_calls:
+                        tool_calls.extend(chunk.message.tool_calls)
+                        for tc_data in chunk.message.tool_calls:
+                            tool_call = ToolCall(**tc_data)
+                            self._emit(
+                                "tool_call",
+                                name=tool_call.function.name,
+                                arguments=tool_call.function.arguments,
+                            )
+                            dispatcher.submit(tool_call)
+                    if chunk.done_reason and chunk.done_reason.startswith("stopped:"):
+                        self._print(f"\n[generation {chunk.done_reason}]", end="")
+                        self._emit("stopped", reason=chunk.done_reason)
+            except BaseException:
+                dispatcher.cancel()
+                raise
+
+        self._print()  # Newline for clean output
 
         # 3. Add Assistant Message to History
         self.messages.append(
@@ -159,27 +236,47 @@ class CodeReviewAgent(SupportsToDoMixin, BaseAgent):
             }
         )
 
-        # 4. Execute Tools
+        # 4. Collect the tool results, in the order they were called
         if tool_calls:
-            for tc_data in tool_calls:
-                tool_call = ToolCall(**tc_data)
-
-                # Execute tool
-                result = self._call_tool(tool_call)
-
-                # Add Tool Output to History
-                self.messages.append(
-                    {
-                        "role": "tool",
-                        "content": (
-                            str(result.get_val())
-                            if result.is_ok()
-                            else f"Error: {result.get_err()}"
-                        ),
-                        "images": None,
-                        "tool_calls": None,
-                    }
+            with span("tools.wait", "agent", calls=len(tool_calls)):
+                results = await dispatcher.results()
+            with span("tool_results", "agent"):
+                for tc_data, result, loop in zip(tool_calls, results, loops):
+                    tool_call = ToolCall(**tc_data)
+                    content = (
+                        self._encode_result(tool_call, result.get_val())
+                        if result.is_ok()
+                        else None
+                    )
+                    self._emit(
+                        "tool_result",
+                        name=tool_call.function.name,
+                        ok=result.is_ok(),
+                        tokens=content.tokens if content else 0,
+                        truncated=content.truncated if content else False,
+                    )
+
+                    text = content.text if content else f"Error: {result.get_err()}"
+                    if loop.repeats:
+                        text += loop.nudge(tool_call.function.name)
+
+                    # Add Tool Output to History
+                    self.messages.append(
+                        {
+                            "role": "tool",
+                            "content": text,
+                            "images": None,
+                            "tool_calls": None,
+                        }
+                    )
+
+            # Another pass would most likely repeat the same call again
+            if stuck := next((loop for loop in loops if loop.escalate), None):
+                self._print(
+                    f"\n[stopped: the same tool call was repeated {stuck.repeats} times]"
                 )
+                self._emit("loop", repeats=stuck.repeats)
+                return ProgramState.USER_CONTROL
 
             # Continue autonomous execution
             return ProgramState.AGENT_CONTROL
@@ -187,6 +284,35 @@ class CodeReviewAgent(SupportsToDoMixin, BaseAgent):
         # 5. Hand back to user if no tools were called (e.g. asking a question)
         return ProgramState.USER_CONTROL
 
+    def _encode_result(self, tool_call: ToolCall, value: Any) -> EncodedOutput:
+        content = encode_tool_result(
+            tool_call.function.name,
+            self._deduplicate(tool_call, value),
+            self.tool_output_budget,
+            pages=self.pages,
+        )
+        if content.truncated and tool_call.function.name == "read_file":
+            # Only the first page made it into the history, reading the file
+            # again has to show all of it, not a stub
+            self.file_reads.forget(str(tool_call.function.arguments.get("file_path")))
+        return content
+
+    def _deduplicate(self, tool_call: ToolCall, value: Any) -> Any:
+        """Repeated reads of a file only add a stub or a diff to the history"""
+        if tool_call.function.name != "read_file" or not isinstance(value, str):
+            return value
+
+        saved_before = self.file_reads.saved_chars
+        value = self.file_reads.encode(
+            str(tool_call.function.arguments.get("file_path")), value
+        )
+        if self.model.telemetry and self.file_reads.saved_chars > saved_before:
+            self.model.telemetry.increment("deduplicated_reads")
+            self.model.telemetry.increment(
+                "deduplicated_chars", self.file_reads.saved_chars - saved_before
+            )
+        return value
+
     async def is_propmt_relevant(self, prompt: str) -> bool:
         complete_prompt = (
             "You are: \n"
@@ -194,13 +320,19 @@ class CodeReviewAgent(SupportsToDoMixin, BaseAgent):
             + "Based on that fact, tell if the prompt bellow is relevant and with what certainty\n"
             + prompt
         )
-        # a defacto DecisionNode for SBK
-        response: OllamaResponse = await anext(
-            self.model.generate(complete_prompt, structure=AgentDecision)
+        gate = DecisionNode(
+            name="relevance",
+            prompt=complete_prompt,
+            information_tools=[],
+            left=None,
+            right=None,
         )
         try:
-            value = AgentDecision.model_validate_json(response.response)
-            return value.should_do and value.confidence > 0.5
+            with use_priority(Priority.GATE), use_profile(self.profiles["gating"]):
+                with span("gate", "agent"):
+                    run = await GraphEngine(self.model).run(gate)
         except ValidationError as e:
-            print("model is dumb af")
+            self._print("model is dumb af")
             raise e
+
+        return run.decisions["relevance"]
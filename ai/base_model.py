@@ -3,16 +3,27 @@ from typing import AsyncGenerator, Any, Awaitable, List, Optional, Dict
 
 from pydantic import BaseModel
 
+from .cancellation import CancelToken, StreamLimits
 from .ollama_response import OllamaChatResponse
+from .telemetry import TelemetryCollector
 
 
 class BaseAIModel(ABC):
+    telemetry: Optional[TelemetryCollector] = None
+
     @abstractmethod
     def chat(
         self,
         messages: List[Dict[str, str]],
         tools: Optional[List[Dict[str, str]]],
+        limits: Optional[StreamLimits] = None,
+        cancel: Optional[CancelToken] = None,
     ) -> AsyncGenerator[OllamaChatResponse, None]:
+        """
+        Streams the model's answer. When limits or a cancel token are given the
+        stream is cut short (and the generation aborted) once a limit is hit,
+        and the last chunk has done_reason set to "stopped:<reason>".
+        """
         pass
 
     @abstractmethod
@@ -24,6 +35,17 @@ class BaseAIModel(ABC):
     ) -> AsyncGenerator[Any, None]:
         pass
 
+    def sampling_options(self) -> Dict[str, Any]:
+        """The settings, besides the request, that decide what the model answers"""
+        return {}
+
+    def is_deterministic(self) -> bool:
+        """
+        Whether the same request always gets the same answer. Only then may an
+        answer be cached and played back instead of asking the model again.
+        """
+        return False
+
     # @abstractmethod
     # async def generate(
     #     self, prompt: str, context: Optional[List[int]] = None
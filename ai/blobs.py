@@ -0,0 +1,158 @@
+"""
+Large message contents kept out of process memory.
+
+A session holds every file it read in its history, a server hosting many
+sessions would hold all of them at once. With a BlobStore set, long contents
+are written to disk under their sha256 and the history keeps only a BlobRef;
+the text is loaded back just while a request body is built. The same file read
+by many sessions is stored once.
+
+Histories hold references to their blobs and release them when they are
+dropped. Once the store is over max_bytes, unreferenced blobs are deleted,
+least recently used first, also those left in the directory by earlier runs.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+# Shorter contents cost less than the bookkeeping
+BLOB_MIN_CHARS = 2048
+BLOB_MAX_BYTES = 1024 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class BlobRef:
+    digest: str
+    length: int
+
+
+class BlobStore:
+    """
+    Content addressed text on disk. Without a directory, a temporary one is
+    used and removed by close().
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        min_chars: int = BLOB_MIN_CHARS,
+        max_bytes: int = BLOB_MAX_BYTES,
+    ) -> None:
+        self._temporary = directory is None
+        self.directory = directory or tempfile.mkdtemp(prefix="review-blobs-")
+        self.min_chars = min_chars
+        self.max_bytes = max_bytes
+        self.stored = 0
+        self.reused = 0
+        self.evicted = 0
+        self.size = 0
+        self._lock = threading.Lock()
+        # Sizes by digest, least recently used first
+        self._sizes: OrderedDict[str, int] = OrderedDict()
+        self._refs: Counter[str] = Counter()
+        os.makedirs(self.directory, exist_ok=True)
+        self._scan()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _scan(self) -> None:
+        """Blobs of earlier runs, in the order they were last used"""
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.is_dir():
+                for blob in os.scandir(entry.path):
+                    if not blob.name.endswith(".tmp"):
+                        stat = blob.stat()
+                        found.append((stat.st_mtime, blob.name, stat.st_size))
+
+        for _, digest, size in sorted(found):
+            self._sizes[digest] = size
+            self.size += size
+
+    def ref(self, text: str) -> BlobRef:
+        """The reference text has or would have in the store, nothing is written"""
+        return BlobRef(hashlib.sha256(text.encode()).hexdigest(), len(text))
+
+    def put(self, text: str) -> BlobRef:
+        """Stores text, the caller holds a reference until it calls release()"""
+        data = text.encode()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+
+        with self._lock:
+            self._refs[digest] += 1
+            if digest in self._sizes:
+                self.reused += 1
+                self._sizes.move_to_end(digest)
+                os.utime(path)
+                return BlobRef(digest, len(text))
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            self.stored += 1
+            self._sizes[digest] = len(data)
+            self.size += len(data)
+            self._sweep()
+
+        return BlobRef(digest, len(text))
+
+    def release(self, ref: BlobRef) -> None:
+        with self._lock:
+            self._refs[ref.digest] -= 1
+            if self._refs[ref.digest] <= 0:
+                del self._refs[ref.digest]
+            self._sweep()
+
+    def _sweep(self) -> None:
+        for digest in list(self._sizes):
+            if self.size <= self.max_bytes:
+                return
+            if digest in self._refs:
+                continue
+
+            size = self._sizes.pop(digest)
+            self.size -= size
+            self.evicted += 1
+            try:
+                os.unlink(self._path(digest))
+            except FileNotFoundError:
+                pass
+
+    def get(self, ref: BlobRef) -> str:
+        with open(self._path(ref.digest), "rb") as f:
+            return f.read().decode()
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            return {
+                "stored": self.stored,
+                "reused": self.reused,
+                "evicted": self.evicted,
+                "bytes": self.size,
+            }
+
+    def close(self) -> None:
+        if self._temporary:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+_store: Optional[BlobStore] = None
+
+
+def set_blob_store(store: Optional[BlobStore]) -> None:
+    global _store
+    _store = store
+
+
+def get_blob_store() -> Optional[BlobStore]:
+    return _store
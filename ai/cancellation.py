@@ -0,0 +1,217 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import AsyncGenerator, AsyncIterator, Callable, Optional, TypeVar
+
+from ai.ollama_response import OllamaChatResponse, OllamaMessage
+
+T = TypeVar("T")
+
+
+class CancelToken:
+    """Lets someone outside the stream (the agent, a server, a signal) stop it"""
+
+    def __init__(self) -> None:
+        self.reason: Optional[str] = None
+        self._callbacks: list[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        if self.cancelled:
+            return
+
+        self.reason = reason
+        for callback in self._callbacks:
+            callback()
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        self._callbacks.append(callback)
+
+
+@dataclass
+class StreamLimits:
+    # Wall clock budget of a single turn, including prompt evaluation
+    max_seconds: Optional[float] = None
+    # Streamed chunks carrying text; Ollama sends one token per chunk
+    max_tokens: Optional[int] = None
+    # Stop once the model starts talking again after a complete tool call
+    stop_after_tool_call: bool = True
+    # Repetition detection over the tail of the streamed text
+    detect_repetition: bool = True
+    repetition_window: int = 512
+    repetition_min_period: int = 16
+    repetition_min_repeats: int = 4
+    # Tables, rules and literals repeat a short segment a few times legitimately
+    repetition_min_chars: int = 256
+
+
+class RepetitionDetector:
+    """
+    Detects a model stuck in a loop: the streamed text ending with the same
+    segment repeated at least min_repeats times in a row, over at least
+    min_chars characters. Segments without a single letter (table rules,
+    separators, runs of numbers) are left to the token cap.
+    """
+
+    def __init__(
+        self,
+        window: int = 512,
+        min_period: int = 16,
+        min_repeats: int = 4,
+        min_chars: int = 256,
+    ) -> None:
+        self.window = max(window, min_chars)
+        self.min_period = min_period
+        self.min_repeats = min_repeats
+        self.min_chars = min_chars
+        self.tail = ""
+        self._unchecked = 0
+
+    def feed(self, text: str) -> bool:
+        self.tail = (self.tail + text)[-self.window :]
+        self._unchecked += len(text)
+
+        # Checking on every single token is wasteful, the loop will still be there
+        if self._unchecked < self.min_period:
+            return False
+        self._unchecked = 0
+
+        for period in range(self.min_period, len(self.tail) // self.min_repeats + 1):
+            repeats = max(self.min_repeats, -(-self.min_chars // period))
+            segment = self.tail[-period:]
+            if (
+                period * repeats <= len(self.tail)
+                and any(char.isalpha() for char in segment)
+                and self.tail.endswith(segment * repeats)
+            ):
+                return True
+
+        return False
+
+
+_END = object()
+
+
+class StreamGuard:
+    """
+    Watches a response stream and stops it when a limit is hit or the turn is
+    cancelled. The stream is consumed in its own task, so stopping it cancels
+    that task, which closes the HTTP response and makes Ollama abort the
+    generation instead of finishing it for nobody.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[StreamLimits] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> None:
+        self.limits = limits or StreamLimits()
+        self.cancel = cancel
+        self.stopped_reason: Optional[str] = None
+
+        self._tokens = 0
+        self._seen_tool_call = False
+        self._repetition = (
+            RepetitionDetector(
+                self.limits.repetition_window,
+                self.limits.repetition_min_period,
+                self.limits.repetition_min_repeats,
+                self.limits.repetition_min_chars,
+            )
+            if self.limits.detect_repetition
+            else None
+        )
+
+    def inspect(self, response) -> Optional[str]:
+        """Returns the reason to stop the stream before this chunk, if any"""
+        message = getattr(response, "message", None)
+        text = message.content if message else getattr(response, "response", "")
+        tool_calls = message.tool_calls if message else None
+
+        if tool_calls:
+            self._seen_tool_call = True
+            return None
+
+        if not text:
+            return None
+
+        if self._seen_tool_call and self.limits.stop_after_tool_call and text.strip():
+            return "tool_call"
+
+        self._tokens += 1
+        if self.limits.max_tokens is not None and self._tokens > self.limits.max_tokens:
+            return "max_tokens"
+
+        if self._repetition and self._repetition.feed(text):
+            return "repetition"
+
+        return None
+
+    async def watch(self, stream: AsyncIterator[T]) -> AsyncGenerator[T, None]:
+        queue: asyncio.Queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        deadline = (
+            time.monotonic() + self.limits.max_seconds
+            if self.limits.max_seconds is not None
+            else None
+        )
+
+        async def produce() -> None:
+            try:
+                async for item in stream:
+                    queue.put_nowait(item)
+                queue.put_nowait(_END)
+            except Exception as e:
+                queue.put_nowait(e)
+
+        producer = asyncio.create_task(produce())
+        if self.cancel:
+            self.cancel.on_cancel(
+                lambda: loop.call_soon_threadsafe(queue.put_nowait, _END)
+            )
+
+        try:
+            while True:
+                if self.cancel and self.cancel.cancelled:
+                    self.stopped_reason = "cancelled"
+                    return
+
+                timeout = None
+                if deadline is not None:
+                    timeout = max(deadline - time.monotonic(), 0)
+
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except TimeoutError:
+                    self.stopped_reason = "timeout"
+                    return
+
+                if item is _END:
+                    if self.cancel and self.cancel.cancelled:
+                        self.stopped_reason = "cancelled"
+                    return
+                if isinstance(item, Exception):
+                    raise item
+
+                if reason := self.inspect(item):
+                    self.stopped_reason = reason
+                    return
+
+                yield item
+        finally:
+            producer.cancel()
+            await asyncio.wait([producer])
+
+    def stopped_response(self, model: str) -> OllamaChatResponse:
+        """The final chunk reported in place of the one the server never sent"""
+        return OllamaChatResponse(
+            model=model,
+            created_at=datetime.now(timezone.utc).isoformat(),
+            done=True,
+            done_reason=f"stopped:{self.stopped_reason}",
+            message=OllamaMessage(role="assistant", content=""),
+        )
@@ -0,0 +1,99 @@
+"""
+Snapshots of an agent session, so a crashed or interrupted review can resume.
+
+A checkpoint is a small header (magic and format version) followed by the
+zlib compressed JSON state. It is written to a temporary file and renamed over
+the previous one, so a crash mid write never leaves a broken checkpoint.
+"""
+
+import os
+import struct
+import time
+import zlib
+from typing import Optional
+
+from ai.agents.base_agent import BaseAgent
+from ai.serialization import dumps, loads
+from program_state import ProgramState
+
+MAGIC = b"LRAC"
+VERSION = 1
+_HEADER = struct.Struct(">4sH")
+
+
+class CheckpointError(Exception):
+    pass
+
+
+def encode_checkpoint(state: dict) -> bytes:
+    # Level 1: most of the size win of zlib at a fraction of the time
+    return _HEADER.pack(MAGIC, VERSION) + zlib.compress(dumps(state), 1)
+
+
+def decode_checkpoint(data: bytes) -> dict:
+    if len(data) < _HEADER.size:
+        raise CheckpointError("The checkpoint is truncated")
+
+    magic, version = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise CheckpointError("Not a checkpoint file")
+    if version != VERSION:
+        raise CheckpointError(f"Unsupported checkpoint version {version}")
+
+    try:
+        state = loads(zlib.decompress(data[_HEADER.size :]))
+    except zlib.error as e:
+        raise CheckpointError(f"The checkpoint is corrupted: {e}")
+    except ValueError as e:
+        raise CheckpointError(f"The checkpoint is not valid JSON: {e}")
+
+    if not isinstance(state, dict):
+        raise CheckpointError("The checkpoint does not hold a session")
+    return state
+
+
+def write_checkpoint(path: str, state: dict) -> None:
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(encode_checkpoint(state))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def read_checkpoint(path: str) -> dict:
+    with open(path, "rb") as f:
+        return decode_checkpoint(f.read())
+
+
+class Checkpointer:
+    """Saves the agent every interval seconds, and whenever asked to"""
+
+    def __init__(self, path: str, interval: float = 30.0) -> None:
+        self.path = path
+        self.interval = interval
+        self._last_saved: Optional[float] = None
+
+    def save(self, agent: BaseAgent, state: ProgramState) -> None:
+        write_checkpoint(self.path, {**agent.snapshot(), "phase": state.value})
+        self._last_saved = time.monotonic()
+
+    def maybe_save(self, agent: BaseAgent, state: ProgramState) -> bool:
+        if (
+            self._last_saved is not None
+            and time.monotonic() - self._last_saved < self.interval
+        ):
+            return False
+
+        self.save(agent, state)
+        return True
+
+    def resume(self, agent: BaseAgent) -> ProgramState:
+        """Restores the agent, returns the phase the session was in"""
+        snapshot = read_checkpoint(self.path)
+        try:
+            agent.restore(snapshot)
+            return ProgramState(snapshot["phase"])
+        except (KeyError, TypeError, ValueError) as e:
+            # Missing or mistyped fields, pydantic's errors are ValueErrors
+            raise CheckpointError(f"The checkpoint does not hold a session: {e!r}")
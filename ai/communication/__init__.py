@@ -1 +1,4 @@
-from .ollama_api_client import OllamaApiClient
+from .ollama_api_client import OllamaApiClient, OllamaHTTPError
+from .pool import OllamaPool
+from .replay import ReplayModel, SessionRecorder
+from .response_cache import CachedModel, ResponseCache
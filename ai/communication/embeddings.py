@@ -0,0 +1,39 @@
+import httpx
+
+from ai.communication.ollama_api_client import OllamaHTTPError
+
+
+class OllamaEmbedder:
+    """Turns texts into vectors through Ollama's /api/embed, in batches"""
+
+    def __init__(
+        self,
+        address: str,
+        model: str = "nomic-embed-text",
+        batch_size: int = 32,
+        keep_alive: str | int = "30m",
+    ) -> None:
+        self.endpoint = f"http://{address}"
+        self.model = model
+        self.batch_size = batch_size
+        self.keep_alive = keep_alive
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        vectors: list[list[float]] = []
+
+        with httpx.Client(timeout=120) as http:
+            for start in range(0, len(texts), self.batch_size):
+                response = http.post(
+                    f"{self.endpoint}/api/embed",
+                    json={
+                        "model": self.model,
+                        "input": texts[start : start + self.batch_size],
+                        "keep_alive": self.keep_alive,
+                    },
+                )
+                if response.status_code != httpx.codes.OK:
+                    raise OllamaHTTPError(response.status_code)
+
+                vectors.extend(response.json()["embeddings"])
+
+        return vectors
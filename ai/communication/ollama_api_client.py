@@ -1,69 +1,233 @@
 import json
-from typing import AsyncGenerator, Self, List, Optional
+import time
+from contextlib import aclosing
+from typing import AsyncGenerator, AsyncIterator, Self, List, Optional
 import httpx
 from pydantic import BaseModel
 
 from ai.ollama_response import OllamaChatResponse, OllamaResponse
 from ai.base_model import BaseAIModel
+from ai.cancellation import CancelToken, StreamGuard, StreamLimits
+from ai.communication.replay import SessionRecorder
+from ai.communication.residency import ModelResidency
+from ai.inference import InferenceProfile, current_profile
+from ai.message import MessageHistory
+from ai.serialization import build_object, dumps, join_array
+from ai.telemetry import TelemetryCollector
+from ai.tracing import get_tracer, span
+
+# Above this, even a fixed seed is not worth trusting to repeat an answer
+MAX_DETERMINISTIC_TEMPERATURE = 0.2
+
+
+class OllamaHTTPError(Exception):
+    def __init__(self, status_code: int) -> None:
+        super().__init__("error: " + str(status_code))
+        self.status_code = status_code
 
 
 class OllamaApiClient(BaseAIModel):
-    def __init__(self, address: str, model: str) -> None:
+    def __init__(
+        self,
+        address: str,
+        model: str,
+        telemetry: Optional[TelemetryCollector] = None,
+        recorder: Optional[SessionRecorder] = None,
+        keep_alive: str | int = "30m",
+        unload_on_exit: bool = False,
+        temperature: float = 0.1,
+        seed: Optional[int] = None,
+        profile: Optional[InferenceProfile] = None,
+    ) -> None:
         self.endpoint = f"http://{address}"
         self.model = model
+        self.temperature = temperature
+        # A fixed seed makes answers repeatable, and so cacheable
+        self.seed = seed
+        # Used outside of any use_profile block
+        self.profile = profile or InferenceProfile()
+        self.telemetry = telemetry
+        self.recorder = recorder
+        self.residency = ModelResidency(
+            self.endpoint,
+            model,
+            keep_alive,
+            unload_on_exit,
+            # Loaded with another context size, the first request reloads it
+            options={"num_ctx": self.profile.num_ctx} if self.profile.num_ctx else None,
+        )
+        # The agent sends the same tool list every turn, encode it once
+        self._encoded_tools: Optional[tuple[list[dict], bytes]] = None
 
     def __enter__(self) -> Self:
-        self.load_model_into_computers_memory()
-        print("LOADING MODEL INTO MEMORY")
+        # The model loads while the caller builds its tools and indexes
+        self.residency.start_warm_up()
+        print("WARMING UP THE MODEL")
         return self
 
-    def __exit__(self, exc_type, exc_val, exc_tb) -> Self:
-        try:
-            if exc_val:
-                raise exc_val
-        finally:
-            self.unload_model_from_memory()
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if self.residency.release():
             print("UNLOADED MODEL FROM MEMORY")
 
-        return self
+    def _profile(self) -> InferenceProfile:
+        return current_profile() or self.profile
 
-    def load_model_into_computers_memory(self) -> None:
-        response = httpx.post(
-            f"{self.endpoint}/api/generate",
-            json={"model": self.model},
+    def sampling_options(self) -> dict:
+        """The options sent with a request made here, profile included"""
+        options = {"temperature": self.temperature, **self._profile().options()}
+        if self.seed is not None:
+            options["seed"] = self.seed
+        return options
+
+    def _keep_alive(self) -> str | int:
+        profile = self._profile()
+        return (
+            profile.keep_alive
+            if profile.keep_alive is not None
+            else self.residency.keep_alive
+        )
+
+    def is_deterministic(self) -> bool:
+        return (
+            self.seed is not None
+            and self.sampling_options()["temperature"] <= MAX_DETERMINISTIC_TEMPERATURE
         )
-        assert response.json()["done"], "Could not load the model"
+
+    def load_model_into_computers_memory(self) -> None:
+        self.residency.load()
 
     def unload_model_from_memory(self) -> None:
-        response = httpx.post(
-            f"{self.endpoint}/api/generate",
-            json={"model": self.model, "keep_alive": 0},
+        self.residency.unload()
+
+    def _encode_tools(self, tools: list[dict]) -> bytes:
+        if not self._encoded_tools or self._encoded_tools[0] is not tools:
+            self._encoded_tools = (tools, dumps(tools))
+        return self._encoded_tools[1]
+
+    def _encode_chat(self, payload: dict) -> bytes:
+        messages = payload["messages"]
+        segments = (
+            messages.encoded()
+            if isinstance(messages, MessageHistory)
+            else [dumps(message) for message in messages]
+        )
+
+        fields = {
+            name: dumps(value)
+            for name, value in payload.items()
+            if name not in ("messages", "tools")
+        }
+        fields["messages"] = join_array(segments)
+        if "tools" in payload:
+            fields["tools"] = self._encode_tools(payload["tools"])
+
+        return build_object(fields)
+
+    async def _stream_lines(
+        self, path: str, payload: dict, body: Optional[bytes] = None
+    ) -> AsyncGenerator[str, None]:
+        exchange = (
+            self.recorder.record_request(path, payload) if self.recorder else None
         )
+        tracer = get_tracer()
+        requested = tracer.now() if tracer else 0
+        first_line: Optional[int] = None
+        lines = 0
+
+        try:
+            async with httpx.AsyncClient(timeout=60) as http:
+                async with http.stream(
+                    "POST",
+                    f"{self.endpoint}{path}",
+                    content=body if body is not None else dumps(payload),
+                    headers={"Content-Type": "application/json"},
+                ) as stream:
+                    if tracer:
+                        tracer.record("http.connect", "http", requested, tracer.now())
+                    if stream.status_code != httpx.codes.OK:
+                        raise OllamaHTTPError(stream.status_code)
 
-        assert response.json()["done"], "Model couldn't be offloaded"
+                    async for line in stream.aiter_lines():
+                        if self.recorder and exchange is not None:
+                            self.recorder.record_line(exchange, line)
+
+                        if line.strip():
+                            if tracer and first_line is None:
+                                first_line = tracer.now()
+                                tracer.record(
+                                    "first_token", "http", requested, first_line
+                                )
+                            lines += 1
+                            yield line
+        finally:
+            if tracer and first_line is not None:
+                tracer.record("decode", "http", first_line, tracer.now(), chunks=lines)
+            if self.recorder and exchange is not None:
+                self.recorder.end_exchange(exchange)
+
+    @staticmethod
+    async def _parse(
+        lines: AsyncIterator[str], response_type: type[BaseModel], trace: dict
+    ) -> AsyncGenerator:
+        """The chunks of a stream, the time spent parsing them goes to trace"""
+        tracing = get_tracer() is not None
+        async for line in lines:
+            started = time.perf_counter_ns() if tracing else 0
+            response = response_type(**json.loads(line))
+            if tracing:
+                trace["parse_us"] = (
+                    trace.get("parse_us", 0)
+                    + (time.perf_counter_ns() - started) // 1000
+                )
+            yield response
 
     async def chat(
         self,
         messages: list[dict],
         tools: Optional[list[dict]] = None,
+        limits: Optional[StreamLimits] = None,
+        cancel: Optional[CancelToken] = None,
     ) -> AsyncGenerator[OllamaChatResponse, None]:
-        async with httpx.AsyncClient(timeout=60) as http:
-            payload = {"model": self.model, "temperature": 0.1, "messages": messages}
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "keep_alive": self._keep_alive(),
+            "options": self.sampling_options(),
+        }
+
+        if tools:
+            payload["tools"] = tools
 
-            if tools:
-                payload["tools"] = tools
+        turn = self.telemetry.begin_turn("chat", self.model) if self.telemetry else None
 
-            async with http.stream(
-                "POST",
-                f"{self.endpoint}/api/chat",
-                json=payload,
-            ) as stream:
-                if stream.status_code != httpx.codes.OK:
-                    raise Exception("error: " + str(stream.status_code))
+        with span("chat", "model", messages=len(messages)) as trace:
+            with span("encode_body", "model"):
+                body = self._encode_chat(payload)
 
-                async for line in stream.aiter_lines():
-                    if line.strip():
-                        yield OllamaChatResponse(**json.loads(line))
+            responses = self._parse(
+                self._stream_lines("/api/chat", payload, body),
+                OllamaChatResponse,
+                trace,
+            )
+            guard = StreamGuard(limits, cancel) if limits or cancel else None
+            if guard:
+                responses = guard.watch(responses)
+
+            async with aclosing(responses):
+                async for response in responses:
+                    if turn:
+                        turn.observe(response)
+
+                    yield response
+
+            if guard and guard.stopped_reason:
+                stopped = guard.stopped_response(self.model)
+                if turn:
+                    # The server never sent its final chunk, close the turn here
+                    turn.observe(stopped)
+                if self.telemetry:
+                    self.telemetry.increment(f"stream_stopped_{guard.stopped_reason}")
+                yield stopped
 
     async def generate(
         self,
@@ -71,26 +235,29 @@ class OllamaApiClient(BaseAIModel):
         context: Optional[List[int]] = None,
         structure: Optional[type[BaseModel]] = None,
     ) -> AsyncGenerator[OllamaResponse, None]:
-        async with httpx.AsyncClient(timeout=60) as http:
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "context": context,
-                "options": {
-                    "seed": None,  # Used for deterministic answers
-                },
-            }
-
-            if structure:
-                payload["format"] = structure.model_json_schema()
-                payload["stream"] = False
-
-            async with http.stream(
-                "POST",
-                f"{self.endpoint}/api/generate",
-                json=payload,
-            ) as stream:
-                async for line in stream.aiter_lines():
-                    if line.strip():
-                        response = OllamaResponse(**json.loads(line))
-                        yield response
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "context": context,
+            "keep_alive": self._keep_alive(),
+            "options": self.sampling_options(),
+        }
+
+        if structure:
+            payload["format"] = structure.model_json_schema()
+            payload["stream"] = False
+
+        turn = (
+            self.telemetry.begin_turn("generate", self.model)
+            if self.telemetry
+            else None
+        )
+
+        with span("generate", "model") as trace:
+            async for response in self._parse(
+                self._stream_lines("/api/generate", payload), OllamaResponse, trace
+            ):
+                if turn:
+                    turn.observe(response)
+
+                yield response
@@ -0,0 +1,257 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import AsyncGenerator, List, Optional, Self
+
+import httpx
+from pydantic import BaseModel
+
+from ai.base_model import BaseAIModel
+from ai.cancellation import CancelToken, StreamLimits
+from ai.communication.ollama_api_client import OllamaApiClient, OllamaHTTPError
+from ai.communication.replay import SessionRecorder
+from ai.inference import InferenceProfile
+from ai.ollama_response import OllamaChatResponse, OllamaResponse
+from ai.telemetry import TelemetryCollector
+
+
+class NoHealthyEndpointError(Exception):
+    pass
+
+
+@dataclass
+class PoolNode:
+    client: OllamaApiClient
+    outstanding: int = 0
+    healthy: bool = True
+    failures: int = 0
+    served: int = 0
+
+    @property
+    def address(self) -> str:
+        return self.client.endpoint
+
+
+def _is_node_failure(error: Exception) -> bool:
+    """Errors that say something about the node, not about our request"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    return isinstance(error, OllamaHTTPError) and error.status_code >= 500
+
+
+def session_key(messages: list[dict]) -> str:
+    """
+    Identifies a conversation by everything up to its first user message.
+    Later turns only append to the history, so the key stays the same and the
+    conversation keeps hitting the node that has its prefix in the KV cache.
+    """
+    prefix = []
+    for message in messages:
+        prefix.append((message.get("role"), message.get("content")))
+        if message.get("role") == "user":
+            break
+
+    return hashlib.sha1(json.dumps(prefix).encode()).hexdigest()
+
+
+class OllamaPool(BaseAIModel):
+    """
+    Spreads requests over several Ollama endpoints serving the same model.
+
+    New conversations go to the healthy node with the fewest outstanding
+    requests, after that they stick to it (session affinity) so the server can
+    reuse the cached prompt. A node that fails before sending anything is
+    marked unhealthy and the request fails over to the next one; unhealthy
+    nodes are probed in the background and put back once they answer again.
+    """
+
+    def __init__(
+        self,
+        addresses: list[str],
+        model: str,
+        telemetry: Optional[TelemetryCollector] = None,
+        recorder: Optional[SessionRecorder] = None,
+        health_check_interval: float = 10.0,
+        max_sessions: int = 1024,
+        keep_alive: str | int = "30m",
+        unload_on_exit: bool = False,
+        temperature: float = 0.1,
+        seed: Optional[int] = None,
+        profile: Optional[InferenceProfile] = None,
+    ) -> None:
+        assert addresses, "The pool needs at least one endpoint"
+
+        self.model = model
+        self.telemetry = telemetry
+        self.nodes = [
+            PoolNode(
+                OllamaApiClient(
+                    address,
+                    model,
+                    telemetry,
+                    recorder,
+                    keep_alive,
+                    unload_on_exit,
+                    temperature,
+                    seed,
+                    profile,
+                )
+            )
+            for address in addresses
+        ]
+        self.health_check_interval = health_check_interval
+        self.max_sessions = max_sessions
+        self._affinity: OrderedDict[str, PoolNode] = OrderedDict()
+        self._health_task: Optional[asyncio.Task] = None
+        self._next = 0
+
+    def __enter__(self) -> Self:
+        for node in self.nodes:
+            node.client.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        for node in self.nodes:
+            node.client.__exit__(exc_type, exc_val, exc_tb)
+
+    def sampling_options(self) -> dict:
+        # Every node runs the same model with the same settings
+        return self.nodes[0].client.sampling_options()
+
+    def is_deterministic(self) -> bool:
+        return self.nodes[0].client.is_deterministic()
+
+    def _pick(self, key: Optional[str], exclude: list[PoolNode]) -> PoolNode:
+        if key and (node := self._affinity.get(key)):
+            if node.healthy and node not in exclude:
+                self._affinity.move_to_end(key)
+                return node
+
+        candidates = [
+            node for node in self.nodes if node.healthy and node not in exclude
+        ]
+        if not candidates:
+            raise NoHealthyEndpointError("No healthy Ollama endpoint is available")
+
+        # Least outstanding requests, ties are broken round robin
+        self._next = (self._next + 1) % len(self.nodes)
+        node = min(
+            candidates,
+            key=lambda n: (
+                n.outstanding,
+                (self.nodes.index(n) - self._next) % len(self.nodes),
+            ),
+        )
+
+        if key:
+            self._affinity[key] = node
+            self._affinity.move_to_end(key)
+            if len(self._affinity) > self.max_sessions:
+                self._affinity.popitem(last=False)
+
+        return node
+
+    def _mark_failed(self, node: PoolNode) -> None:
+        node.healthy = False
+        node.failures += 1
+        if self.telemetry:
+            self.telemetry.increment("pool_failovers")
+        self._ensure_health_checks()
+
+    async def _run(self, key: Optional[str], make_stream) -> AsyncGenerator:
+        tried: list[PoolNode] = []
+
+        while True:
+            node = self._pick(key, tried)
+            tried.append(node)
+            node.outstanding += 1
+            started = False
+
+            try:
+                async for response in make_stream(node.client):
+                    started = True
+                    yield response
+                node.served += 1
+                return
+            except Exception as e:
+                # Once the answer started streaming, there is nothing to fail over
+                if started or not _is_node_failure(e):
+                    raise
+                self._mark_failed(node)
+            finally:
+                node.outstanding -= 1
+
+    async def chat(
+        self,
+        messages: list[dict],
+        tools: Optional[list[dict]] = None,
+        limits: Optional[StreamLimits] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> AsyncGenerator[OllamaChatResponse, None]:
+        self._ensure_health_checks()
+
+        async for response in self._run(
+            session_key(messages),
+            lambda client: client.chat(messages, tools, limits, cancel),
+        ):
+            yield response
+
+    async def generate(
+        self,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        structure: Optional[type[BaseModel]] = None,
+    ) -> AsyncGenerator[OllamaResponse, None]:
+        self._ensure_health_checks()
+
+        async for response in self._run(
+            None, lambda client: client.generate(prompt, context, structure)
+        ):
+            yield response
+
+    async def check_health(self, node: PoolNode) -> bool:
+        try:
+            async with httpx.AsyncClient(timeout=2) as http:
+                response = await http.get(f"{node.address}/api/version")
+            node.healthy = response.status_code == httpx.codes.OK
+        except httpx.HTTPError:
+            node.healthy = False
+
+        return node.healthy
+
+    def _ensure_health_checks(self) -> None:
+        if self._health_task and not self._health_task.done():
+            return
+
+        try:
+            self._health_task = asyncio.get_running_loop().create_task(
+                self._health_loop()
+            )
+        except RuntimeError:
+            # No event loop yet, the first request will start the checks
+            pass
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.gather(*(self.check_health(node) for node in self.nodes))
+            await asyncio.sleep(self.health_check_interval)
+
+    async def aclose(self) -> None:
+        if self._health_task:
+            self._health_task.cancel()
+            await asyncio.wait([self._health_task])
+            self._health_task = None
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "address": node.address,
+                "healthy": node.healthy,
+                "outstanding": node.outstanding,
+                "served": node.served,
+                "failures": node.failures,
+            }
+            for node in self.nodes
+        ]
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import AsyncGenerator, Optional, List
+
+from pydantic import BaseModel
+
+from ai.base_model import BaseAIModel
+from ai.cancellation import CancelToken, StreamGuard, StreamLimits
+from ai.ollama_response import OllamaChatResponse, OllamaResponse
+from ai.telemetry import TelemetryCollector
+
+
+class ReplayMismatchError(Exception):
+    pass
+
+
+class SessionRecorder:
+    """
+    Records every request payload and every streamed response line to JSONL.
+
+    Each request gets an exchange id; its lines are written with the offset in
+    seconds from the moment the request was sent, so a replay can reproduce
+    the original pacing.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._started: dict[int, float] = {}
+        self._file = open(path, "a")
+
+    def record_request(self, endpoint: str, payload: dict) -> int:
+        if "messages" in payload:
+            # Loads contents a MessageHistory keeps in a BlobStore
+            payload = {**payload, "messages": list(payload["messages"])}
+
+        with self._lock:
+            exchange_id = self._next_id
+            self._next_id += 1
+            self._started[exchange_id] = time.perf_counter()
+            self._write(
+                {
+                    "type": "request",
+                    "id": exchange_id,
+                    "endpoint": endpoint,
+                    "time": time.time(),
+                    "payload": payload,
+                }
+            )
+        return exchange_id
+
+    def record_line(self, exchange_id: int, line: str) -> None:
+        with self._lock:
+            self._write(
+                {
+                    "type": "line",
+                    "id": exchange_id,
+                    "offset": time.perf_counter() - self._started[exchange_id],
+                    "line": line,
+                }
+            )
+
+    def end_exchange(self, exchange_id: int) -> None:
+        with self._lock:
+            self._started.pop(exchange_id, None)
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def _write(self, record: dict) -> None:
+        self._file.write(json.dumps(record) + "\n")
+
+
+class RecordedExchange(BaseModel):
+    endpoint: str
+    payload: dict
+    lines: list[tuple[float, str]] = []
+
+
+def load_session(path: str) -> list[RecordedExchange]:
+    """Reads a recording back, exchanges in the order they were requested"""
+    exchanges: dict[int, RecordedExchange] = {}
+
+    with open(path) as f:
+        for raw in f:
+            if not raw.strip():
+                continue
+
+            record = json.loads(raw)
+            if record["type"] == "request":
+                exchanges[record["id"]] = RecordedExchange(
+                    endpoint=record["endpoint"], payload=record["payload"]
+                )
+            elif record["type"] == "line" and record["id"] in exchanges:
+                exchanges[record["id"]].lines.append((record["offset"], record["line"]))
+
+    return [exchanges[exchange_id] for exchange_id in sorted(exchanges)]
+
+
+class ReplayModel(BaseAIModel):
+    """
+    Plays a recorded session back instead of talking to a model.
+
+    Chat and generate requests are answered with the recorded exchanges for
+    that endpoint, in order. With realtime=True the lines are emitted at the
+    recorded offsets, otherwise as fast as possible. With strict=True the
+    messages/prompt of every request must match the recording exactly.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        realtime: bool = False,
+        strict: bool = False,
+        telemetry: Optional[TelemetryCollector] = None,
+    ) -> None:
+        self.realtime = realtime
+        self.strict = strict
+        self.telemetry = telemetry
+        self.exchanges: dict[str, deque[RecordedExchange]] = {}
+
+        for exchange in load_session(path):
+            self.exchanges.setdefault(exchange.endpoint, deque()).append(exchange)
+
+        self.model = next(
+            (
+                queue[0].payload.get("model", "replay")
+                for queue in self.exchanges.values()
+                if queue
+            ),
+            "replay",
+        )
+
+    def _next_exchange(self, endpoint: str, key: str, value) -> RecordedExchange:
+        queue = self.exchanges.get(endpoint)
+        if not queue:
+            raise ReplayMismatchError(f"No recorded exchanges left for {endpoint}")
+
+        exchange = queue.popleft()
+        if self.strict and exchange.payload.get(key) != value:
+            raise ReplayMismatchError(
+                f"Request to {endpoint} does not match the recording ({key} differs)"
+            )
+
+        return exchange
+
+    async def _replay_lines(self, exchange: RecordedExchange):
+        started = time.perf_counter()
+
+        for offset, line in exchange.lines:
+            if self.realtime:
+                delay = offset - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            if line.strip():
+                yield json.loads(line)
+
+    async def chat(
+        self,
+        messages: list[dict],
+        tools: Optional[list[dict]] = None,
+        limits: Optional[StreamLimits] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> AsyncGenerator[OllamaChatResponse, None]:
+        exchange = self._next_exchange("/api/chat", "messages", messages)
+        turn = self.telemetry.begin_turn("chat", self.model) if self.telemetry else None
+
+        responses = (
+            OllamaChatResponse(**data) async for data in self._replay_lines(exchange)
+        )
+        guard = StreamGuard(limits, cancel) if limits or cancel else None
+        if guard:
+            responses = guard.watch(responses)
+
+        async with aclosing(responses):
+            async for response in responses:
+                if turn:
+                    turn.observe(response)
+
+                yield response
+
+        if guard and guard.stopped_reason:
+            if self.telemetry:
+                self.telemetry.increment(f"stream_stopped_{guard.stopped_reason}")
+            yield guard.stopped_response(self.model)
+
+    async def generate(
+        self,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        structure: Optional[type[BaseModel]] = None,
+    ) -> AsyncGenerator[OllamaResponse, None]:
+        exchange = self._next_exchange("/api/generate", "prompt", prompt)
+        turn = (
+            self.telemetry.begin_turn("generate", self.model)
+            if self.telemetry
+            else None
+        )
+
+        async for data in self._replay_lines(exchange):
+            response = OllamaResponse(**data)
+
+            if turn:
+                turn.observe(response)
+
+            yield response
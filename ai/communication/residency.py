@@ -0,0 +1,100 @@
+import threading
+from typing import Optional
+
+import httpx
+
+
+def _full_name(model: str) -> str:
+    return model if ":" in model else f"{model}:latest"
+
+
+class ModelResidency:
+    """
+    Keeps the model loaded on the server between runs.
+
+    Instead of force loading on start and unloading with keep_alive 0 on exit,
+    it checks /api/ps first, loads in the background only when needed (so the
+    load overlaps with whatever the program does on startup) and leaves the
+    model resident for keep_alive after the program exits, unless told to
+    unload it.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        model: str,
+        keep_alive: str | int = "30m",
+        unload_on_exit: bool = False,
+        options: Optional[dict] = None,
+    ) -> None:
+        self.endpoint = endpoint
+        self.model = model
+        self.keep_alive = keep_alive
+        self.unload_on_exit = unload_on_exit
+        # Options that decide how the model is loaded, such as num_ctx
+        self.options = options
+        self._warm_up: Optional[threading.Thread] = None
+        self.warm_up_error: Optional[Exception] = None
+
+    def is_loaded(self) -> bool:
+        response = httpx.get(f"{self.endpoint}/api/ps", timeout=5)
+        response.raise_for_status()
+
+        name = _full_name(self.model)
+        return any(
+            _full_name(model.get("model") or model.get("name", "")) == name
+            for model in response.json().get("models", [])
+        )
+
+    def load(self) -> None:
+        """Loads the model (blocking) unless it is already resident"""
+        if self.is_loaded():
+            return
+
+        payload = {"model": self.model, "keep_alive": self.keep_alive}
+        if self.options:
+            payload["options"] = self.options
+
+        response = httpx.post(
+            f"{self.endpoint}/api/generate", json=payload, timeout=None
+        )
+        assert response.json()["done"], "Could not load the model"
+
+    def start_warm_up(self) -> None:
+        """Loads the model on a background thread"""
+        if self._warm_up and self._warm_up.is_alive():
+            return
+
+        def warm_up() -> None:
+            try:
+                self.load()
+            except Exception as e:
+                # The first request will load the model anyway, just slower
+                self.warm_up_error = e
+
+        self._warm_up = threading.Thread(target=warm_up, daemon=True)
+        self._warm_up.start()
+
+    def wait_until_warm(self, timeout: Optional[float] = None) -> bool:
+        if self._warm_up:
+            self._warm_up.join(timeout)
+            return not self._warm_up.is_alive()
+        return True
+
+    def unload(self) -> None:
+        response = httpx.post(
+            f"{self.endpoint}/api/generate",
+            json={"model": self.model, "keep_alive": 0},
+        )
+
+        assert response.json()["done"], "Model couldn't be offloaded"
+
+    def release(self) -> bool:
+        """Unloads the model if configured to, returns whether it did"""
+        if not self.unload_on_exit:
+            return False
+
+        # Don't let a warm up still in flight load it right back
+        self.wait_until_warm()
+        self.unload()
+        return True
@@ -0,0 +1,234 @@
+"""
+Answers repeated requests from disk instead of the model.
+
+Re-running a review after a crash, or a CI retry, sends the very same requests
+again. With deterministic sampling (a fixed seed, a low temperature) the model
+would answer them the very same way, so the streamed answer is stored under a
+hash of everything that decides it and played back as a stream next time.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import zlib
+from dataclasses import asdict
+from typing import AsyncGenerator, List, Optional
+
+from pydantic import BaseModel
+
+from ai.base_model import BaseAIModel
+from ai.cancellation import CancelToken, StreamLimits
+from ai.ollama_response import OllamaChatResponse, OllamaResponse
+
+# Limits that cut a stream the same way every time, unlike timeouts and cancels
+DETERMINISTIC_STOPS = {"stopped:tool_call", "stopped:max_tokens", "stopped:repetition"}
+
+
+def request_key(model: BaseAIModel, endpoint: str, request: dict) -> str:
+    """A hash of the request, the model and its sampling options"""
+    canonical = json.dumps(
+        {
+            "endpoint": endpoint,
+            "model": getattr(model, "model", type(model).__name__),
+            "options": model.sampling_options(),
+            **request,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Streamed answers on disk, one compressed file per request. Once the files
+    take more than max_bytes, the least recently used ones are removed.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self.size = sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self) -> list[os.DirEntry]:
+        with os.scandir(self.directory) as entries:
+            return [entry for entry in entries if entry.name.endswith(".z")]
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.z")
+
+    def get(self, key: str) -> Optional[list[dict]]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                chunks = json.loads(zlib.decompress(f.read()))
+            # The modification time orders entries for eviction
+            os.utime(path)
+        except (OSError, zlib.error, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return chunks
+
+    def put(self, key: str, chunks: list[dict]) -> None:
+        data = zlib.compress(json.dumps(chunks).encode(), 1)
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+
+        with self._lock:
+            try:
+                self.size -= os.path.getsize(path)
+            except OSError:
+                pass
+
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+            self.size += len(data)
+
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime_ns)
+        # The newest entry stays even when it alone is over the limit
+        for entry in entries[:-1]:
+            if self.size <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.unlink(entry.path)
+            except OSError:
+                continue
+            self.size -= size
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes": self.size,
+            }
+
+
+def _cacheable(chunks: list[BaseModel]) -> bool:
+    if not chunks or not getattr(chunks[-1], "done", False):
+        # The stream broke off, or the consumer stopped reading
+        return False
+
+    reason = getattr(chunks[-1], "done_reason", None) or ""
+    return not reason.startswith("stopped:") or reason in DETERMINISTIC_STOPS
+
+
+class CachedModel(BaseAIModel):
+    """
+    Wraps a model and answers from a ResponseCache. Requests only go through
+    the cache while the model is deterministic, otherwise they are passed on.
+    """
+
+    def __init__(self, model: BaseAIModel, cache: ResponseCache) -> None:
+        self.inner = model
+        self.cache = cache
+        self.model = getattr(model, "model", type(model).__name__)
+        self.telemetry = model.telemetry
+
+    def sampling_options(self) -> dict:
+        return self.inner.sampling_options()
+
+    def is_deterministic(self) -> bool:
+        return self.inner.is_deterministic()
+
+    def _count(self, hit: bool) -> None:
+        if self.telemetry:
+            self.telemetry.increment(
+                "response_cache_hits" if hit else "response_cache_misses"
+            )
+
+    async def chat(
+        self,
+        messages: list[dict],
+        tools: Optional[list[dict]] = None,
+        limits: Optional[StreamLimits] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> AsyncGenerator[OllamaChatResponse, None]:
+        stream = self.inner.chat(messages, tools, limits, cancel)
+        if not self.is_deterministic():
+            async for response in stream:
+                yield response
+            return
+
+        limit_settings = asdict(limits) if limits else None
+        if limit_settings:
+            # The wall clock limit only cuts slow streams, which are not stored
+            limit_settings.pop("max_seconds")
+        key = request_key(
+            self,
+            "/api/chat",
+            {"messages": list(messages), "tools": tools, "limits": limit_settings},
+        )
+
+        if (chunks := self.cache.get(key)) is not None:
+            self._count(hit=True)
+            await stream.aclose()
+            for chunk in chunks:
+                yield OllamaChatResponse(**chunk)
+            return
+
+        self._count(hit=False)
+        received = []
+        async for response in stream:
+            received.append(response)
+            yield response
+
+        if _cacheable(received):
+            self.cache.put(key, [response.model_dump() for response in received])
+
+    async def generate(
+        self,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        structure: Optional[type[BaseModel]] = None,
+    ) -> AsyncGenerator[OllamaResponse, None]:
+        stream = self.inner.generate(prompt, context, structure)
+        if not self.is_deterministic():
+            async for response in stream:
+                yield response
+            return
+
+        key = request_key(
+            self,
+            "/api/generate",
+            {
+                "prompt": prompt,
+                "context": context,
+                "format": structure.model_json_schema() if structure else None,
+            },
+        )
+
+        if (chunks := self.cache.get(key)) is not None:
+            self._count(hit=True)
+            await stream.aclose()
+            for chunk in chunks:
+                yield OllamaResponse(**chunk)
+            return
+
+        self._count(hit=False)
+        received = []
+        async for response in stream:
+            received.append(response)
+            yield response
+
+        if _cacheable(received):
+            self.cache.put(key, [response.model_dump() for response in received])
@@ -0,0 +1,181 @@
+import asyncio
+import inspect
+import json
+import time
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from ai.agents.decisions import AgentDecision
+from ai.base_model import BaseAIModel
+from ai.graph.nodes import ActionNode, DecisionNode, ForkNode, Node, ParallelNode
+from ai.ollama_response import OllamaResponse
+from ai.tool_definitions import Tool, validate_tool_arguments
+from tools import TOOLS
+
+
+class NodeTimeoutError(Exception):
+    def __init__(self, node: str, timeout: float) -> None:
+        super().__init__(f"Node '{node}' did not finish within {timeout}s")
+        self.node = node
+
+
+@dataclass
+class NodeTrace:
+    node: str
+    kind: str
+    # Seconds since the start of the run
+    started: float
+    duration: float
+    outcome: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "node": self.node,
+            "kind": self.kind,
+            "started": self.started,
+            "duration": self.duration,
+            "outcome": self.outcome,
+            "error": self.error,
+        }
+
+
+@dataclass
+class GraphRun:
+    """Everything one execution of a graph produced"""
+
+    started_at: float = field(default_factory=time.perf_counter)
+    decisions: dict[str, bool] = field(default_factory=dict)
+    results: dict[str, Any] = field(default_factory=dict)
+    traces: list[NodeTrace] = field(default_factory=list)
+    # In flight and finished information tool calls, shared by all branches
+    memo: dict[str, asyncio.Future] = field(default_factory=dict)
+    memo_hits: int = 0
+
+
+def _node_name(node: Node) -> str:
+    return node.name or f"{type(node).__name__}@{id(node):x}"
+
+
+class GraphEngine:
+    """
+    Executes graphs built from ai/graph/nodes.py.
+
+    Branches of a ParallelNode run concurrently. Information tools are
+    memoized per run by name and arguments, so branches asking for the same
+    file share one call even while it is still running. Every node gets a
+    timeout and leaves a timing trace on the run.
+    """
+
+    def __init__(
+        self,
+        model: BaseAIModel,
+        tools: Optional[dict[str, Callable]] = None,
+        node_timeout: Optional[float] = None,
+    ) -> None:
+        self.model = model
+        self.tools = tools if tools is not None else TOOLS
+        self.node_timeout = node_timeout
+
+    async def run(self, node: Node, run: Optional[GraphRun] = None) -> GraphRun:
+        run = run or GraphRun()
+        await self._walk(node, run)
+        return run
+
+    async def _walk(self, node: Optional[Node], run: GraphRun) -> None:
+        while node is not None:
+            if isinstance(node, ParallelNode):
+                await self._timed(
+                    node,
+                    run,
+                    asyncio.gather(
+                        *(self._walk(branch, run) for branch in node.branches)
+                    ),
+                )
+                node = node.next
+            else:
+                node = await self._timed(node, run, self._step(node, run))
+
+    async def _timed(self, node: Node, run: GraphRun, work) -> Any:
+        name = _node_name(node)
+        timeout = node.timeout if node.timeout is not None else self.node_timeout
+        started = time.perf_counter()
+        trace = NodeTrace(name, type(node).__name__, started - run.started_at, 0.0)
+        run.traces.append(trace)
+
+        try:
+            result = await asyncio.wait_for(work, timeout)
+        except TimeoutError:
+            trace.error = "timeout"
+            raise NodeTimeoutError(name, timeout or 0)
+        except Exception as e:
+            trace.error = str(e)
+            raise
+        finally:
+            trace.duration = time.perf_counter() - started
+
+        if name in run.decisions:
+            trace.outcome = "left" if run.decisions[name] else "right"
+        return result
+
+    async def _step(self, node: Node, run: GraphRun) -> Optional[Node]:
+        if isinstance(node, DecisionNode):
+            return await self._decide(node, run)
+        if isinstance(node, ForkNode):
+            go_left = node.logic(run) == "left"
+            run.decisions[_node_name(node)] = go_left
+            return node.left if go_left else node.right
+        if isinstance(node, ActionNode):
+            run.results[_node_name(node)] = await self._call(
+                node.action_tool, node.arguments
+            )
+            return node.next
+
+        raise TypeError(f"Don't know how to execute {type(node).__name__}")
+
+    async def _call(self, tool: Tool, arguments: dict) -> Any:
+        function = self.tools.get(tool.function.name)
+        if not function:
+            raise KeyError(f"Tool '{tool.function.name}' does not exist")
+
+        arguments = validate_tool_arguments(tool.function.name, arguments)
+        if inspect.iscoroutinefunction(function):
+            return await function(**arguments)
+        # The tools do blocking file IO, keep them off the event loop
+        return await asyncio.to_thread(function, **arguments)
+
+    async def _information(self, tool: Tool, arguments: dict, run: GraphRun) -> Any:
+        key = tool.function.name + json.dumps(arguments, sort_keys=True)
+        if key in run.memo:
+            run.memo_hits += 1
+            return await asyncio.shield(run.memo[key])
+
+        future = asyncio.ensure_future(self._call(tool, arguments))
+        run.memo[key] = future
+        return await asyncio.shield(future)
+
+    async def _decide(self, node: DecisionNode, run: GraphRun) -> Optional[Node]:
+        information = await asyncio.gather(
+            *(
+                self._information(
+                    tool, node.information_arguments.get(tool.function.name, {}), run
+                )
+                for tool in node.information_tools
+            )
+        )
+
+        prompt = node.prompt
+        for tool, result in zip(node.information_tools, information):
+            prompt += f"\n\nResult of {tool.function.name}:\n{result}"
+
+        # Closing the stream gives back the scheduler slot and the connection
+        async with aclosing(
+            self.model.generate(prompt, structure=AgentDecision)
+        ) as stream:
+            response: OllamaResponse = await anext(stream)
+        decision = AgentDecision.model_validate_json(response.response)
+
+        go_ahead = decision.should_do and decision.confidence > node.min_confidence
+        run.decisions[_node_name(node)] = go_ahead
+        return node.left if go_ahead else node.right
@@ -1,22 +1,38 @@
-from typing import Callable, Literal
+from typing import Any, Callable, Literal, Optional
 from pydantic import BaseModel
 
 from ai.tool_definitions import Tool
 
 
-class Node(BaseModel): ...
+class Node(BaseModel):
+    name: str = ""
+    # Seconds the node's own work may take, None falls back to the engine's
+    timeout: Optional[float] = None
 
 
 class DecisionNode(Node):
     information_tools: list[Tool]
-    left: Node
-    right: Node
+    # left when the model decides to go ahead, right otherwise. None ends the branch
+    left: Optional[Node]
+    right: Optional[Node]
+    prompt: str = ""
+    information_arguments: dict[str, dict[str, Any]] = {}
+    min_confidence: float = 0.5
 
 
 class ForkNode(Node):
-    left: Node
-    right: Node
+    left: Optional[Node]
+    right: Optional[Node]
     logic: Callable[..., Literal["left", "right"]]
 
 class ActionNode(Node):
     action_tool: Tool
+    arguments: dict[str, Any] = {}
+    next: Optional[Node] = None
+
+
+class ParallelNode(Node):
+    """Runs independent branches at the same time, then continues with next"""
+
+    branches: list[Node]
+    next: Optional[Node] = None
@@ -0,0 +1,72 @@
+"""
+Inference settings per phase of the agent.
+
+A yes/no gate needs a few tokens at temperature 0, writing a review needs
+thousands and a context that fits the tool outputs. The settings go to Ollama
+as options, the block a request is made in picks the profile:
+
+    with use_profile(PROFILES["gating"]):
+        ...
+
+Every profile uses the same num_ctx on purpose: Ollama reloads the model when
+a request asks for another context size than the one it was loaded with.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, fields
+from typing import Optional
+
+# Room for the instructions, a dozen paged tool outputs and the answer
+CONTEXT_SIZE = 32768
+
+
+@dataclass(frozen=True)
+class InferenceProfile:
+    name: str = "default"
+    num_ctx: Optional[int] = CONTEXT_SIZE
+    # The most tokens an answer may have, -1 is unlimited
+    num_predict: Optional[int] = None
+    temperature: Optional[float] = None
+    stop: Optional[tuple[str, ...]] = None
+    num_thread: Optional[int] = None
+    # Not an option but a request field, None keeps the client's
+    keep_alive: Optional[str | int] = None
+
+    def options(self) -> dict:
+        options = {
+            field.name: getattr(self, field.name)
+            for field in fields(self)
+            if field.name not in ("name", "keep_alive")
+            and getattr(self, field.name) is not None
+        }
+        if "stop" in options:
+            options["stop"] = list(options["stop"])
+        return options
+
+
+PROFILES = {
+    # Answers a small JSON object, nothing else
+    "gating": InferenceProfile("gating", num_predict=128, temperature=0.0),
+    "todo": InferenceProfile("todo", num_predict=1024),
+    # As long as the stream limits allow a turn to be
+    "review": InferenceProfile("review", num_predict=4096),
+}
+
+_profile: ContextVar[Optional[InferenceProfile]] = ContextVar(
+    "inference_profile", default=None
+)
+
+
+@contextmanager
+def use_profile(profile: InferenceProfile):
+    """Runs the model requests made inside the block with profile"""
+    token = _profile.set(profile)
+    try:
+        yield
+    finally:
+        _profile.reset(token)
+
+
+def current_profile() -> Optional[InferenceProfile]:
+    return _profile.get()
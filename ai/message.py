@@ -1,4 +1,7 @@
-from typing import Literal, Optional, TypedDict
+from typing import Iterable, Iterator, Literal, Optional, SupportsIndex, TypedDict
+
+from ai.blobs import BlobRef, BlobStore
+from ai.serialization import dumps
 
 
 class AgentMessage(TypedDict):
@@ -6,3 +9,183 @@ class AgentMessage(TypedDict):
     content: str
     images: Optional[list[str]]
     tool_calls: Optional[list[dict]]
+
+
+# A message whose content lives in a BlobStore: the encoded message up to the
+# content's value, and the reference to the content
+_Deferred = tuple[bytes, BlobRef]
+
+
+class MessageHistory(list):
+    """
+    The conversation, plus every message already encoded to JSON.
+
+    Messages are serialized once when they are appended, so a chat request
+    only joins the cached bytes instead of re-encoding the whole history on
+    every turn. The cache is matched by identity: a message that was replaced,
+    inserted or removed any other way is simply encoded again when needed.
+    Messages are treated as immutable once they are in the history.
+
+    With a BlobStore, long contents are moved out of memory: the list holds
+    the message with a BlobRef as its content, reading a message loads the
+    text back, and encoded() splices it in while the request body is built.
+    Everything that puts messages in goes through the store, everything that
+    hands them out or looks them up sees the text, and what takes them out
+    releases their blobs.
+    """
+
+    def __init__(
+        self, messages: Iterable[dict] = (), blobs: Optional[BlobStore] = None
+    ) -> None:
+        super().__init__()
+        self.blobs = blobs
+        self._encoded: list[tuple[dict, bytes | _Deferred]] = []
+        self.extend(messages)
+
+    def _is_long(self, message: dict) -> bool:
+        content = message.get("content")
+        return (
+            self.blobs is not None
+            and isinstance(content, str)
+            and len(content) >= self.blobs.min_chars
+        )
+
+    def _store(self, message: dict) -> dict:
+        """The message as the list holds it, its long content put in the store"""
+        if self._is_long(message):
+            return {**message, "content": self.blobs.put(message["content"])}
+        return message
+
+    def _stored(self, message: dict) -> dict:
+        """The same without writing anything, for looking a message up"""
+        if self._is_long(message):
+            return {**message, "content": self.blobs.ref(message["content"])}
+        return message
+
+    def append(self, message: dict) -> None:
+        message = self._store(message)
+        super().append(message)
+        self._encoded.append((message, self._encode(message)))
+
+    def extend(self, messages: Iterable[dict]) -> None:
+        for message in messages:
+            self.append(message)
+
+    def __iadd__(self, messages: Iterable[dict]) -> "MessageHistory":
+        self.extend(messages)
+        return self
+
+    def __add__(self, messages: list) -> list[dict]:
+        return list(self) + list(messages)
+
+    def insert(self, index: SupportsIndex, message: dict) -> None:
+        super().insert(index, self._store(message))
+
+    def _release(self, messages: Iterable[dict]) -> None:
+        for message in messages:
+            if isinstance(message.get("content"), BlobRef):
+                self.blobs.release(message["content"])
+
+    def release(self) -> None:
+        """Gives the blobs back to the store, the history is empty afterwards"""
+        self.clear()
+
+    def __setitem__(self, index, value) -> None:
+        old = super().__getitem__(index)
+        if isinstance(index, slice):
+            super().__setitem__(index, [self._store(message) for message in value])
+        else:
+            super().__setitem__(index, self._store(value))
+        self._release(old if isinstance(index, slice) else [old])
+
+    def __delitem__(self, index) -> None:
+        old = super().__getitem__(index)
+        super().__delitem__(index)
+        self._release(old if isinstance(index, slice) else [old])
+
+    def clear(self) -> None:
+        old = list(super().__iter__())
+        super().clear()
+        self._encoded.clear()
+        self._release(old)
+
+    def pop(self, index: SupportsIndex = -1) -> dict:
+        message = super().pop(index)
+        loaded = self._load(message)
+        self._release([message])
+        return loaded
+
+    def copy(self) -> list[dict]:
+        return list(self)
+
+    def __contains__(self, message: object) -> bool:
+        if not isinstance(message, dict):
+            return False
+        return super().__contains__(self._stored(message))
+
+    def index(self, message: dict, *args) -> int:
+        return super().index(self._stored(message), *args)
+
+    def count(self, message: dict) -> int:
+        return super().count(self._stored(message))
+
+    def remove(self, message: dict) -> None:
+        del self[self.index(message)]
+
+    def _encode(self, message: dict) -> bytes | _Deferred:
+        content = message.get("content")
+        if not isinstance(content, BlobRef):
+            return dumps(message)
+
+        # The content goes last, the order of the keys doesn't matter
+        head = b"".join(
+            dumps(name) + b":" + dumps(value) + b","
+            for name, value in message.items()
+            if name != "content"
+        )
+        return b"{" + head + b'"content":', content
+
+    def _load(self, message: dict) -> dict:
+        content = message.get("content")
+        if isinstance(content, BlobRef):
+            return {**message, "content": self.blobs.get(content)}
+        return message
+
+    def __getitem__(self, index):
+        item = super().__getitem__(index)
+        if isinstance(index, slice):
+            return [self._load(message) for message in item]
+        return self._load(item)
+
+    def __iter__(self) -> Iterator[dict]:
+        return map(self._load, super().__iter__())
+
+    def __reversed__(self) -> Iterator[dict]:
+        return map(self._load, super().__reversed__())
+
+    def __eq__(self, other: object) -> bool:
+        # Compared by what the messages say, not by how they are stored
+        if not isinstance(other, list):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __ne__(self, other: object) -> bool:
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def encoded(self) -> list[bytes]:
+        segments = []
+        for index, message in enumerate(super().__iter__()):
+            if index >= len(self._encoded) or self._encoded[index][0] is not message:
+                # The list was changed by something other than append, resync
+                del self._encoded[index:]
+                self._encoded.append((message, self._encode(message)))
+
+            segment = self._encoded[index][1]
+            if isinstance(segment, tuple):
+                head, ref = segment
+                segment = head + dumps(self.blobs.get(ref)) + b"}"
+            segments.append(segment)
+
+        del self._encoded[len(self) :]
+        return segments
@@ -0,0 +1,293 @@
+"""
+Semantic retrieval over the repository.
+
+Source files are split on AST boundaries (functions, classes, methods), the
+chunks are embedded in batches and the vectors kept in a memory-mapped float32
+matrix next to a small JSON file describing the rows. Updates only embed
+chunks whose content hash is new, everything else is copied over.
+"""
+
+import ast
+import hashlib
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from tools.ignore import IgnoreMatcher
+from tools.read_file import is_sensitive
+
+SOURCE_EXTENSIONS = {
+    ".py",
+    ".md",
+    ".txt",
+    ".toml",
+    ".cfg",
+    ".ini",
+    ".yaml",
+    ".yml",
+    ".sql",
+    ".js",
+    ".ts",
+}
+MAX_CHUNK_LINES = 80
+MAX_CHUNK_CHARS = 4000
+
+
+@dataclass
+class Chunk:
+    path: str
+    start: int
+    end: int
+    name: str
+    text: str
+
+    @property
+    def hash(self) -> str:
+        return hashlib.sha1(f"{self.path}\0{self.text}".encode()).hexdigest()
+
+
+def _windows(path: str, lines: list[str], start: int, end: int, name: str):
+    """Splits lines start..end (1-based, inclusive) into chunks of bounded size"""
+    for first in range(start, end + 1, MAX_CHUNK_LINES):
+        last = min(first + MAX_CHUNK_LINES - 1, end)
+        text = "".join(lines[first - 1 : last])[:MAX_CHUNK_CHARS]
+        if text.strip():
+            yield Chunk(path, first, last, name, text)
+
+
+def chunk_python(path: str, source: str) -> list[Chunk]:
+    """
+    One chunk per top level function and per method, classes keep their
+    header (everything before the first method), the remaining module level
+    code is grouped between the definitions.
+    """
+    lines = source.splitlines(keepends=True)
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return list(_windows(path, lines, 1, len(lines), path))
+
+    chunks: list[Chunk] = []
+    covered_until = 0
+
+    def definition_start(node: ast.AST) -> int:
+        decorators = getattr(node, "decorator_list", [])
+        return min([node.lineno] + [d.lineno for d in decorators])
+
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+
+        start, end = definition_start(node), node.end_lineno or node.lineno
+        if start - 1 > covered_until:
+            chunks.extend(_windows(path, lines, covered_until + 1, start - 1, path))
+
+        methods = [
+            child
+            for child in node.body
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+        ]
+        if isinstance(node, ast.ClassDef) and methods:
+            header_end = definition_start(methods[0]) - 1
+            chunks.extend(_windows(path, lines, start, header_end, node.name))
+            for method in methods:
+                chunks.extend(
+                    _windows(
+                        path,
+                        lines,
+                        definition_start(method),
+                        method.end_lineno or method.lineno,
+                        f"{node.name}.{method.name}",
+                    )
+                )
+        else:
+            chunks.extend(_windows(path, lines, start, end, node.name))
+
+        covered_until = end
+
+    if covered_until < len(lines):
+        chunks.extend(_windows(path, lines, covered_until + 1, len(lines), path))
+
+    return chunks
+
+
+def chunk_file(path: str, source: str) -> list[Chunk]:
+    if path.endswith(".py"):
+        return chunk_python(path, source)
+    lines = source.splitlines(keepends=True)
+    return list(_windows(path, lines, 1, len(lines), path))
+
+
+def collect_chunks(root: str) -> list[Chunk]:
+    chunks: list[Chunk] = []
+
+    matcher = IgnoreMatcher(root=root)
+    for directory, directories, files in os.walk(root):
+        matcher.enter(directory)
+        directories[:] = sorted(
+            name
+            for name in directories
+            if not name.startswith(".")
+            and not matcher.is_ignored(os.path.join(directory, name), True)
+        )
+        for name in sorted(files):
+            path = os.path.relpath(os.path.join(directory, name), root)
+            if os.path.splitext(name)[1] not in SOURCE_EXTENSIONS:
+                continue
+            if is_sensitive(path) or matcher.is_ignored(
+                os.path.join(directory, name), False
+            ):
+                continue
+
+            try:
+                with open(os.path.join(root, path), encoding="utf-8") as f:
+                    source = f.read()
+            except (OSError, UnicodeDecodeError):
+                continue
+
+            chunks.extend(chunk_file(path, source))
+
+    return chunks
+
+
+class EmbeddingIndex:
+    """
+    Cosine top-k search over the repository's chunks.
+
+    Stored in index_dir as vectors.f32 (rows x dim, normalized, memory
+    mapped) and chunks.json (the row metadata and the chunk hashes).
+    """
+
+    def __init__(self, index_dir: str, embed: Callable[[list[str]], list]) -> None:
+        if np is None:
+            raise ImportError(
+                "The embedding index needs numpy, install the 'search' extra"
+            )
+
+        self.index_dir = index_dir
+        self.embed = embed
+        self.chunks: list[dict] = []
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+        self.embedded_last_update = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.index_dir, "vectors.f32")
+
+    @property
+    def _chunks_path(self) -> str:
+        return os.path.join(self.index_dir, "chunks.json")
+
+    def _load(self) -> None:
+        try:
+            with open(self._chunks_path) as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+
+        rows, dim = len(meta["chunks"]), meta["dim"]
+        if rows and dim:
+            self.vectors = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=(rows, dim)
+            )
+        self.chunks = meta["chunks"]
+
+    def update(self, root: str = ".") -> int:
+        """Re-chunks root and embeds what changed, returns how many chunks it embedded"""
+        chunks = collect_chunks(root)
+        with self._lock:
+            known = {chunk["hash"]: row for row, chunk in enumerate(self.chunks)}
+            vectors = self.vectors
+
+        new = [chunk for chunk in chunks if chunk.hash not in known]
+        embedded = self._embed_chunks(new)
+        if (
+            embedded is not None
+            and len(vectors)
+            and embedded.shape[1] != vectors.shape[1]
+        ):
+            # Another embedding model, none of the stored vectors can be reused
+            known, vectors, new = {}, vectors[:0], chunks
+            embedded = self._embed_chunks(new)
+
+        dim = embedded.shape[1] if embedded is not None else vectors.shape[1]
+        os.makedirs(self.index_dir, exist_ok=True)
+        temp_path = self._vectors_path + ".tmp"
+        matrix = None
+        if chunks and dim:
+            matrix = np.memmap(
+                temp_path, dtype=np.float32, mode="w+", shape=(len(chunks), dim)
+            )
+
+        fresh = iter(embedded if embedded is not None else [])
+        metadata = []
+        for row, chunk in enumerate(chunks):
+            if matrix is not None:
+                matrix[row] = (
+                    vectors[known[chunk.hash]] if chunk.hash in known else next(fresh)
+                )
+            metadata.append({**asdict(chunk), "hash": chunk.hash})
+
+        if matrix is not None:
+            matrix.flush()
+            del matrix
+            os.replace(temp_path, self._vectors_path)
+
+        with open(self._chunks_path + ".tmp", "w") as f:
+            json.dump({"dim": dim, "chunks": metadata}, f)
+
+        with self._lock:
+            os.replace(self._chunks_path + ".tmp", self._chunks_path)
+            self.chunks = []
+            self.vectors = np.zeros((0, 0), dtype=np.float32)
+            self._load()
+
+        self.embedded_last_update = len(new)
+        return len(new)
+
+    def _embed_chunks(self, chunks: list[Chunk]):
+        if not chunks:
+            return None
+        vectors = self.embed([chunk.text for chunk in chunks])
+        return self._normalize(np.asarray(vectors, dtype=np.float32))
+
+    @staticmethod
+    def _normalize(vectors):
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def search(self, query: str, top_k: int = 5) -> list[tuple[float, dict]]:
+        with self._lock:
+            chunks, vectors = self.chunks, self.vectors
+        if not chunks:
+            return []
+
+        vector = self._normalize(np.asarray(self.embed([query])[0], dtype=np.float32))
+        scores = vectors @ vector
+
+        top_k = min(top_k, len(chunks))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [(float(scores[row]), chunks[row]) for row in best]
+
+
+_index: Optional[EmbeddingIndex] = None
+
+
+def set_index(index: Optional[EmbeddingIndex]) -> None:
+    """Makes the index available to the semantic_search tool"""
+    global _index
+    _index = index
+
+
+def get_index() -> Optional[EmbeddingIndex]:
+    return _index
@@ -0,0 +1,223 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import AsyncGenerator, List, Optional
+
+from pydantic import BaseModel
+
+from ai.base_model import BaseAIModel
+from ai.cancellation import CancelToken, StreamLimits
+from ai.ollama_response import OllamaChatResponse, OllamaResponse
+
+
+class Priority(IntEnum):
+    """Lower value wins"""
+
+    INTERACTIVE = 0
+    GATE = 1
+    BATCH = 2
+
+
+_priority_override: ContextVar[Optional[Priority]] = ContextVar(
+    "priority_override", default=None
+)
+
+
+@contextmanager
+def use_priority(priority: Priority):
+    """Runs the model requests made inside the block with another priority"""
+    token = _priority_override.set(priority)
+    try:
+        yield
+    finally:
+        _priority_override.reset(token)
+
+
+@dataclass
+class _WaitStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+
+@dataclass
+class _PriorityClass:
+    # Sessions with waiting requests, served round robin
+    sessions: deque[str] = field(default_factory=deque)
+    waiters: dict[str, deque[asyncio.Future]] = field(default_factory=dict)
+    stats: _WaitStats = field(default_factory=_WaitStats)
+
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.waiters.values())
+
+
+class RequestScheduler:
+    """
+    Decides which model request runs next when several agents share a backend.
+
+    At most max_concurrency requests run at once (match it to the server's
+    OLLAMA_NUM_PARALLEL). Waiting requests are served by priority class first,
+    and round robin between sessions inside a class, so one session cannot
+    starve the others by queueing many requests.
+    """
+
+    def __init__(self, max_concurrency: int = 1) -> None:
+        self.max_concurrency = max_concurrency
+        self.running = 0
+        self._classes = {priority: _PriorityClass() for priority in Priority}
+
+    @asynccontextmanager
+    async def slot(self, session: str, priority: Priority):
+        await self._acquire(session, priority)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, session: str, priority: Priority) -> None:
+        started = time.perf_counter()
+        queued = self._classes[priority]
+
+        if self.running < self.max_concurrency and not self.queue_depth():
+            self.running += 1
+            queued.stats.add(0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        if session not in queued.waiters:
+            queued.waiters[session] = deque()
+            queued.sessions.append(session)
+        queued.waiters[session].append(future)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # We were handed a slot just as we got cancelled, pass it on
+                self._release()
+            else:
+                self._forget(queued, session, future)
+            raise
+
+        queued.stats.add(time.perf_counter() - started)
+
+    def _forget(self, queued: _PriorityClass, session: str, future) -> None:
+        waiters = queued.waiters.get(session)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del queued.waiters[session]
+                queued.sessions.remove(session)
+
+    def _release(self) -> None:
+        self.running -= 1
+
+        for priority in Priority:
+            queued = self._classes[priority]
+            if not queued.sessions:
+                continue
+
+            session = queued.sessions.popleft()
+            waiters = queued.waiters[session]
+            future = waiters.popleft()
+            if waiters:
+                queued.sessions.append(session)
+            else:
+                del queued.waiters[session]
+
+            self.running += 1
+            future.set_result(None)
+            return
+
+    def queue_depth(self, priority: Optional[Priority] = None) -> int:
+        if priority is not None:
+            return self._classes[priority].depth()
+        return sum(queued.depth() for queued in self._classes.values())
+
+    def metrics(self) -> dict:
+        return {
+            "running": self.running,
+            "max_concurrency": self.max_concurrency,
+            "classes": {
+                priority.name.lower(): {
+                    "queue_depth": queued.depth(),
+                    "waiting_sessions": len(queued.sessions),
+                    "requests": queued.stats.count,
+                    "wait_seconds_total": queued.stats.total,
+                    "wait_seconds_max": queued.stats.max,
+                }
+                for priority, queued in self._classes.items()
+            },
+        }
+
+    def gauges(self) -> dict[str, float]:
+        values: dict[str, float] = {"running": self.running}
+        for priority, queued in self._classes.items():
+            name = priority.name.lower()
+            values[f"{name}_queue_depth"] = queued.depth()
+            values[f"{name}_wait_seconds_total"] = queued.stats.total
+            values[f"{name}_wait_seconds_max"] = queued.stats.max
+            values[f"{name}_requests"] = queued.stats.count
+        return values
+
+    def client(
+        self,
+        model: BaseAIModel,
+        session: str,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> "ScheduledModel":
+        return ScheduledModel(model, self, session, priority)
+
+
+class ScheduledModel(BaseAIModel):
+    """
+    One session's view of a shared model: every request waits for a slot from
+    the scheduler and holds it until its stream is finished or abandoned.
+    """
+
+    def __init__(
+        self,
+        model: BaseAIModel,
+        scheduler: RequestScheduler,
+        session: str,
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> None:
+        self.inner = model
+        self.scheduler = scheduler
+        self.session = session
+        self.priority = priority
+        self.telemetry = model.telemetry
+
+    def _priority(self) -> Priority:
+        override = _priority_override.get()
+        return self.priority if override is None else override
+
+    async def chat(
+        self,
+        messages: list[dict],
+        tools: Optional[list[dict]] = None,
+        limits: Optional[StreamLimits] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> AsyncGenerator[OllamaChatResponse, None]:
+        async with self.scheduler.slot(self.session, self._priority()):
+            async for response in self.inner.chat(messages, tools, limits, cancel):
+                yield response
+
+    async def generate(
+        self,
+        prompt: str,
+        context: Optional[List[int]] = None,
+        structure: Optional[type[BaseModel]] = None,
+    ) -> AsyncGenerator[OllamaResponse, None]:
+        async with self.scheduler.slot(self.session, self._priority()):
+            async for response in self.inner.generate(prompt, context, structure):
+                yield response
@@ -0,0 +1,42 @@
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(value: Any) -> bytes:
+    """Compact JSON as bytes, with orjson when it is installed"""
+    # A MessageHistory, its list may hold references in place of the contents
+    if isinstance(value, list) and hasattr(value, "encoded"):
+        return join_array(value.encoded())
+
+    if orjson:
+        try:
+            return orjson.dumps(value)
+        except TypeError:
+            # Values orjson refuses (huge ints, non str keys) are rare enough
+            pass
+
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(data: bytes) -> Any:
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def join_array(segments: list[bytes]) -> bytes:
+    return b"[" + b",".join(segments) + b"]"
+
+
+def build_object(fields: dict[str, bytes]) -> bytes:
+    """A JSON object out of values that are already encoded"""
+    return (
+        b"{"
+        + b",".join(dumps(name) + b":" + value for name, value in fields.items())
+        + b"}"
+    )
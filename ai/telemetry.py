@@ -0,0 +1,362 @@
+import json
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+from ai.ollama_response import BaseOllamaResponse
+
+NANOSECONDS = 1_000_000_000
+
+
+@dataclass
+class TurnTelemetry:
+    """Everything we know about a single chat/generate round trip"""
+
+    kind: str
+    model: str
+    started_at: float
+    timestamp: float = field(default_factory=time.time)
+    time_to_first_token: Optional[float] = None
+    wall_time: Optional[float] = None
+    total_duration: Optional[int] = None
+    load_duration: Optional[int] = None
+    prompt_eval_count: Optional[int] = None
+    prompt_eval_duration: Optional[int] = None
+    eval_count: Optional[int] = None
+    eval_duration: Optional[int] = None
+    done_reason: Optional[str] = None
+    tool_time: float = 0.0
+    tool_calls: dict[str, float] = field(default_factory=dict)
+
+    def mark_first_token(self) -> None:
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.perf_counter() - self.started_at
+
+    def observe(self, response: BaseOllamaResponse) -> None:
+        message = getattr(response, "message", None)
+        if getattr(response, "response", None) or (
+            message and (message.content or message.tool_calls)
+        ):
+            self.mark_first_token()
+
+        if response.done:
+            self.apply_response(response)
+
+    def apply_response(self, response: BaseOllamaResponse) -> None:
+        """Copies the server side timings from the final (done) chunk"""
+        self.wall_time = time.perf_counter() - self.started_at
+        self.total_duration = response.total_duration
+        self.load_duration = response.load_duration
+        self.prompt_eval_count = response.prompt_eval_count
+        self.prompt_eval_duration = response.prompt_eval_duration
+        self.eval_count = response.eval_count
+        self.eval_duration = response.eval_duration
+        self.done_reason = response.done_reason
+
+    def record_tool(self, tool_name: str, seconds: float) -> None:
+        self.tool_time += seconds
+        self.tool_calls[tool_name] = self.tool_calls.get(tool_name, 0.0) + seconds
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        return _rate(self.eval_count, self.eval_duration)
+
+    @property
+    def prompt_eval_rate(self) -> Optional[float]:
+        return _rate(self.prompt_eval_count, self.prompt_eval_duration)
+
+    @property
+    def load_seconds(self) -> float:
+        return (self.load_duration or 0) / NANOSECONDS
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["tokens_per_second"] = self.tokens_per_second
+        data["prompt_eval_rate"] = self.prompt_eval_rate
+        return data
+
+
+def _rate(count: Optional[int], duration_ns: Optional[int]) -> Optional[float]:
+    if not count or not duration_ns:
+        return None
+    return count / (duration_ns / NANOSECONDS)
+
+
+_current_turn: ContextVar[Optional[TurnTelemetry]] = ContextVar(
+    "current_turn", default=None
+)
+
+
+class TelemetryCollector:
+    """
+    Collects per-turn inference telemetry.
+
+    The model client opens a turn for every request and fills in the timings,
+    the agent adds the time it spends in tools afterwards. A turn is finished
+    (written to the JSONL file and added to the Prometheus metrics) when the
+    same task starts its next turn or ends it, or when the collector is flushed.
+    """
+
+    def __init__(
+        self,
+        jsonl_path: Optional[str] = None,
+        prometheus_path: Optional[str] = None,
+        load_stall_threshold: float = 1.0,
+    ) -> None:
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.load_stall_threshold = load_stall_threshold
+
+        self._lock = threading.Lock()
+        self._open_turns: list[TurnTelemetry] = []
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._gauge_sources: dict[str, Callable[[], dict[str, float]]] = {}
+
+        self.turns: dict[str, int] = {}
+        self.counters: dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.eval_tokens = 0
+        self.prompt_eval_seconds = 0.0
+        self.eval_seconds = 0.0
+        self.load_seconds = 0.0
+        self.total_seconds = 0.0
+        self.load_stalls = 0
+        self.ttft_sum = 0.0
+        self.ttft_count = 0
+        self.tool_seconds: dict[str, float] = {}
+        self.tool_calls: dict[str, int] = {}
+        self.last_tokens_per_second: Optional[float] = None
+        self.last_prompt_eval_rate: Optional[float] = None
+
+    def begin_turn(self, kind: str, model: str) -> TurnTelemetry:
+        previous = _current_turn.get()
+        if previous is not None:
+            self._finish(previous)
+
+        turn = TurnTelemetry(kind=kind, model=model, started_at=time.perf_counter())
+        with self._lock:
+            self._open_turns.append(turn)
+        _current_turn.set(turn)
+
+        return turn
+
+    def end_turn(self) -> None:
+        """
+        Finishes the current task's turn. A task that stops talking to the model
+        calls this, or its last turn stays open until the collector is flushed.
+        """
+        turn = _current_turn.get()
+        if turn is not None:
+            self._finish(turn)
+            _current_turn.set(None)
+
+    def record_tool(self, tool_name: str, seconds: float) -> None:
+        with self._lock:
+            self.tool_seconds[tool_name] = (
+                self.tool_seconds.get(tool_name, 0.0) + seconds
+            )
+            self.tool_calls[tool_name] = self.tool_calls.get(tool_name, 0) + 1
+
+        turn = _current_turn.get()
+        if turn is not None:
+            turn.record_tool(tool_name, seconds)
+
+    def register_gauges(
+        self, prefix: str, source: Callable[[], dict[str, float]]
+    ) -> None:
+        """Exports the values returned by source as gauges on every scrape"""
+        self._gauge_sources[prefix] = source
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def flush(self) -> None:
+        with self._lock:
+            open_turns = list(self._open_turns)
+
+        for turn in open_turns:
+            self._finish(turn)
+
+        _current_turn.set(None)
+        self.write_prometheus()
+
+    def close(self) -> None:
+        self.flush()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _finish(self, turn: TurnTelemetry) -> None:
+        with self._lock:
+            if turn not in self._open_turns:
+                return
+            self._open_turns.remove(turn)
+
+            self.turns[turn.kind] = self.turns.get(turn.kind, 0) + 1
+            self.prompt_tokens += turn.prompt_eval_count or 0
+            self.eval_tokens += turn.eval_count or 0
+            self.prompt_eval_seconds += (turn.prompt_eval_duration or 0) / NANOSECONDS
+            self.eval_seconds += (turn.eval_duration or 0) / NANOSECONDS
+            self.load_seconds += turn.load_seconds
+            self.total_seconds += (turn.total_duration or 0) / NANOSECONDS
+
+            if turn.load_duration and turn.load_seconds >= self.load_stall_threshold:
+                self.load_stalls += 1
+
+            if turn.time_to_first_token is not None:
+                self.ttft_sum += turn.time_to_first_token
+                self.ttft_count += 1
+
+            if turn.tokens_per_second is not None:
+                self.last_tokens_per_second = turn.tokens_per_second
+            if turn.prompt_eval_rate is not None:
+                self.last_prompt_eval_rate = turn.prompt_eval_rate
+
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a") as f:
+                    f.write(json.dumps(turn.to_dict()) + "\n")
+
+    def prometheus_text(self) -> str:
+        # Sources take their own locks, read them before taking ours
+        gauges = {
+            prefix: source() for prefix, source in list(self._gauge_sources.items())
+        }
+
+        with self._lock:
+            lines = []
+
+            def metric(name: str, kind: str, help_text: str, samples: list) -> None:
+                lines.append(f"# HELP review_agent_{name} {help_text}")
+                lines.append(f"# TYPE review_agent_{name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"review_agent_{name}{labels} {value}")
+
+            metric(
+                "turns_total",
+                "counter",
+                "Model requests by kind",
+                [(f'{{kind="{kind}"}}', count) for kind, count in self.turns.items()],
+            )
+            metric(
+                "prompt_tokens_total",
+                "counter",
+                "Prompt tokens evaluated",
+                [("", self.prompt_tokens)],
+            )
+            metric(
+                "eval_tokens_total",
+                "counter",
+                "Tokens generated",
+                [("", self.eval_tokens)],
+            )
+            metric(
+                "prompt_eval_seconds_total",
+                "counter",
+                "Server time spent evaluating prompts",
+                [("", self.prompt_eval_seconds)],
+            )
+            metric(
+                "eval_seconds_total",
+                "counter",
+                "Server time spent generating tokens",
+                [("", self.eval_seconds)],
+            )
+            metric(
+                "load_seconds_total",
+                "counter",
+                "Server time spent loading the model",
+                [("", self.load_seconds)],
+            )
+            metric(
+                "request_seconds_total",
+                "counter",
+                "Total server time reported for requests",
+                [("", self.total_seconds)],
+            )
+            metric(
+                "load_stalls_total",
+                "counter",
+                "Requests that waited on a model load",
+                [("", self.load_stalls)],
+            )
+            metric(
+                "time_to_first_token_seconds",
+                "summary",
+                "Client side time to first token",
+                [("_sum", self.ttft_sum), ("_count", self.ttft_count)],
+            )
+            metric(
+                "tool_seconds_total",
+                "counter",
+                "Time spent executing tools",
+                [(f'{{tool="{n}"}}', s) for n, s in self.tool_seconds.items()],
+            )
+            metric(
+                "tool_calls_total",
+                "counter",
+                "Executed tool calls",
+                [(f'{{tool="{n}"}}', c) for n, c in self.tool_calls.items()],
+            )
+            if self.last_tokens_per_second is not None:
+                metric(
+                    "tokens_per_second",
+                    "gauge",
+                    "Generation speed of the last turn",
+                    [("", self.last_tokens_per_second)],
+                )
+            if self.last_prompt_eval_rate is not None:
+                metric(
+                    "prompt_eval_tokens_per_second",
+                    "gauge",
+                    "Prompt evaluation speed of the last turn",
+                    [("", self.last_prompt_eval_rate)],
+                )
+            for name, value in self.counters.items():
+                metric(
+                    f"{name}_total", "counter", name.replace("_", " "), [("", value)]
+                )
+            for prefix, values in gauges.items():
+                for key, value in values.items():
+                    metric(
+                        f"{prefix}_{key}",
+                        "gauge",
+                        f"{prefix} {key}".replace("_", " "),
+                        [("", value)],
+                    )
+
+            return "\n".join(lines) + "\n"
+
+    def write_prometheus(self) -> None:
+        if not self.prometheus_path:
+            return
+
+        with open(self.prometheus_path, "w") as f:
+            f.write(self.prometheus_text())
+
+    def serve_prometheus(self, host: str = "127.0.0.1", port: int = 9464) -> None:
+        """Serves the metrics on http://host:port/metrics from a daemon thread"""
+        collector = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = collector.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
@@ -1,8 +1,30 @@
 from dataclasses import dataclass
 import inspect
+import json
 import re
-from typing import Any, Callable, Dict, List, Optional, Union, get_type_hints
-from pydantic import BaseModel, Field
+import types
+from typing import (
+    Annotated,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Union,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
+from pydantic import (
+    BaseModel,
+    BeforeValidator,
+    ConfigDict,
+    Field,
+    TypeAdapter,
+    ValidationError,
+    create_model,
+)
+from ai.retrieval import get_index
 from tools import TOOLS
 
 
@@ -52,7 +74,8 @@ class ToolResult:
         return self.err is None
 
     def get_val(self) -> Any:
-        assert self.ok is not None
+        # Tools like update_todo legitimately return None
+        assert self.err is None
 
         return self.ok
 
@@ -62,6 +85,100 @@ class ToolResult:
         return self.err
 
 
+class ToolArgumentError(Exception):
+    """The model called a tool with arguments that don't match its signature"""
+
+    def __init__(self, tool_name: str, errors: list[str]) -> None:
+        super().__init__(f"Invalid arguments for '{tool_name}': " + "; ".join(errors))
+        self.tool_name = tool_name
+        self.errors = errors
+
+
+def _accepts_list(python_type: Any) -> bool:
+    if get_origin(python_type) is list:
+        return True
+    return any(_accepts_list(arg) for arg in get_args(python_type))
+
+
+def _coerce_to_list(value: Any) -> Any:
+    """Models often send '["a", "b"]' or just "a" where an array is expected"""
+    if not isinstance(value, str):
+        return value
+
+    if value.strip().startswith("["):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            pass
+
+    return [value]
+
+
+def _create_tool_validator(func: Callable) -> TypeAdapter:
+    """
+    Compiles a validator for the arguments of a tool from its signature, the
+    same signature its JSON schema is generated from. Lax mode already turns
+    "true" into True and "2" into 2, lists also accept a single string.
+    """
+    type_hints = get_type_hints(func)
+    fields: Dict[str, Any] = {}
+
+    for param_name, param in inspect.signature(func).parameters.items():
+        param_type = type_hints.get(param_name, str)
+        if _accepts_list(param_type):
+            param_type = Annotated[param_type, BeforeValidator(_coerce_to_list)]
+
+        default = ... if param.default is inspect.Parameter.empty else param.default
+        fields[param_name] = (param_type, default)
+
+    model = create_model(
+        f"{func.__name__}_arguments",
+        __config__=ConfigDict(extra="forbid", arbitrary_types_allowed=True),
+        **fields,
+    )
+    return TypeAdapter(model)
+
+
+def _format_validation_error(error: ValidationError) -> list[str]:
+    messages = []
+    for detail in error.errors():
+        location = ".".join(str(part) for part in detail["loc"]) or "arguments"
+        if detail["type"] == "missing":
+            messages.append(f"'{location}' is required")
+        elif detail["type"] == "extra_forbidden":
+            messages.append(f"'{location}' is not a parameter of this tool")
+        else:
+            messages.append(f"'{location}': {detail['msg']} (got {detail['input']!r})")
+    return messages
+
+
+_TOOL_VALIDATORS = {
+    tool_name: _create_tool_validator(tool_func)
+    for tool_name, tool_func in TOOLS.items()
+}
+
+
+def validate_tool_arguments(tool_name: str, arguments: Dict[str, Any]) -> dict:
+    """
+    Checks and coerces the arguments before the tool runs, so a mistake costs
+    a precise error message instead of a failed execution.
+
+    Raises:
+        ToolArgumentError: If the arguments can't be made to fit the signature
+    """
+    validator = _TOOL_VALIDATORS.get(tool_name)
+    if not validator:
+        return arguments
+
+    try:
+        validated = validator.validate_python(arguments)
+    except ValidationError as e:
+        raise ToolArgumentError(tool_name, _format_validation_error(e)) from e
+
+    # Only pass what the model sent, the defaults stay the function's business
+    return {name: getattr(validated, name) for name in arguments}
+
+
 # THE CODE BELOW IS AI GARBAGE!!!!
 # ||||||||||||||||||||||||||||||||
 # VVVVVVVVVVVVVVVVVVVVVVVVVVVVVVVV
@@ -79,15 +196,15 @@ def _python_type_to_json_schema(python_type: type) -> Dict[str, Any]:
         return {"type": "boolean"}
     elif python_type is type(None):
         return {"type": "null"}
-    elif hasattr(python_type, "__origin__"):
+    elif get_origin(python_type):
         # Handle typing constructs like List, Union, etc.
-        origin = python_type.__origin__
+        origin = get_origin(python_type)
         if origin is list:
-            item_type = python_type.__args__[0] if python_type.__args__ else str
+            item_type = get_args(python_type)[0] if get_args(python_type) else str
             return {"type": "array", "items": _python_type_to_json_schema(item_type)}
-        elif origin == Union:
-            # Handle Union types (including Optional)
-            args = python_type.__args__
+        elif origin in (Union, types.UnionType):
+            # Handle Union types (including Optional and X | None)
+            args = get_args(python_type)
             if len(args) == 2 and type(None) in args:
                 # Optional[T] case
                 non_none_type = args[0] if args[1] is type(None) else args[1]
@@ -133,13 +250,21 @@ def _generate_tool_examples(func: Callable) -> str:
     elif func_name == "read_file":
         return 'read_file(file_path="src/main.py")'
     elif func_name == "write_review":
-        return 'write_review(review="Excellent code structure", file_to_write="review.txt")'
+        return (
+            'write_review(review="Excellent code structure", file_to_write="review.md")\n'
+            'write_review(review="- Unclosed session in save_messages", '
+            'file_to_write="review.md", section="main.py", mode="append")'
+        )
     elif func_name == "write_todos":
         return 'write_todos(requirements=["Implement feature X", "Write unit tests", "Update documentation"])'
     elif func_name == "update_todo":
         return "update_todo(todo_id=0, new_status=True)"
     elif func_name == "remove_todo":
         return "remove_todo(todo_id=2)"
+    elif func_name == "semantic_search":
+        return 'semantic_search(query="where are database sessions closed", top_k=5)'
+    elif func_name == "read_more":
+        return 'read_more(handle="3f2a9c1b", page=1)'
 
     return f"{func_name}(...)"
 
@@ -181,6 +306,15 @@ def _create_tool_schema(func: Callable) -> Dict[str, Any]:
                 param_schema["description"] = (
                     "The file path where the review should be written"
                 )
+            elif param_name == "section":
+                param_schema["description"] = (
+                    "Only write this section of the review, e.g. a file name or a topic"
+                )
+            elif param_name == "mode":
+                param_schema["description"] = (
+                    "'replace' rewrites the section (or file), 'append' adds to its end"
+                )
+                param_schema["enum"] = ["replace", "append"]
             elif param_name == "requirements":
                 param_schema["description"] = (
                     "List of requirement strings to add as todo items"
@@ -189,6 +323,18 @@ def _create_tool_schema(func: Callable) -> Dict[str, Any]:
                 param_schema["description"] = (
                     "The index of the todo item in the list (0-based)"
                 )
+            elif param_name == "query":
+                param_schema["description"] = (
+                    "What to look for, in plain words or as code"
+                )
+            elif param_name == "top_k":
+                param_schema["description"] = "How many results to return"
+            elif param_name == "handle":
+                param_schema["description"] = (
+                    "The handle given at the end of a truncated tool result"
+                )
+            elif param_name == "page":
+                param_schema["description"] = "The page to read (0-based)"
             elif param_name == "new_status":
                 param_schema["description"] = (
                     "The new completion status (True for complete, False for incomplete)"
@@ -212,6 +358,13 @@ def _create_tool_schema(func: Callable) -> Dict[str, Any]:
         )
 
 
+def _is_available(tool_name: str) -> bool:
+    """A tool that can only fail costs the model a whole pass to find out"""
+    if tool_name == "semantic_search":
+        return get_index() is not None
+    return True
+
+
 # Tool schema generation using reflection
 # Automatically converts Python type hints to JSON Schema for Ollama API
 def generate_ollama_tools() -> List[Tool]:
@@ -227,6 +380,9 @@ def generate_ollama_tools() -> List[Tool]:
     tools = []
 
     for tool_name, tool_func in TOOLS.items():
+        if not _is_available(tool_name):
+            continue
+
         try:
             # Extract function description
             description = _extract_function_description(tool_func)
@@ -0,0 +1,44 @@
+"""
+Runs the tool calls of a turn while the model is still generating.
+
+Ollama sends tool calls on intermediate chunks, not only the last one. Each
+call is started the moment it arrives, so a slow read or search overlaps with
+the rest of the generation instead of waiting for the stream to end. Calls
+still run one after another in the order they arrived: a write_review followed
+by a read_file of the same file must not race.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from ai.tool_definitions import ToolCall, ToolResult
+
+
+class ToolDispatcher:
+    def __init__(self, call: Callable[[ToolCall], Awaitable[ToolResult]]) -> None:
+        self._call = call
+        self._tasks: list[asyncio.Task] = []
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def submit(self, tool_call: ToolCall) -> None:
+        previous = self._tasks[-1] if self._tasks else None
+        self._tasks.append(asyncio.create_task(self._run(previous, tool_call)))
+
+    async def _run(
+        self, previous: Optional[asyncio.Task], tool_call: ToolCall
+    ) -> ToolResult:
+        if previous:
+            # Whatever the previous call did, this one runs after it
+            await asyncio.wait([previous])
+        return await self._call(tool_call)
+
+    async def results(self) -> list[ToolResult]:
+        """The results, in the order the calls were submitted"""
+        return list(await asyncio.gather(*self._tasks))
+
+    def cancel(self) -> None:
+        """Drops the calls that have not started, a running sync tool finishes"""
+        for task in self._tasks:
+            task.cancel()
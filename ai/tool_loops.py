@@ -0,0 +1,110 @@
+"""
+Notices a model calling the same tool with the same arguments over and over.
+
+Small local models often get stuck re-reading one file or re-listing one
+directory, and every round trip is a full prompt evaluation. A repeated read
+is answered with the result it got before, without running the tool, plus a
+nudge to move on; after max_repeats repeats control goes back to the user.
+Tools that change something always run, removing the first todo twice is
+legitimate, but their repeats are counted all the same.
+"""
+
+import json
+import os
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from ai.telemetry import TelemetryCollector
+from ai.tool_definitions import ToolResult
+
+# Calling these again only makes sense if something was written in between
+READ_ONLY_TOOLS = {"read_file", "explore_structure", "semantic_search", "read_more"}
+
+
+def _normalize(name: str, value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            key: _normalize(key, item)
+            for key, item in sorted(value.items())
+            if item is not None
+        }
+    if isinstance(value, list):
+        return [_normalize(name, item) for item in value]
+    if isinstance(value, str):
+        value = value.strip()
+        # ./main.py and main.py are the same file
+        if name.endswith(("path", "file", "directory")) and value:
+            value = os.path.normpath(value)
+    return value
+
+
+def call_key(tool_name: str, arguments: dict) -> str:
+    return tool_name + json.dumps(
+        _normalize("", arguments), sort_keys=True, default=str
+    )
+
+
+@dataclass
+class LoopCheck:
+    # How often the very same call was made within the window before this one
+    repeats: int
+    # What a read returned last time, served instead of running it again
+    cached: Optional[ToolResult]
+    # The model keeps at it, stop and give control back
+    escalate: bool
+
+    def nudge(self, tool_name: str) -> str:
+        if self.cached is None:
+            return (
+                f"\n\nYou already called {tool_name} with these arguments "
+                f"{self.repeats} time(s). Make sure you are not repeating yourself."
+            )
+        return (
+            f"\n\nYou already called {tool_name} with these arguments "
+            f"{self.repeats} time(s), the result is the same as above. Don't call "
+            "it again: use what you have, or do something else."
+        )
+
+
+class ToolLoopDetector:
+    def __init__(
+        self,
+        window: int = 16,
+        max_repeats: int = 3,
+        telemetry: Optional[TelemetryCollector] = None,
+    ) -> None:
+        self.max_repeats = max_repeats
+        self.telemetry = telemetry
+        self._recent: deque[str] = deque(maxlen=window)
+        self._results: dict[str, ToolResult] = {}
+
+    def check(self, tool_name: str, arguments: dict) -> LoopCheck:
+        key = call_key(tool_name, arguments)
+        repeats = self._recent.count(key)
+        self._recent.append(key)
+
+        # Only reads are stored, a write runs again however often it is repeated
+        cached = self._results.get(key) if repeats else None
+        escalate = repeats >= self.max_repeats
+        if self.telemetry and repeats:
+            self.telemetry.increment("tool_loop_repeats")
+        if self.telemetry and escalate:
+            self.telemetry.increment("tool_loop_escalations")
+
+        return LoopCheck(repeats, cached, escalate)
+
+    def record(self, tool_name: str, arguments: dict, result: ToolResult) -> None:
+        key = call_key(tool_name, arguments)
+        if tool_name not in READ_ONLY_TOOLS:
+            # Something was written, reading it again is no longer a loop
+            self._results.clear()
+            self._recent = deque(
+                (recent for recent in self._recent if recent == key),
+                maxlen=self._recent.maxlen,
+            )
+        else:
+            self._results[key] = result
+        # Results of calls that left the window are not needed anymore
+        for stale in self._results.keys() - set(self._recent):
+            del self._results[stale]
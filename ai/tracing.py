@@ -0,0 +1,116 @@
+"""
+Spans over the stages of a turn, exported as Chrome trace events.
+
+Open the exported file in Perfetto (ui.perfetto.dev) or chrome://tracing to
+see where the wall time of an invoke() goes: connecting, waiting for the first
+token, decoding, parsing, tools, building the history.
+
+Tracing is off until a Tracer is set. Off, span() returns a shared no-op
+context manager, so the hooks cost a global lookup and a call.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Optional
+
+
+def _track() -> tuple[int, str]:
+    """Spans of one asyncio task nest, tasks on one thread would not"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+
+    if task is not None:
+        return id(task), task.get_name()
+    thread = threading.current_thread()
+    return thread.ident or 0, thread.name
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.pid = os.getpid()
+        self.events: list[dict] = []
+        self._tracks: dict[int, str] = {}
+        self._started = time.perf_counter_ns()
+
+    def now(self) -> int:
+        """Nanoseconds since the tracer started"""
+        return time.perf_counter_ns() - self._started
+
+    def record(
+        self, name: str, category: str, start: int, end: int, /, **args: Any
+    ) -> None:
+        """A span that was timed by hand, with start and end from now()"""
+        tid, track = _track()
+        self._tracks.setdefault(tid, track)
+        self.events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (end - start) / 1000,
+                "pid": self.pid,
+                "tid": tid,
+                "args": args,
+            }
+        )
+
+    @contextmanager
+    def span(self, name: str, category: str, /, **args: Any):
+        start = self.now()
+        try:
+            yield args
+        finally:
+            self.record(name, category, start, self.now(), **args)
+
+    def to_chrome(self) -> dict:
+        names = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self.pid,
+                "tid": tid,
+                "args": {"name": track},
+            }
+            for tid, track in list(self._tracks.items())
+        ]
+        return {"traceEvents": names + list(self.events), "displayTimeUnit": "ms"}
+
+    def export(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_chrome(), f, default=str)
+
+
+class _Discard(dict):
+    def __setitem__(self, key: str, value: Any) -> None:
+        pass
+
+
+_tracer: Optional[Tracer] = None
+# What the block adds to the args of a span goes nowhere when not tracing
+_NOT_TRACING = nullcontext(_Discard())
+
+
+def set_tracer(tracer: Optional[Tracer]) -> None:
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def span(name: str, category: str = "agent", /, **args: Any):
+    """
+    Times the block as one span. The block gets the span's args and may add
+    to them, for results only known at the end.
+    """
+    if _tracer is None:
+        return _NOT_TRACING
+    return _tracer.span(name, category, **args)
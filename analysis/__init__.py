@@ -0,0 +1,2 @@
+from .checks import CHECKS, Finding, Fingerprint, analyze_source
+from .prepass import AnalysisReport, StaticAnalyzer
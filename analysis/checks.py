@@ -0,0 +1,169 @@
+"""
+Cheap, deterministic checks over a single file's AST.
+
+Everything here must be a pure function of the path and the source, the
+results are cached by content hash and computed in worker processes.
+"""
+
+import ast
+import hashlib
+from dataclasses import dataclass
+
+# Strings and bodies shorter than this are too common to call duplicates
+MIN_DUPLICATE_CHARS = 120
+MIN_DUPLICATE_BODY_CHARS = 50
+
+
+@dataclass(frozen=True)
+class Finding:
+    check: str
+    path: str
+    line: int
+    message: str
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """A function body or long string constant, to spot copies across files"""
+
+    digest: str
+    kind: str
+    name: str
+    path: str
+    line: int
+
+
+def _is_mutable(node: ast.expr) -> bool:
+    if isinstance(node, (ast.List, ast.Dict, ast.Set)):
+        return True
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id in ("list", "dict", "set")
+    )
+
+
+def _used_names(tree: ast.Module) -> set[str]:
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            # Names in string annotations and __all__ count as used
+            names.update(node.value.replace(".", " ").replace("[", " ").split())
+    return names
+
+
+def check_unused_imports(path: str, tree: ast.Module) -> list[Finding]:
+    if path.endswith("__init__.py"):
+        # Imports in a package's __init__ are usually re-exports
+        return []
+
+    used = _used_names(tree)
+    findings = []
+    for node in tree.body:
+        if not isinstance(node, (ast.Import, ast.ImportFrom)):
+            continue
+        if isinstance(node, ast.ImportFrom) and node.module == "__future__":
+            continue
+
+        for alias in node.names:
+            name = alias.asname or alias.name.split(".")[0]
+            if name != "*" and name not in used:
+                findings.append(
+                    Finding(
+                        "unused-import", path, node.lineno, f"'{alias.name}' unused"
+                    )
+                )
+    return findings
+
+
+def check_bare_except(path: str, tree: ast.Module) -> list[Finding]:
+    return [
+        Finding("bare-except", path, node.lineno, "catches everything")
+        for node in ast.walk(tree)
+        if isinstance(node, ast.ExceptHandler) and node.type is None
+    ]
+
+
+def check_mutable_defaults(path: str, tree: ast.Module) -> list[Finding]:
+    findings = []
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+
+        defaults = node.args.defaults + [
+            default for default in node.args.kw_defaults if default is not None
+        ]
+        if any(_is_mutable(default) for default in defaults):
+            findings.append(
+                Finding(
+                    "mutable-default",
+                    path,
+                    node.lineno,
+                    f"{node.name}() shares a mutable default between calls",
+                )
+            )
+    return findings
+
+
+def check_none_comparison(path: str, tree: ast.Module) -> list[Finding]:
+    findings = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Compare):
+            continue
+        for operator, right in zip(node.ops, node.comparators):
+            if isinstance(operator, (ast.Eq, ast.NotEq)) and (
+                isinstance(right, ast.Constant) and right.value is None
+            ):
+                findings.append(
+                    Finding("none-comparison", path, node.lineno, "use 'is None'")
+                )
+    return findings
+
+
+CHECKS = [
+    check_unused_imports,
+    check_bare_except,
+    check_mutable_defaults,
+    check_none_comparison,
+]
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def fingerprints(path: str, tree: ast.Module) -> list[Fingerprint]:
+    prints = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            # The body only: the same code under another name is the point
+            body = "\n".join(ast.unparse(statement) for statement in node.body)
+            if len(body) >= MIN_DUPLICATE_BODY_CHARS:
+                prints.append(
+                    Fingerprint(_digest(body), "function", node.name, path, node.lineno)
+                )
+        elif (
+            isinstance(node, ast.Assign)
+            and isinstance(node.value, ast.Constant)
+            and isinstance(node.value.value, str)
+            and len(node.value.value) >= MIN_DUPLICATE_CHARS
+        ):
+            name = ast.unparse(node.targets[0])
+            prints.append(
+                Fingerprint(
+                    _digest(node.value.value), "string", name, path, node.lineno
+                )
+            )
+    return prints
+
+
+def analyze_source(path: str, source: str) -> tuple[list[Finding], list[Fingerprint]]:
+    try:
+        tree = ast.parse(source)
+    except SyntaxError as e:
+        return [Finding("syntax-error", path, e.lineno or 0, str(e.msg))], []
+
+    findings = [finding for check in CHECKS for finding in check(path, tree)]
+    return findings, fingerprints(path, tree)
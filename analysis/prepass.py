@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from analysis.checks import Finding, Fingerprint, analyze_source
+from tools.ignore import IgnoreMatcher
+
+# Below this many files to analyze, starting worker processes costs more
+MIN_FILES_FOR_POOL = 16
+MAX_FINDINGS_PER_CHECK = 15
+
+
+@dataclass
+class AnalysisReport:
+    findings: list[Finding] = field(default_factory=list)
+    files: int = 0
+    analyzed: int = 0
+
+    def digest(self) -> str:
+        """A compact summary for the model, grouped by check"""
+        if not self.findings:
+            return ""
+
+        by_check: dict[str, list[Finding]] = defaultdict(list)
+        for finding in self.findings:
+            by_check[finding.check].append(finding)
+
+        lines = [
+            f"Static analysis found {len(self.findings)} mechanical issues in "
+            f"{self.files} files. They are certain, don't spend turns confirming "
+            "them, mention the relevant ones in the review:"
+        ]
+        for check, findings in sorted(by_check.items()):
+            shown = [
+                f"{finding.path}:{finding.line} {finding.message}"
+                for finding in findings[:MAX_FINDINGS_PER_CHECK]
+            ]
+            if len(findings) > MAX_FINDINGS_PER_CHECK:
+                shown.append(f"+{len(findings) - MAX_FINDINGS_PER_CHECK} more")
+            lines.append(f"{check}: " + "; ".join(shown))
+
+        return "\n".join(lines)
+
+
+def _python_files(root: str) -> list[str]:
+    matcher = IgnoreMatcher(root=root)
+    files = []
+    for directory, directories, names in os.walk(root):
+        matcher.enter(directory)
+        directories[:] = sorted(
+            name
+            for name in directories
+            if not name.startswith(".")
+            and not matcher.is_ignored(os.path.join(directory, name), True)
+        )
+        for name in sorted(names):
+            path = os.path.join(directory, name)
+            if name.endswith(".py") and not matcher.is_ignored(path, False):
+                files.append(os.path.relpath(path, root))
+    return files
+
+
+def _analyze(job: tuple[str, str]) -> tuple[list[dict], list[dict]]:
+    findings, prints = analyze_source(*job)
+    return [asdict(f) for f in findings], [asdict(p) for p in prints]
+
+
+def _duplicates(prints: list[Fingerprint]) -> list[Finding]:
+    copies: dict[str, list[Fingerprint]] = defaultdict(list)
+    # Long constants of the same name in several files are copies that
+    # already drifted apart, or will
+    namesakes: dict[str, list[Fingerprint]] = defaultdict(list)
+    for fingerprint in prints:
+        copies[fingerprint.digest].append(fingerprint)
+        if fingerprint.kind == "string":
+            namesakes[fingerprint.name].append(fingerprint)
+
+    findings = []
+    reported = set()
+    for group in copies.values():
+        if len(group) < 2:
+            continue
+        first, *others = sorted(group, key=lambda p: (p.path, p.line))
+        for other in others:
+            reported.add(other)
+            findings.append(
+                Finding(
+                    "duplicate-code",
+                    other.path,
+                    other.line,
+                    f"{other.name} is identical to {first.name} "
+                    f"({first.path}:{first.line})",
+                )
+            )
+
+    for group in namesakes.values():
+        first, *others = sorted(group, key=lambda p: (p.path, p.line))
+        for other in others:
+            if other in reported or other.path == first.path:
+                continue
+            findings.append(
+                Finding(
+                    "duplicate-code",
+                    other.path,
+                    other.line,
+                    f"{other.name} is another version of the one in "
+                    f"{first.path}:{first.line}",
+                )
+            )
+    return findings
+
+
+class StaticAnalyzer:
+    """
+    Runs the checks over every Python file of a repository, in worker
+    processes, and remembers the results per file content in cache_path.
+    """
+
+    def __init__(
+        self,
+        cache_path: Optional[str] = ".review-analysis.json",
+        workers: Optional[int] = None,
+    ) -> None:
+        self.cache_path = cache_path
+        self.workers = workers
+        self._cache: dict[str, tuple[list[dict], list[dict]]] = {}
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path) as f:
+                    self._cache = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self._cache = {}
+
+    def run(self, root: str = ".") -> AnalysisReport:
+        jobs: list[tuple[str, str, str]] = []
+        results: dict[str, tuple[list[dict], list[dict]]] = {}
+
+        files = _python_files(root)
+        for path in files:
+            try:
+                with open(os.path.join(root, path), encoding="utf-8") as f:
+                    source = f.read()
+            except (OSError, UnicodeDecodeError):
+                continue
+
+            key = hashlib.sha1(f"{path}\0{source}".encode()).hexdigest()
+            if key in self._cache:
+                results[key] = self._cache[key]
+            else:
+                jobs.append((key, path, source))
+
+        if len(jobs) >= MIN_FILES_FOR_POOL:
+            with ProcessPoolExecutor(self.workers) as pool:
+                computed = pool.map(
+                    _analyze,
+                    [(path, source) for _, path, source in jobs],
+                    chunksize=8,
+                )
+                results.update(zip((key for key, _, _ in jobs), computed))
+        else:
+            for key, path, source in jobs:
+                results[key] = _analyze((path, source))
+
+        # Only what still exists, so the cache does not grow forever
+        self._cache = results
+        self._save()
+
+        report = AnalysisReport(files=len(files), analyzed=len(jobs))
+        prints = []
+        for findings, fingerprints in results.values():
+            report.findings.extend(Finding(**finding) for finding in findings)
+            prints.extend(Fingerprint(**fingerprint) for fingerprint in fingerprints)
+
+        report.findings.extend(_duplicates(prints))
+        report.findings.sort(key=lambda f: (f.check, f.path, f.line))
+        return report
+
+    def _save(self) -> None:
+        if not self.cache_path:
+            return
+
+        temp_path = f"{self.cache_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self._cache, f)
+        os.replace(temp_path, self.cache_path)
@@ -1,6 +1,11 @@
+import argparse
 import asyncio
+import contextlib
 import json
 import logging
+import os
+import threading
+from dataclasses import replace
 
 from sqlalchemy.orm import Session
 from ai.agents.coding_agent import CodeReviewAgent
@@ -10,14 +15,28 @@ from ai.tool_definitions import generate_ollama_tools
 from db.database import DatabaseManager
 
 from db.models import Chat
-from ai.communication import OllamaApiClient
+from ai.communication import (
+    CachedModel,
+    OllamaApiClient,
+    OllamaPool,
+    ResponseCache,
+    SessionRecorder,
+)
+from ai.communication.embeddings import OllamaEmbedder
+from ai.retrieval import EmbeddingIndex, set_index
+from ai.checkpoint import Checkpointer
+from ai.inference import CONTEXT_SIZE, PROFILES, InferenceProfile
+from ai.telemetry import TelemetryCollector
+from ai.tracing import Tracer, set_tracer
+from analysis import StaticAnalyzer
+from tools.read_cache import enable_prefetching, file_cache
 from program_state import ProgramState
 
 log = logging.getLogger("main")
 log.setLevel(logging.DEBUG)
 
 
-async def main() -> None:
+async def main(checkpoint_path: str, resume: bool = False) -> None:
     db_manager = DatabaseManager()
     db_manager.init_models()
 
@@ -45,38 +64,178 @@ async def main() -> None:
         chat = get_or_create_chat(session, "code_review_session")
         messages: list[AgentMessage] = chat.messages or []
 
+    # Spans of every stage, viewable in Perfetto or chrome://tracing
+    trace_path = os.getenv("TRACE")
+    tracer = Tracer() if trace_path else None
+    set_tracer(tracer)
+
+    telemetry = TelemetryCollector(
+        jsonl_path=os.getenv("TELEMETRY_JSONL", "telemetry.jsonl"),
+        prometheus_path=os.getenv("TELEMETRY_PROM"),
+    )
+    if metrics_port := os.getenv("TELEMETRY_PORT"):
+        telemetry.serve_prometheus(port=int(metrics_port))
+
+    recording_path = os.getenv("RECORD_SESSION")
+    recorder = SessionRecorder(recording_path) if recording_path else None
+
+    # The model stays resident for keep_alive after we exit, so the next run
+    # does not pay for loading it again
+    residency = {
+        "keep_alive": os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
+        "unload_on_exit": os.getenv("UNLOAD_ON_EXIT") == "1",
+    }
+    # A fixed seed makes answers repeatable, RESPONSE_CACHE then replays them
+    sampling = {
+        "temperature": float(os.getenv("OLLAMA_TEMPERATURE", "0.1")),
+        "seed": int(seed) if (seed := os.getenv("OLLAMA_SEED")) else None,
+    }
+    # One context size for every phase, another one makes Ollama reload
+    num_ctx = int(os.getenv("OLLAMA_NUM_CTX", str(CONTEXT_SIZE)))
+    profiles = {
+        name: replace(profile, num_ctx=num_ctx) for name, profile in PROFILES.items()
+    }
+    sampling["profile"] = InferenceProfile(num_ctx=num_ctx)
+
+    # Several comma separated hosts turn on load balancing between them
+    addresses = os.getenv("OLLAMA_HOSTS", "localhost:11434").split(",")
+    model_client = (
+        OllamaPool(
+            addresses,
+            "qwen3:8b",
+            telemetry=telemetry,
+            recorder=recorder,
+            **residency,
+            **sampling,
+        )
+        if len(addresses) > 1
+        else OllamaApiClient(
+            addresses[0],
+            "qwen3:8b",
+            telemetry=telemetry,
+            recorder=recorder,
+            **residency,
+            **sampling,
+        )
+    )
+
     # Example AI usage
     messages = []
-    with OllamaApiClient("localhost:11434", "qwen3:8b") as client:
+    with model_client as client, contextlib.closing(telemetry):
+        if cache_dir := os.getenv("RESPONSE_CACHE"):
+            response_cache = ResponseCache(
+                cache_dir, int(os.getenv("RESPONSE_CACHE_MB", "256")) * 1024 * 1024
+            )
+            telemetry.register_gauges("response_cache", response_cache.stats)
+            client = CachedModel(client, response_cache)
+            if not client.is_deterministic():
+                print("RESPONSE_CACHE NEEDS OLLAMA_SEED, NOTHING WILL BE CACHED")
+
+        # Semantic search over the repository, the index updates in the
+        # background and only embeds the chunks that changed since last run
+        if index_dir := os.getenv("SEMANTIC_INDEX"):
+            embedder = OllamaEmbedder(
+                addresses[0], os.getenv("EMBED_MODEL", "nomic-embed-text")
+            )
+            index = EmbeddingIndex(index_dir, embedder.embed)
+            set_index(index)
+            threading.Thread(target=index.update, args=(".",), daemon=True).start()
+
+        # After the index, semantic_search is only offered when there is one
         tools = generate_ollama_tools()
+
+        # The files a module imports are loaded while the model still thinks
+        if os.getenv("PREFETCH", "1") == "1":
+            enable_prefetching(".")
+            telemetry.register_gauges("read_cache", file_cache.stats)
+
         review_agent = CodeReviewAgent(
             client,
             tools=tools,
         )
+        review_agent.profiles.update(profiles)
+
+        checkpointer = Checkpointer(
+            checkpoint_path, float(os.getenv("CHECKPOINT_INTERVAL", "30"))
+        )
         state = ProgramState.USER_CONTROL
-        while True:
-            if state == ProgramState.USER_CONTROL:
-                user_request = input("\nWhat should the agent review?: ")
-                review_agent.add_user_message(
+        # A fresh run leaves the previous checkpoint alone until it has a turn
+        # of its own to save
+        started = resume
+        if resume:
+            state = checkpointer.resume(review_agent)
+            print(f"RESUMED {len(review_agent.messages)} MESSAGES")
+        elif os.getenv("ANALYSIS", "1") == "1":
+            # What a linter finds for certain, the model doesn't have to
+            # discover by reading files
+            analyzer = StaticAnalyzer(
+                os.getenv("ANALYSIS_CACHE", ".review-analysis.json")
+            )
+            report = await asyncio.to_thread(analyzer.run, ".")
+            if digest := report.digest():
+                review_agent.messages.append(
                     {
-                        "role": "user",
-                        "content": user_request,
+                        "role": "system",
+                        "content": digest,
                         "images": None,
                         "tool_calls": None,
                     }
                 )
-
-                if user_request == "exit":
-                    return
-
-            state = await review_agent.invoke()
-
-            log.debug(messages)
-
-            # Save conversation after each agent interaction
-            # with db_manager.get_session() as session:
-            #     save_messages(session, chat.id, messages)
+            print(
+                f"ANALYZED {report.analyzed}/{report.files} FILES, "
+                f"{len(report.findings)} FINDINGS"
+            )
+
+        try:
+            while True:
+                if state == ProgramState.USER_CONTROL:
+                    user_request = input("\nWhat should the agent review?: ")
+                    if user_request == "exit":
+                        if recorder:
+                            recorder.close()
+                        return
+
+                    review_agent.add_user_message(
+                        {
+                            "role": "user",
+                            "content": user_request,
+                            "images": None,
+                            "tool_calls": None,
+                        }
+                    )
+
+                started = True
+                state = await review_agent.invoke()
+                checkpointer.maybe_save(review_agent, state)
+
+                log.debug(messages)
+
+                # Save conversation after each agent interaction
+                # with db_manager.get_session() as session:
+                #     save_messages(session, chat.id, messages)
+        finally:
+            # Also on crashes and Ctrl+C, so --resume picks up from here
+            if started:
+                checkpointer.save(review_agent, state)
+            if tracer and trace_path:
+                tracer.export(trace_path)
+                print(f"TRACE WRITTEN TO {trace_path}")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(
+        description="Review a repository with a local model"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=os.getenv("CHECKPOINT_PATH", "session.ckpt"),
+        help="Where the session is checkpointed",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the session saved in the checkpoint",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(main(args.checkpoint, args.resume))
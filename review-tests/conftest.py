@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+# Add parent directory to path so we can import the project packages
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from mock_ollama import MockOllamaServer
+
+
+@pytest.fixture
+def mock_ollama():
+    with MockOllamaServer() as server:
+        yield server
+
+
+@pytest.fixture
+def large_tree(tmp_path, monkeypatch):
+    """A synthetic repository: 8 packages x 5 modules x 5 nested levels"""
+    for package in range(8):
+        directory = tmp_path / f"package_{package}"
+        for level in range(5):
+            directory.mkdir(parents=True)
+            for module in range(5):
+                (directory / f"module_{module}.py").write_text(
+                    f"import os\n\n\ndef function_{module}():\n    return {level}\n"
+                    * 20
+                )
+            directory = directory / f"level_{level}"
+
+    (tmp_path / "big_module.py").write_text("x = 1\n" * 50_000)
+
+    # The tools only operate inside the current working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,252 @@
+"""
+A small stand-in for the Ollama HTTP API.
+
+It replays scripted NDJSON streams for /api/chat and /api/generate (tool calls
+included) at a configurable token rate and embeds text for /api/embed, so the
+client and the agent loop can be exercised and benchmarked without a model.
+"""
+
+import itertools
+import json
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits text the way a model would roughly stream it: word by word"""
+    return re.findall(r"\s*\S+|\s+$", text)
+
+
+@dataclass
+class Reply:
+    """One scripted model answer"""
+
+    content: str = ""
+    tool_calls: Optional[list[dict]] = None
+    # Text the model keeps generating after the tool calls
+    trailing: str = ""
+    # Server side timings reported on the final chunk
+    load_duration: int = 0
+    prompt_eval_duration: int = 1_000_000
+
+    @classmethod
+    def tool(cls, name: str, **arguments) -> "Reply":
+        return cls(tool_calls=[{"function": {"name": name, "arguments": arguments}}])
+
+
+@dataclass
+class MockOllamaServer:
+    chat_replies: list[Reply] = field(default_factory=lambda: [Reply("Hello!")])
+    generate_replies: list[Reply] = field(
+        default_factory=lambda: [Reply('{"should_do": true, "confidence": 0.9}')]
+    )
+    tokens_per_second: Optional[float] = None
+    embedding_dim: int = 256
+    model: str = "mock-model"
+    host: str = "127.0.0.1"
+    port: int = 0
+
+    def __post_init__(self) -> None:
+        self.requests: list[tuple[str, dict]] = []
+        self.loaded_models: set[str] = set()
+        self._chat = itertools.cycle(self.chat_replies)
+        self._generate = itertools.cycle(self.generate_replies)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def address(self) -> str:
+        assert self._server, "Server is not running"
+        return f"{self.host}:{self._server.server_address[1]}"
+
+    def start(self) -> "MockOllamaServer":
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                mock._handle(self, "GET", {})
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                mock._handle(self, "POST", payload)
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "MockOllamaServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def _next_reply(self, kind: str) -> Reply:
+        with self._lock:
+            return next(self._chat if kind == "chat" else self._generate)
+
+    def _handle(self, handler: BaseHTTPRequestHandler, method: str, payload: dict):
+        with self._lock:
+            self.requests.append((handler.path, payload))
+
+        if handler.path == "/api/chat":
+            self._stream(handler, self._chat_chunks(payload))
+        elif handler.path == "/api/generate":
+            self._generate_response(handler, payload)
+        elif handler.path == "/api/embed":
+            inputs = payload.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            self._send_json(
+                handler,
+                {
+                    "model": payload.get("model", self.model),
+                    "embeddings": [self.embed(text) for text in inputs],
+                },
+            )
+        elif handler.path in ("/api/tags", "/api/ps"):
+            models = [{"name": name, "model": name} for name in self.loaded_models]
+            self._send_json(handler, {"models": models})
+        elif handler.path == "/api/version":
+            self._send_json(handler, {"version": "0.0.0-mock"})
+        else:
+            handler.send_error(404)
+
+    def embed(self, text: str) -> list[float]:
+        """
+        A deterministic bag of words vector: texts sharing words point the same
+        way, which is all a retrieval test needs from an embedding model
+        """
+        vector = [0.0] * self.embedding_dim
+        for word in re.findall(r"[a-z]+", text.lower()):
+            vector[zlib.crc32(word.encode()) % self.embedding_dim] += 1.0
+        return vector
+
+    def _generate_response(self, handler: BaseHTTPRequestHandler, payload: dict):
+        model = payload.get("model", self.model)
+
+        if not payload.get("prompt"):
+            # Load/unload requests carry no prompt
+            if payload.get("keep_alive") == 0:
+                self.loaded_models.discard(model)
+            else:
+                self.loaded_models.add(model)
+            self._send_json(handler, self._final({"response": ""}, model, Reply()))
+            return
+
+        reply = self._next_reply("generate")
+        if payload.get("stream") is False:
+            chunk = self._final({"response": reply.content}, model, reply)
+            self._send_json(handler, chunk)
+            return
+
+        chunks = [
+            {"model": model, "created_at": _now(), "response": token, "done": False}
+            for token in tokenize(reply.content)
+        ]
+        chunks.append(self._final({"response": ""}, model, reply))
+        self._stream(handler, chunks)
+
+    def _chat_chunks(self, payload: dict) -> list[dict]:
+        model = payload.get("model", self.model)
+        reply = self._next_reply("chat")
+
+        chunks = [
+            {
+                "model": model,
+                "created_at": _now(),
+                "message": {"role": "assistant", "content": token},
+                "done": False,
+            }
+            for token in tokenize(reply.content)
+        ]
+        if reply.tool_calls:
+            chunks.append(
+                {
+                    "model": model,
+                    "created_at": _now(),
+                    "message": {
+                        "role": "assistant",
+                        "content": "",
+                        "tool_calls": reply.tool_calls,
+                    },
+                    "done": False,
+                }
+            )
+        chunks.extend(
+            {
+                "model": model,
+                "created_at": _now(),
+                "message": {"role": "assistant", "content": token},
+                "done": False,
+            }
+            for token in tokenize(reply.trailing)
+        )
+        chunks.append(
+            self._final({"message": {"role": "assistant", "content": ""}}, model, reply)
+        )
+        return chunks
+
+    def _final(self, body: dict, model: str, reply: Reply) -> dict:
+        eval_count = max(len(tokenize(reply.content)), 1)
+        eval_duration = int(eval_count / (self.tokens_per_second or 1000) * 1e9)
+        return {
+            "model": model,
+            "created_at": _now(),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": reply.load_duration
+            + reply.prompt_eval_duration
+            + eval_duration,
+            "load_duration": reply.load_duration,
+            "prompt_eval_count": 10,
+            "prompt_eval_duration": reply.prompt_eval_duration,
+            "eval_count": eval_count,
+            "eval_duration": eval_duration,
+            **body,
+        }
+
+    def _stream(self, handler: BaseHTTPRequestHandler, chunks: list[dict]) -> None:
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+
+        delay = 1 / self.tokens_per_second if self.tokens_per_second else 0
+        try:
+            for chunk in chunks:
+                if delay:
+                    time.sleep(delay)
+                handler.wfile.write(json.dumps(chunk).encode() + b"\n")
+                handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early
+            pass
+
+    def _send_json(self, handler: BaseHTTPRequestHandler, body: dict) -> None:
+        data = json.dumps(body).encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
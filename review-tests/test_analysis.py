@@ -0,0 +1,89 @@
+"""The static analysis pre-pass"""
+
+from analysis import StaticAnalyzer, analyze_source
+from analysis import prepass
+
+SOURCE = """import os
+import sys
+from typing import Optional
+
+
+def pick(items=[], seen: "Optional[int]" = None):
+    try:
+        return items[0] == None
+    except:
+        return sys.maxsize
+"""
+
+TODOS = """
+class Agent:
+    def undone(self):
+        return [todo for todo in self.todos if not todo.is_complete]
+
+    def done(self):
+        return [todo for todo in self.todos if not todo.is_complete]
+"""
+
+PROMPT = "You are a careful reviewer. " * 10
+
+
+def test_checks():
+    findings, _ = analyze_source("module.py", SOURCE)
+
+    found = {(finding.check, finding.line) for finding in findings}
+    assert found == {
+        ("unused-import", 1),
+        ("mutable-default", 6),
+        ("none-comparison", 8),
+        ("bare-except", 9),
+    }
+
+
+def test_syntax_error_is_a_finding():
+    findings, prints = analyze_source("broken.py", "def f(:\n")
+
+    assert [finding.check for finding in findings] == ["syntax-error"]
+    assert prints == []
+
+
+def test_duplicates_across_files(tmp_path):
+    (tmp_path / "agent.py").write_text(TODOS)
+    (tmp_path / "one.py").write_text(f"PROMPT = {PROMPT!r}\n")
+    (tmp_path / "two.py").write_text(f"PROMPT = {PROMPT + 'Be brief.'!r}\n")
+
+    report = StaticAnalyzer(None).run(str(tmp_path))
+
+    messages = [f.message for f in report.findings if f.check == "duplicate-code"]
+    assert messages == [
+        "done is identical to undone (agent.py:3)",
+        "PROMPT is another version of the one in one.py:1",
+    ]
+    assert "duplicate-code: agent.py:6" in report.digest()
+
+
+def test_results_are_cached_per_file(tmp_path):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text(SOURCE)
+    (repo / "b.py").write_text("import json\n")
+    cache_path = str(tmp_path / "analysis.json")
+
+    first = StaticAnalyzer(cache_path).run(str(repo))
+    assert (first.files, first.analyzed) == (2, 2)
+
+    (repo / "b.py").write_text("import json\n\njson.dumps(1)\n")
+    second = StaticAnalyzer(cache_path).run(str(repo))
+
+    assert second.analyzed == 1
+    assert [f.path for f in second.findings if f.check == "unused-import"] == ["a.py"]
+
+
+def test_many_files_use_worker_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(prepass, "MIN_FILES_FOR_POOL", 2)
+    for i in range(4):
+        (tmp_path / f"m{i}.py").write_text("import os\n")
+
+    report = StaticAnalyzer(None, workers=2).run(str(tmp_path))
+
+    assert report.analyzed == 4
+    assert len(report.findings) == 4
@@ -0,0 +1,123 @@
+"""Benchmarks for the client, the agent loop and the tools, run against a mock Ollama"""
+
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from ai.agents.coding_agent import CodeReviewAgent
+from ai.communication import OllamaApiClient
+from ai.message import MessageHistory
+from ai.tool_definitions import ToolCall, generate_ollama_tools
+from ai.tracing import set_tracer, span
+from mock_ollama import MockOllamaServer, Reply
+from program_state import ProgramState
+from tools.explore_structure import explore_structure
+from tools.read_file import read_file
+
+
+async def _drain(stream) -> int:
+    count = 0
+    async for _ in stream:
+        count += 1
+    return count
+
+
+def test_chat_streaming_overhead(benchmark):
+    reply = Reply(" ".join(f"token{i}" for i in range(500)))
+    with MockOllamaServer(chat_replies=[reply]) as server:
+        client = OllamaApiClient(server.address, server.model)
+        messages = [{"role": "user", "content": "Review the project"}]
+
+        chunks = benchmark(lambda: asyncio.run(_drain(client.chat(messages))))
+
+    assert chunks == 501
+
+
+def test_code_review_invoke_cycle(benchmark, large_tree):
+    replies = [
+        Reply.tool("write_todos", requirements=["Explore", "Read the big module"]),
+        Reply(
+            "Let me look around.",
+            Reply.tool("explore_structure", root_dir_path=".", depth=2).tool_calls,
+        ),
+        Reply.tool("read_file", file_path="big_module.py"),
+        Reply.tool("update_todo", todo_id=0, new_status=True),
+        Reply.tool("update_todo", todo_id=1, new_status=True),
+    ]
+
+    async def cycle(address: str, model: str) -> ProgramState:
+        agent = CodeReviewAgent(
+            OllamaApiClient(address, model), tools=generate_ollama_tools()
+        )
+        agent.add_user_message(
+            {
+                "role": "user",
+                "content": "Review this project",
+                "images": None,
+                "tool_calls": None,
+            }
+        )
+        state = ProgramState.AGENT_CONTROL
+        while state == ProgramState.AGENT_CONTROL:
+            state = await agent.invoke()
+        assert not agent._get_undone_todos()
+        return state
+
+    with MockOllamaServer(chat_replies=replies) as server:
+        state = benchmark(lambda: asyncio.run(cycle(server.address, server.model)))
+
+    assert state == ProgramState.USER_CONTROL
+
+
+def test_tool_dispatch(benchmark, large_tree):
+    agent = CodeReviewAgent(OllamaApiClient("localhost:0", "none"), tools=[])
+    tool_call = ToolCall(
+        function={"name": "read_file", "arguments": {"file_path": "big_module.py"}}
+    )
+
+    result = benchmark(agent._call_tool, tool_call)
+
+    assert result.is_ok()
+
+
+def test_explore_structure_large_tree(benchmark, large_tree):
+    directory = benchmark(
+        explore_structure, ".", depth=10, ignore_names=[r"^\.git$", r"^__pycache__$"]
+    )
+
+    assert len(directory.children) == 8
+
+
+def test_read_file_large(benchmark, large_tree):
+    content = benchmark(read_file, "big_module.py")
+
+    assert len(content) == 300_000
+
+
+def test_chat_body_encoding(benchmark):
+    client = OllamaApiClient("localhost:0", "none")
+    tools = [tool.model_dump() for tool in generate_ollama_tools()]
+    history = MessageHistory(
+        {"role": "tool", "content": "x = 1\n" * 1_000, "tool_calls": None}
+        for _ in range(100)
+    )
+
+    body = benchmark(
+        lambda: client._encode_chat(
+            {"model": "none", "messages": history, "tools": tools}
+        )
+    )
+
+    assert json.loads(body)["messages"] == history
+
+
+def test_disabled_tracing_overhead(benchmark):
+    def traced_block() -> None:
+        with span("read_file", "tool"):
+            pass
+
+    set_tracer(None)
+    benchmark(traced_block)
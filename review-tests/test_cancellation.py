@@ -0,0 +1,109 @@
+"""Streams are cut short on limits and cancellation"""
+
+import asyncio
+import time
+
+from ai.cancellation import CancelToken, RepetitionDetector, StreamLimits
+from ai.communication import OllamaApiClient
+from mock_ollama import MockOllamaServer, Reply
+
+MESSAGES = [{"role": "user", "content": "Review main.py"}]
+
+
+async def _collect(stream) -> list:
+    return [chunk async for chunk in stream]
+
+
+def _chat(reply: Reply, limits=None, cancel=None, tokens_per_second=None) -> list:
+    with MockOllamaServer(
+        chat_replies=[reply], tokens_per_second=tokens_per_second
+    ) as server:
+        client = OllamaApiClient(server.address, server.model)
+        return asyncio.run(
+            _collect(client.chat(MESSAGES, limits=limits, cancel=cancel))
+        )
+
+
+def test_repetition_detector():
+    detector = RepetitionDetector(min_period=8, min_repeats=3)
+    assert not any(detector.feed(word + " ") for word in "a normal sentence".split())
+    # A few repeats are not enough, the loop has to cover min_chars
+    assert not any(detector.feed("I will now look. ") for _ in range(4))
+    assert any(detector.feed("I will now look. ") for _ in range(20))
+
+
+def test_markdown_and_code_are_not_repetition():
+    separator = "|" + "|".join(["----------------"] * 4) + "|\n"
+    row = "| a | b | c | d |\n"
+    texts = [
+        "| Column | Column | Column | Column |\n" + separator + row * 3,
+        "x = [" + "0, " * 150 + "0]\n",
+        "=" * 300 + "\n",
+        "\n\n" + "    " * 100,
+    ]
+
+    for text in texts:
+        detector = RepetitionDetector()
+        # Streamed a token or so at a time
+        chunks = [text[i : i + 3] for i in range(0, len(text), 3)]
+        assert not any(detector.feed(chunk) for chunk in chunks), text[:40]
+
+
+def test_stops_on_repetition():
+    reply = Reply("Let me check the file. " * 200)
+    chunks = _chat(reply, limits=StreamLimits())
+
+    assert chunks[-1].done_reason == "stopped:repetition"
+    assert len(chunks) < 100
+
+
+def test_stops_after_tool_call():
+    reply = Reply.tool("read_file", file_path="main.py")
+    reply.trailing = "\nNow that I have called the tool I will explain at length"
+    chunks = _chat(reply, limits=StreamLimits())
+
+    assert chunks[-1].done_reason == "stopped:tool_call"
+    assert any(chunk.message.tool_calls for chunk in chunks)
+    assert not "".join(chunk.message.content for chunk in chunks).strip()
+
+
+def test_stops_at_token_cap():
+    limits = StreamLimits(max_tokens=5)
+    chunks = _chat(Reply("one two three four five six seven eight"), limits=limits)
+
+    assert chunks[-1].done_reason == "stopped:max_tokens"
+    assert "".join(chunk.message.content for chunk in chunks).split() == [
+        "one",
+        "two",
+        "three",
+        "four",
+        "five",
+    ]
+
+
+def test_wall_clock_limit_aborts_slow_generation():
+    started = time.perf_counter()
+    chunks = _chat(
+        Reply("word " * 1000),
+        limits=StreamLimits(max_seconds=0.2, detect_repetition=False),
+        tokens_per_second=50,
+    )
+
+    assert chunks[-1].done_reason == "stopped:timeout"
+    assert time.perf_counter() - started < 2
+
+
+def test_cancel_token():
+    cancel = CancelToken()
+
+    async def run(address: str, model: str) -> list:
+        client = OllamaApiClient(address, model)
+        asyncio.get_running_loop().call_later(0.1, cancel.cancel)
+        return await _collect(client.chat(MESSAGES, cancel=cancel))
+
+    with MockOllamaServer(
+        chat_replies=[Reply("word " * 1000)], tokens_per_second=50
+    ) as server:
+        chunks = asyncio.run(run(server.address, server.model))
+
+    assert chunks[-1].done_reason == "stopped:cancelled"
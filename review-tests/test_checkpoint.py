@@ -0,0 +1,90 @@
+"""Checkpointing and resuming an agent session"""
+
+import zlib
+
+import pytest
+
+from ai.agents.coding_agent import CodeReviewAgent
+from ai.checkpoint import (
+    CheckpointError,
+    Checkpointer,
+    _HEADER,
+    decode_checkpoint,
+    encode_checkpoint,
+    write_checkpoint,
+)
+from ai.communication import OllamaApiClient
+from program_state import ProgramState
+from tools.encoding import encode_tool_result
+
+
+def _agent() -> CodeReviewAgent:
+    return CodeReviewAgent(OllamaApiClient("localhost:0", "none"), tools=[])
+
+
+def test_resume_restores_the_whole_session(tmp_path):
+    agent = _agent()
+    agent.write_todos(["Read main.py", "Write the review"])
+    agent.update_todo(0, True)
+    agent.todos_created = True
+    agent.file_reads.encode("main.py", "print('hi')\n")
+    paged = encode_tool_result(
+        "read_file", "x = 1\n" * 5000, budget=100, pages=agent.pages
+    )
+    for i in range(500):
+        agent.messages.append(
+            {
+                "role": "tool",
+                "content": f"result {i}",
+                "images": None,
+                "tool_calls": None,
+            }
+        )
+
+    checkpointer = Checkpointer(str(tmp_path / "session.ckpt"))
+    checkpointer.save(agent, ProgramState.AGENT_CONTROL)
+    assert not (tmp_path / "session.ckpt.tmp").exists()
+
+    resumed = _agent()
+    assert checkpointer.resume(resumed) == ProgramState.AGENT_CONTROL
+    assert resumed.messages == agent.messages
+    assert resumed.messages.encoded() == agent.messages.encoded()
+    assert resumed.todos == agent.todos
+    assert resumed.todos_created
+    assert resumed.file_reads.encode("main.py", "print('hi')\n").startswith(
+        "[main.py is unchanged"
+    )
+    assert resumed.read_more(paged.handle, 1) == agent.read_more(paged.handle, 1)
+
+
+def test_periodic_saves(tmp_path):
+    checkpointer = Checkpointer(str(tmp_path / "session.ckpt"), interval=60)
+    agent = _agent()
+
+    assert checkpointer.maybe_save(agent, ProgramState.USER_CONTROL)
+    assert not checkpointer.maybe_save(agent, ProgramState.USER_CONTROL)
+
+
+def test_broken_checkpoints_are_rejected():
+    data = encode_checkpoint({"messages": []})
+    assert decode_checkpoint(data) == {"messages": []}
+
+    with pytest.raises(CheckpointError):
+        decode_checkpoint(b"JUNK" + data[4:])
+    with pytest.raises(CheckpointError):
+        decode_checkpoint(data[:6] + b"\0" + data[7:])
+    with pytest.raises(CheckpointError):
+        decode_checkpoint(data[:-5] + b"xxxxx")
+
+
+def test_checkpoints_that_are_no_session_are_rejected(tmp_path):
+    header = encode_checkpoint({})[: _HEADER.size]
+    with pytest.raises(CheckpointError):
+        decode_checkpoint(header + zlib.compress(b'{"messages": ['))
+    with pytest.raises(CheckpointError):
+        decode_checkpoint(header + zlib.compress(b"[1, 2]"))
+
+    path = str(tmp_path / "session.ckpt")
+    write_checkpoint(path, {"messages": [], "todos": []})
+    with pytest.raises(CheckpointError):
+        Checkpointer(path).resume(_agent())
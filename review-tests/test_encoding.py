@@ -0,0 +1,158 @@
+"""Compact tool output, pagination of long results and repeated reads"""
+
+import asyncio
+
+import pytest
+
+from ai.agents.coding_agent import CodeReviewAgent
+from ai.communication import OllamaApiClient
+from mock_ollama import MockOllamaServer, Reply
+from tools import TOOLS
+from tools.encoding import (
+    FileReadLedger,
+    PageStore,
+    encode_tool_result,
+    estimate_tokens,
+)
+from tools.explore_structure import explore_structure
+
+
+def test_directory_tree_is_relative_and_compact(large_tree):
+    directory = explore_structure(".", depth=1)
+    encoded = encode_tool_result(
+        "explore_structure", directory, budget=10_000, pages=PageStore()
+    )
+
+    lines = encoded.text.splitlines()
+    assert lines[0] == "./"
+    assert "  package_0/" in lines
+    assert "    module_0.py" in lines
+    assert "  big_module.py" in lines
+    assert str(large_tree) not in encoded.text
+    assert encoded.tokens < estimate_tokens(directory.model_dump_json()) / 3
+
+
+def test_long_results_are_paged(large_tree):
+    store = PageStore()
+    content = TOOLS["read_file"]("big_module.py")
+    encoded = encode_tool_result("read_file", content, budget=1000, pages=store)
+
+    assert encoded.truncated
+    assert encoded.tokens <= 1100
+    assert f'read_more(handle="{encoded.handle}", page=1)' in encoded.text
+
+    pages = [encoded.text]
+    page = 1
+    while "read_more(" in pages[-1]:
+        pages.append(store.get(encoded.handle, page))
+        page += 1
+        # A page goes back into the history as read_more's result, unpaged
+        assert not encode_tool_result(
+            "read_more", pages[-1], budget=1000, pages=store
+        ).truncated
+
+    body = "".join(text.split("\n[page ")[0] for text in pages)
+    assert body == content
+
+    with pytest.raises(IndexError):
+        store.get(encoded.handle, page)
+
+
+def test_sessions_keep_their_own_pages():
+    client = OllamaApiClient("localhost:0", "none")
+    first, second = CodeReviewAgent(client, []), CodeReviewAgent(client, [])
+    first.pages.max_results = second.pages.max_results = 2
+
+    handle = encode_tool_result(
+        "read_file", "x = 1\n" * 2000, budget=100, pages=first.pages
+    ).handle
+    for _ in range(3):
+        encode_tool_result(
+            "read_file", "y = 2\n" * 2000, budget=100, pages=second.pages
+        )
+
+    # The other session filling its store does not evict this one's pages
+    assert first.read_more(handle, 1).startswith("x = 1")
+    with pytest.raises(KeyError):
+        second.read_more(handle, 1)
+    assert list(first.snapshot()["pages"]) == [handle]
+    assert handle not in second.snapshot()["pages"]
+
+
+def test_short_results_are_left_alone():
+    encoded = encode_tool_result("read_file", "x = 1\n", pages=PageStore())
+    assert encoded.text == "x = 1\n"
+    assert not encoded.truncated
+
+
+def test_repeated_reads_add_a_stub_or_a_diff():
+    ledger = FileReadLedger()
+    content = "".join(f"line {i}\n" for i in range(100))
+
+    assert ledger.encode("./main.py", content) == content
+    assert ledger.encode("main.py", content) == (
+        "[main.py is unchanged since you last read it above]"
+    )
+
+    changed = content.replace("line 50\n", "line fifty\n")
+    diff = ledger.encode("main.py", changed)
+    assert diff.startswith("[main.py changed since you last read it")
+    assert "-line 50\n+line fifty\n" in diff
+    assert len(diff) < len(changed) / 3
+
+    # A rewrite is cheaper to send whole than as a diff
+    assert ledger.encode("main.py", "x = 1\n") == "x = 1\n"
+
+
+def test_agent_keeps_one_copy_of_a_file(large_tree):
+    path = "package_0/module_0.py"
+    replies = [
+        Reply.tool("write_todos", requirements=["Read the module"]),
+        Reply.tool("read_file", file_path=path),
+        Reply.tool("read_file", file_path="./" + path),
+    ]
+
+    async def run(address: str, model: str) -> list[dict]:
+        agent = CodeReviewAgent(OllamaApiClient(address, model), tools=[])
+        agent.verbose = False
+        agent.add_user_message(
+            {"role": "user", "content": "Review", "images": None, "tool_calls": None}
+        )
+        for _ in replies:
+            await agent.invoke()
+        return [message for message in agent.messages if message["role"] == "tool"]
+
+    with MockOllamaServer(chat_replies=replies) as server:
+        tool_messages = asyncio.run(run(server.address, server.model))
+
+    contents = [message["content"] for message in tool_messages[1:]]
+    assert contents[0] == (large_tree / path).read_text()
+    stub, nudge = contents[1].split("\n\n")
+    assert stub == f"[{path} is unchanged since you last read it above]"
+    # The same call twice is also a repeat for the loop detector
+    assert nudge.startswith("You already called read_file")
+
+
+def test_a_paged_read_is_not_replaced_by_a_stub(large_tree):
+    replies = [
+        Reply.tool("write_todos", requirements=["Read the module"]),
+        Reply.tool("read_file", file_path="big_module.py"),
+        Reply.tool("read_file", file_path="big_module.py"),
+    ]
+
+    with MockOllamaServer(chat_replies=replies) as server:
+        agent = CodeReviewAgent(OllamaApiClient(server.address, server.model), [])
+        agent.verbose = False
+        agent.tool_output_budget = 1000
+        agent.add_user_message(
+            {"role": "user", "content": "Review", "images": None, "tool_calls": None}
+        )
+        for _ in replies:
+            asyncio.run(agent.invoke())
+
+    first, second = [
+        message["content"] for message in agent.messages if message["role"] == "tool"
+    ][1:]
+    # The model only saw the first page, reading again shows it the file again
+    assert "unchanged since you last read it" not in second
+    assert second.split("\n[page ")[0] == first.split("\n[page ")[0]
@@ -0,0 +1,143 @@
+"""Executing ai/graph nodes"""
+
+import asyncio
+import time
+
+import pytest
+
+from ai.communication import OllamaApiClient
+from ai.graph.engine import GraphEngine, NodeTimeoutError
+from ai.graph.nodes import ActionNode, DecisionNode, ForkNode, ParallelNode
+from ai.ollama_response import OllamaResponse
+from ai.tool_definitions import Tool, ToolFunction, generate_ollama_tools
+from mock_ollama import MockOllamaServer, Reply
+
+TOOLS = {tool.function.name: tool for tool in generate_ollama_tools()}
+# The engine only needs the name, the schema offered to the model doesn't matter
+EXPLORE = Tool(
+    function=ToolFunction(
+        name="explore_structure", description="Lists a directory", parameters={}
+    )
+)
+
+
+def _slow_read(file_path: str) -> str:
+    time.sleep(0.2)
+    return f"contents of {file_path}"
+
+
+def test_branches_run_concurrently_and_share_information(large_tree):
+    calls = []
+
+    def read_file(file_path: str) -> str:
+        calls.append(file_path)
+        return _slow_read(file_path)
+
+    def branch(name: str) -> DecisionNode:
+        return DecisionNode(
+            name=name,
+            prompt="Is big_module.py worth reviewing?",
+            information_tools=[TOOLS["read_file"]],
+            information_arguments={"read_file": {"file_path": "big_module.py"}},
+            left=ActionNode(
+                name=f"{name}-explore",
+                action_tool=EXPLORE,
+                arguments={"root_dir_path": ".", "depth": 0},
+            ),
+            right=None,
+        )
+
+    graph = ParallelNode(name="review", branches=[branch("a"), branch("b")])
+
+    with MockOllamaServer() as server:
+        engine = GraphEngine(
+            OllamaApiClient(server.address, server.model),
+            tools={"read_file": read_file, "explore_structure": _explore},
+        )
+        started = time.perf_counter()
+        run = asyncio.run(engine.run(graph))
+        elapsed = time.perf_counter() - started
+
+    # One shared read, not one per branch, and both branches overlapped
+    assert calls == ["big_module.py"]
+    assert run.memo_hits == 1
+    assert elapsed < 0.4
+    assert run.decisions == {"a": True, "b": True}
+    assert run.results == {"a-explore": "tree", "b-explore": "tree"}
+
+    traces = {trace.node: trace for trace in run.traces}
+    assert traces["a"].outcome == "left"
+    assert traces["review"].duration >= traces["a"].duration
+
+
+def _explore(root_dir_path: str, depth: int = 1, ignore_names=None) -> str:
+    return "tree"
+
+
+def test_fork_and_timeouts():
+    fork = ForkNode(
+        name="fork",
+        logic=lambda run: "right",
+        left=None,
+        right=ActionNode(
+            name="slow",
+            action_tool=TOOLS["read_file"],
+            arguments={"file_path": "main.py"},
+            timeout=0.05,
+        ),
+    )
+    engine = GraphEngine(
+        OllamaApiClient("localhost:0", "none"), tools={"read_file": _slow_read}
+    )
+
+    with pytest.raises(NodeTimeoutError):
+        asyncio.run(engine.run(fork))
+
+
+def test_traces_record_outcomes_and_errors():
+    fork = ForkNode(name="fork", logic=lambda run: "left", left=None, right=None)
+    engine = GraphEngine(OllamaApiClient("localhost:0", "none"))
+
+    run = asyncio.run(engine.run(fork))
+    assert [trace.to_dict()["outcome"] for trace in run.traces] == ["left"]
+
+
+def test_relevance_gate_is_a_decision_node():
+    from ai.agents.coding_agent import CodeReviewAgent
+
+    replies = [Reply('{"should_do": true, "confidence": 0.2}')]
+    with MockOllamaServer(generate_replies=replies) as server:
+        agent = CodeReviewAgent(OllamaApiClient(server.address, server.model), tools=[])
+        assert not asyncio.run(agent.is_propmt_relevant("Review main.py"))
+
+
+def test_decisions_close_the_model_stream():
+    closed = []
+
+    class Model:
+        async def generate(self, prompt, structure=None):
+            try:
+                yield OllamaResponse(
+                    model="fake",
+                    created_at="",
+                    done=True,
+                    response='{"should_do": true, "confidence": 0.9}',
+                )
+            finally:
+                closed.append(prompt)
+
+    # The stream is closed before the graph moves on, not when the loop ends
+    seen = []
+    after = ForkNode(
+        name="after",
+        logic=lambda run: seen.append(list(closed)) or "left",
+        left=None,
+        right=None,
+    )
+    node = DecisionNode(
+        name="gate", prompt="Review?", information_tools=[], left=after, right=None
+    )
+    run = asyncio.run(GraphEngine(Model()).run(node))
+
+    assert run.decisions == {"gate": True, "after": True}
+    assert seen == [["Review?"]]
@@ -0,0 +1,72 @@
+"""Ignore rules for directory walks"""
+
+import os
+
+from tools.encoding import encode_directory
+from tools.explore_structure import explore_structure
+from tools.ignore import IgnoreMatcher, parse_gitignore
+
+
+def _ignored(rules_text: str, path: str, is_dir: bool = False) -> bool:
+    matcher = IgnoreMatcher(use_gitignore=False)
+    matcher.rules = parse_gitignore(rules_text)
+    return matcher.is_ignored(path, is_dir)
+
+
+def test_gitignore_semantics():
+    rules = "\n".join(
+        [
+            "# comment",
+            "*.log",
+            "!keep.log",
+            "/dist",
+            "build/",
+            "docs/**/*.tmp",
+            "a?c.py",
+            "data[0-9].csv",
+        ]
+    )
+
+    assert _ignored(rules, "deep/nested/debug.log")
+    assert not _ignored(rules, "deep/keep.log")
+    assert _ignored(rules, "dist", is_dir=True)
+    assert not _ignored(rules, "src/dist", is_dir=True)
+    assert _ignored(rules, "src/build", is_dir=True)
+    assert not _ignored(rules, "src/build")
+    assert _ignored(rules, "docs/a/b/page.tmp")
+    assert _ignored(rules, "docs/page.tmp")
+    assert not _ignored(rules, "other/page.tmp")
+    assert _ignored(rules, "abc.py")
+    assert not _ignored(rules, "abbc.py")
+    assert _ignored(rules, "data1.csv")
+    assert not _ignored(rules, "datax.csv")
+
+
+def test_walk_prunes_ignored_subtrees(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / ".gitignore").write_text("generated/\n*.pyc\n")
+    for directory in ["src/generated", "node_modules/pkg", "src/lib"]:
+        (tmp_path / directory).mkdir(parents=True)
+    (tmp_path / "src/lib/.gitignore").write_text("local.py\n")
+    (tmp_path / "src/lib/local.py").write_text("")
+    (tmp_path / "src/lib/kept.py").write_text("")
+    (tmp_path / "src/main.pyc").write_text("")
+    (tmp_path / "src/main.py").write_text("")
+
+    scanned = []
+    real_scandir = os.scandir
+    monkeypatch.setattr(
+        os, "scandir", lambda path: scanned.append(path) or real_scandir(path)
+    )
+
+    tree = encode_directory(explore_structure(".", depth=5, ignore_names=["^kept"]))
+
+    assert tree.splitlines() == [
+        "./",
+        "  src/",
+        "    lib/",
+        "      .gitignore",
+        "    main.py",
+        "  .gitignore",
+    ]
+    assert not any("generated" in path or "node_modules" in path for path in scanned)
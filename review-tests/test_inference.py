@@ -0,0 +1,77 @@
+"""Each phase of the agent sends its own inference options"""
+
+import asyncio
+
+from ai.agents.coding_agent import CodeReviewAgent
+from ai.communication import OllamaApiClient
+from ai.inference import CONTEXT_SIZE, InferenceProfile, use_profile
+from mock_ollama import MockOllamaServer, Reply
+
+
+def test_profile_options():
+    profile = InferenceProfile(
+        "short", num_predict=8, stop=("\n",), num_thread=4, keep_alive="5m"
+    )
+
+    assert profile.options() == {
+        "num_ctx": CONTEXT_SIZE,
+        "num_predict": 8,
+        "stop": ["\n"],
+        "num_thread": 4,
+    }
+
+
+def test_phases_use_their_profiles():
+    replies = [
+        Reply.tool("write_todos", requirements=["Read main.py"]),
+        Reply("Looks fine"),
+    ]
+    with MockOllamaServer(chat_replies=replies) as server:
+        client = OllamaApiClient(server.address, server.model, seed=3)
+        agent = CodeReviewAgent(client, [])
+        agent.verbose = False
+        agent.profiles["review"] = InferenceProfile("review", keep_alive="1h")
+        agent.add_user_message(
+            {"role": "user", "content": "Review", "images": None, "tool_calls": None}
+        )
+
+        asyncio.run(agent.invoke())
+        asyncio.run(agent.invoke())
+
+    gate, todo, review = [
+        payload
+        for path, payload in server.requests
+        if path in ("/api/generate", "/api/chat") and payload.get("options")
+    ]
+
+    assert gate["options"] == {
+        "temperature": 0.0,
+        "num_ctx": CONTEXT_SIZE,
+        "num_predict": 128,
+        "seed": 3,
+    }
+    assert todo["options"]["num_predict"] == 1024
+    assert review["options"] == {
+        "temperature": 0.1,
+        "num_ctx": CONTEXT_SIZE,
+        "seed": 3,
+    }
+    assert review["keep_alive"] == "1h"
+    assert all("temperature" not in payload for payload in (todo, review))
+
+
+def test_determinism_follows_the_profile():
+    client = OllamaApiClient("localhost:0", "none", temperature=0.8, seed=1)
+    assert not client.is_deterministic()
+
+    with use_profile(InferenceProfile("gate", temperature=0.0)):
+        assert client.is_deterministic()
+
+
+def test_model_is_loaded_with_the_context_size():
+    with MockOllamaServer() as server:
+        with OllamaApiClient(server.address, server.model) as client:
+            assert client.residency.wait_until_warm(timeout=5)
+
+    load = next(payload for path, payload in server.requests if path == "/api/generate")
+    assert load["options"] == {"num_ctx": CONTEXT_SIZE}
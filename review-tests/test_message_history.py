@@ -0,0 +1,142 @@
+"""The history encodes each message once and stays correct when edited"""
+
+import json
+import os
+
+from ai import serialization
+from ai.blobs import BlobRef, BlobStore
+from ai.communication import OllamaApiClient
+from ai.message import MessageHistory
+
+SYSTEM = {"role": "system", "content": "Review the code ü"}
+
+
+def test_messages_are_encoded_once(monkeypatch):
+    history = MessageHistory([SYSTEM])
+    history.append({"role": "user", "content": "main.py"})
+
+    calls = []
+    monkeypatch.setattr("ai.message.dumps", lambda value: calls.append(value) or b"{}")
+    assert [json.loads(segment) for segment in history.encoded()] == list(history)
+    assert calls == []
+
+
+def test_edits_other_than_append_are_picked_up():
+    history = MessageHistory([SYSTEM, {"role": "user", "content": "a"}])
+    history.encoded()
+
+    history.insert(1, {"role": "system", "content": "b"})
+    history[2] = {"role": "user", "content": "c"}
+    history.pop(0)
+
+    assert [json.loads(segment) for segment in history.encoded()] == list(history)
+
+
+def test_chat_body_matches_plain_json(monkeypatch):
+    client = OllamaApiClient("localhost:0", "none")
+    tools = [{"type": "function", "function": {"name": "read_file"}}]
+    payload = {
+        "model": "none",
+        "messages": MessageHistory([SYSTEM]),
+        "keep_alive": "30m",
+        "tools": tools,
+    }
+    expected = json.loads(json.dumps(payload))
+
+    assert json.loads(client._encode_chat(payload)) == expected
+
+    # Without orjson the standard library encoder is used
+    monkeypatch.setattr(serialization, "orjson", None)
+    payload["messages"] = MessageHistory([SYSTEM])
+    assert json.loads(client._encode_chat(payload)) == expected
+
+
+def test_long_contents_live_in_the_blob_store(tmp_path):
+    store = BlobStore(str(tmp_path), min_chars=100)
+    source = "def main():\n    print('hi')\n" * 20
+    messages = [SYSTEM, {"role": "tool", "content": source, "tool_calls": None}]
+
+    history = MessageHistory(messages, blobs=store)
+    # The same file in another session is stored once
+    MessageHistory(messages, blobs=store)
+
+    stored = list.__getitem__(history, 1)["content"]
+    assert stored == BlobRef(stored.digest, len(source))
+    assert list.__getitem__(history, 0) is SYSTEM
+    assert store.stats() == {
+        "stored": 1,
+        "reused": 1,
+        "evicted": 0,
+        "bytes": len(source),
+    }
+
+    # Readers and the request body see the text
+    assert history[1] == messages[1]
+    assert list(history) == messages
+    assert list(reversed(history))[0] == messages[1]
+    assert [json.loads(segment) for segment in history.encoded()] == messages
+
+    history.insert(0, {"role": "system", "content": "first"})
+    assert [json.loads(segment) for segment in history.encoded()] == list(history)
+
+    store.close()
+    assert tmp_path.exists()
+
+
+def test_every_list_operation_sees_the_text(tmp_path):
+    store = BlobStore(str(tmp_path), min_chars=100)
+    long = {"role": "tool", "content": "x = 1\n" * 50, "tool_calls": None}
+    other = {"role": "tool", "content": "y = 2\n" * 50, "tool_calls": None}
+    history = MessageHistory([SYSTEM, long], blobs=store)
+
+    assert history.copy() == [SYSTEM, long]
+    assert long in history and other not in history
+    assert (history.index(long), history.count(long)) == (1, 1)
+    assert json.loads(serialization.dumps(history)) == [SYSTEM, long]
+
+    # Whatever way messages go in, long contents end up in the store
+    history += [other]
+    history.insert(0, other)
+    history[1] = other
+    assert all(
+        isinstance(list.__getitem__(history, i)["content"], BlobRef) for i in (0, 1, 3)
+    )
+    assert history + [SYSTEM] == [other, other, long, other, SYSTEM]
+
+    assert history.pop() == other
+    history.remove(long)
+    assert list(history) == [other, other]
+    assert [json.loads(segment) for segment in history.encoded()] == list(history)
+
+
+def test_unreferenced_blobs_are_evicted_over_the_cap(tmp_path):
+    def message(i: int) -> dict:
+        return {"role": "tool", "content": f"{i}" * 100, "tool_calls": None}
+
+    # Left behind by an earlier run
+    BlobStore(str(tmp_path), min_chars=100).put("old" * 100)
+
+    store = BlobStore(str(tmp_path), min_chars=100, max_bytes=250)
+    assert store.stats()["bytes"] == 300
+    first = MessageHistory([message(0)], blobs=store)
+    second = MessageHistory([message(1), message(2)], blobs=store)
+
+    # Blobs a history still refers to stay, however full the store is
+    assert store.stats()["evicted"] == 1
+    assert list(first) == [message(0)]
+    assert list(second) == [message(1), message(2)]
+
+    second.pop(0)
+    assert store.stats()["bytes"] == 200
+    first.release()
+    second.append(message(3))
+    assert store.stats() == {"stored": 4, "reused": 0, "evicted": 3, "bytes": 200}
+    assert list(second) == [message(2), message(3)]
+
+
+def test_temporary_blob_store_is_removed():
+    store = BlobStore()
+    store.put("x" * 4096)
+    store.close()
+
+    assert not os.path.exists(store.directory)
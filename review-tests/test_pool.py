@@ -0,0 +1,73 @@
+"""OllamaPool against several mock Ollama servers"""
+
+import asyncio
+
+from ai.communication import OllamaPool
+from ai.communication.pool import session_key
+from mock_ollama import MockOllamaServer, Reply
+
+
+def _conversation(name: str) -> list[dict]:
+    return [
+        {"role": "system", "content": "You are a reviewer"},
+        {"role": "user", "content": f"Review {name}"},
+    ]
+
+
+async def _drain(stream) -> str:
+    return "".join([chunk.message.content async for chunk in stream])
+
+
+def _chat_requests(server: MockOllamaServer) -> int:
+    return sum(1 for path, _ in server.requests if path == "/api/chat")
+
+
+def test_spreads_sessions_and_keeps_affinity():
+    servers = [
+        MockOllamaServer(chat_replies=[Reply("ok " * 20)], tokens_per_second=200)
+        for _ in range(3)
+    ]
+    for server in servers:
+        server.start()
+
+    try:
+        pool = OllamaPool([s.address for s in servers], "mock-model")
+
+        async def run() -> None:
+            conversations = [_conversation(f"module_{i}.py") for i in range(6)]
+            await asyncio.gather(*(_drain(pool.chat(c)) for c in conversations))
+
+            # A follow up turn of the first conversation goes to the same node
+            conversations[0].append({"role": "assistant", "content": "ok"})
+            conversations[0].append({"role": "user", "content": "And main.py?"})
+            before = [_chat_requests(s) for s in servers]
+            await _drain(pool.chat(conversations[0]))
+            after = [_chat_requests(s) for s in servers]
+
+            node = pool._affinity[session_key(conversations[0])]
+            changed = [s.address for s, b, a in zip(servers, before, after) if a != b]
+            assert changed == [node.address.removeprefix("http://")]
+            await pool.aclose()
+
+        asyncio.run(run())
+        assert sorted(_chat_requests(s) for s in servers) == [2, 2, 3]
+    finally:
+        for server in servers:
+            server.stop()
+
+
+def test_fails_over_to_a_healthy_node():
+    with MockOllamaServer(chat_replies=[Reply("from the healthy node")]) as server:
+        # Nothing listens on port 9, the pool has to move on
+        pool = OllamaPool(["127.0.0.1:9", server.address], "mock-model")
+
+        async def run() -> list[str]:
+            answers = [await _drain(pool.chat(_conversation(str(i)))) for i in range(4)]
+            await pool.aclose()
+            return answers
+
+        answers = asyncio.run(run())
+
+    assert answers == ["from the healthy node"] * 4
+    assert not pool.nodes[0].healthy
+    assert pool.nodes[1].served == 4
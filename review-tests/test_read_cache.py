@@ -0,0 +1,97 @@
+"""The read cache and the import graph prefetcher"""
+
+import os
+
+import pytest
+
+from ai.telemetry import TelemetryCollector
+from tools import TOOLS
+from tools.read_cache import (
+    FileCache,
+    ImportGraph,
+    disable_prefetching,
+    enable_prefetching,
+    file_cache,
+)
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app/__init__.py").write_text("")
+    (tmp_path / "app/main.py").write_text(
+        "import os\nimport app.models\nfrom . import views\nfrom .db import session\n"
+    )
+    (tmp_path / "app/models.py").write_text("MODELS = 1\n")
+    (tmp_path / "app/views.py").write_text("VIEWS = 1\n")
+    (tmp_path / "app/db.py").write_text("def session(): ...\n")
+    return tmp_path
+
+
+def test_import_graph_resolves_local_imports(project):
+    graph = ImportGraph(".")
+    imports = graph.imports("app/main.py")
+
+    assert sorted(os.path.relpath(path) for path in imports) == [
+        "app/__init__.py",
+        "app/db.py",
+        "app/models.py",
+        "app/views.py",
+    ]
+
+
+def test_reading_a_module_prefetches_its_imports(project):
+    prefetcher = enable_prefetching(".")
+    before = file_cache.stats()
+    try:
+        TOOLS["read_file"]("app/main.py")
+        prefetcher.wait()
+        assert TOOLS["read_file"]("app/models.py") == "MODELS = 1\n"
+        assert TOOLS["read_file"]("app/db.py") == "def session(): ...\n"
+    finally:
+        disable_prefetching()
+
+    stats = file_cache.stats()
+    assert stats["prefetch_hits"] - before["prefetch_hits"] == 2
+    assert stats["hits"] - before["hits"] == 2
+
+
+def test_changed_files_are_read_again_and_budget_is_kept(tmp_path):
+    cache = FileCache(max_bytes=100)
+    path = tmp_path / "a.py"
+    path.write_text("x = 1\n")
+    assert cache.read(str(path)) == "x = 1\n"
+
+    path.write_text("x = 22\n")
+    assert cache.read(str(path)) == "x = 22\n"
+    assert cache.stats()["hits"] == 0
+
+    for i in range(5):
+        (tmp_path / f"{i}.py").write_text("y" * 40)
+        cache.read(str(tmp_path / f"{i}.py"))
+    assert cache.stats()["bytes"] <= 100
+
+
+def test_budget_counts_encoded_bytes(tmp_path):
+    cache = FileCache(max_bytes=100)
+    path = tmp_path / "a.py"
+    path.write_text("é" * 30, encoding="utf-8")
+    cache.read(str(path))
+
+    assert cache.stats()["bytes"] == 60
+
+
+def test_hit_rate_is_exported(tmp_path):
+    cache = FileCache()
+    path = tmp_path / "a.py"
+    path.write_text("x = 1\n")
+    for _ in range(4):
+        cache.read(str(path))
+
+    telemetry = TelemetryCollector()
+    telemetry.register_gauges("read_cache", cache.stats)
+
+    lines = telemetry.prometheus_text().splitlines()
+    assert "review_agent_read_cache_hit_rate 0.75" in lines
+    assert "review_agent_read_cache_prefetch_hits 0" in lines
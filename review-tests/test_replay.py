@@ -0,0 +1,64 @@
+"""Record a session against the mock Ollama and play it back"""
+
+import asyncio
+import time
+
+import pytest
+
+from ai.communication import OllamaApiClient, ReplayModel, SessionRecorder
+from ai.communication.replay import ReplayMismatchError
+from ai.agents.decisions import AgentDecision
+from ai.blobs import BlobStore
+from ai.message import MessageHistory
+from mock_ollama import MockOllamaServer, Reply
+
+
+async def _collect(stream) -> list:
+    return [chunk async for chunk in stream]
+
+
+def test_record_and_replay(tmp_path):
+    recording = str(tmp_path / "session.jsonl")
+    messages = [{"role": "user", "content": "Review main.py"}]
+    replies = [
+        Reply("Reading it now", Reply.tool("read_file", file_path="main.py").tool_calls)
+    ]
+
+    with MockOllamaServer(chat_replies=replies, tokens_per_second=200) as server:
+        recorder = SessionRecorder(recording)
+        client = OllamaApiClient(server.address, server.model, recorder=recorder)
+        recorded_chat = asyncio.run(_collect(client.chat(messages)))
+        recorded_gate = asyncio.run(
+            _collect(client.generate("Is this relevant?", structure=AgentDecision))
+        )
+        recorder.close()
+
+    replay = ReplayModel(recording, strict=True)
+    assert asyncio.run(_collect(replay.chat(messages))) == recorded_chat
+    assert asyncio.run(_collect(replay.generate("Is this relevant?"))) == recorded_gate
+
+    # Realtime replay keeps the recorded pacing, fast replay does not
+    started = time.perf_counter()
+    asyncio.run(_collect(ReplayModel(recording, realtime=True).chat(messages)))
+    assert time.perf_counter() - started >= 0.01
+
+    with pytest.raises(ReplayMismatchError):
+        asyncio.run(_collect(ReplayModel(recording, strict=True).chat([])))
+
+
+def test_strict_replay_of_a_history_in_the_blob_store(tmp_path):
+    recording = str(tmp_path / "session.jsonl")
+    messages = [{"role": "tool", "content": "x = 1\n" * 1000, "tool_calls": None}]
+
+    with MockOllamaServer(chat_replies=[Reply("Looks fine")]) as server:
+        recorder = SessionRecorder(recording)
+        client = OllamaApiClient(server.address, server.model, recorder=recorder)
+        recorded = asyncio.run(_collect(client.chat(messages)))
+        recorder.close()
+
+    store = BlobStore(str(tmp_path / "blobs"))
+    history = MessageHistory(messages, blobs=store)
+    assert history == messages and not history != messages
+
+    replay = ReplayModel(recording, strict=True)
+    assert asyncio.run(_collect(replay.chat(history))) == recorded
@@ -0,0 +1,28 @@
+"""The model is loaded once and stays resident across runs"""
+
+from ai.communication import OllamaApiClient
+from mock_ollama import MockOllamaServer
+
+
+def _loads(server: MockOllamaServer) -> int:
+    return sum(
+        1
+        for path, payload in server.requests
+        if path == "/api/generate" and not payload.get("prompt")
+    )
+
+
+def test_warm_up_only_loads_when_needed():
+    with MockOllamaServer() as server:
+        with OllamaApiClient(server.address, server.model) as client:
+            assert client.residency.wait_until_warm(timeout=5)
+        assert server.model in server.loaded_models
+
+        # A second run finds the model resident and does not load it again
+        with OllamaApiClient(server.address, server.model) as client:
+            assert client.residency.wait_until_warm(timeout=5)
+        assert _loads(server) == 1
+
+        with OllamaApiClient(server.address, server.model, unload_on_exit=True):
+            pass
+        assert server.model not in server.loaded_models
@@ -0,0 +1,84 @@
+"""Repeated deterministic requests are answered from disk"""
+
+import asyncio
+import os
+
+from ai.cancellation import StreamLimits
+from ai.communication import CachedModel, OllamaApiClient, ResponseCache
+from mock_ollama import MockOllamaServer, Reply
+
+MESSAGES = [{"role": "user", "content": "Review main.py"}]
+
+
+async def _collect(stream) -> list:
+    return [chunk async for chunk in stream]
+
+
+def _chats(server: MockOllamaServer, model: CachedModel, messages=MESSAGES) -> int:
+    chunks = asyncio.run(_collect(model.chat(messages, limits=StreamLimits())))
+    assert "".join(chunk.message.content for chunk in chunks) == "The code is fine"
+    return sum(path == "/api/chat" for path, _ in server.requests)
+
+
+def test_deterministic_answers_are_replayed(tmp_path):
+    with MockOllamaServer(chat_replies=[Reply("The code is fine")]) as server:
+        client = OllamaApiClient(server.address, server.model, seed=7)
+        model = CachedModel(client, ResponseCache(str(tmp_path)))
+
+        assert _chats(server, model) == 1
+        assert _chats(server, model) == 1
+        assert server.requests[-1][1]["options"]["seed"] == 7
+
+        # Anything that changes the answer is another entry
+        other = [{"role": "user", "content": "Review db/"}]
+        assert _chats(server, model, other) == 2
+
+        # Also across runs
+        model = CachedModel(client, ResponseCache(str(tmp_path)))
+        assert _chats(server, model) == 2
+        assert model.cache.stats()["hits"] == 1
+
+
+def test_nondeterministic_models_are_not_cached(tmp_path):
+    with MockOllamaServer(chat_replies=[Reply("The code is fine")]) as server:
+        cache = ResponseCache(str(tmp_path))
+        for client in (
+            OllamaApiClient(server.address, server.model),
+            OllamaApiClient(server.address, server.model, temperature=0.8, seed=7),
+        ):
+            model = CachedModel(client, cache)
+            assert not model.is_deterministic()
+            _chats(server, model)
+            _chats(server, model)
+
+        assert len(server.requests) == 4
+        assert os.listdir(tmp_path) == []
+
+
+def test_generate_is_cached(tmp_path):
+    with MockOllamaServer() as server:
+        client = OllamaApiClient(server.address, server.model, seed=1)
+        model = CachedModel(client, ResponseCache(str(tmp_path)))
+
+        first = asyncio.run(_collect(model.generate("Is this relevant?")))
+        second = asyncio.run(_collect(model.generate("Is this relevant?")))
+
+        assert first == second
+        assert len(server.requests) == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1000)
+    chunk = {"text": os.urandom(400).hex()}
+
+    cache.put("old", [chunk])
+    cache.put("used", [chunk])
+    os.utime(tmp_path / "old.z", ns=(1, 1))
+    os.utime(tmp_path / "used.z", ns=(2, 2))
+    assert cache.get("used") == [chunk]
+
+    cache.put("new", [chunk])
+
+    assert cache.get("old") is None
+    assert cache.get("used") == [chunk]
+    assert cache.size <= 1000
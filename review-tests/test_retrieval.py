@@ -0,0 +1,91 @@
+"""Chunking, incremental indexing and the semantic_search tool"""
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from ai.agents.coding_agent import CodeReviewAgent
+from ai.communication import OllamaApiClient
+from ai.communication.embeddings import OllamaEmbedder
+from ai.retrieval import EmbeddingIndex, chunk_python, set_index
+from ai.tool_definitions import generate_ollama_tools
+from tools import TOOLS
+
+SOURCE = '''import os
+
+
+@decorated
+def open_session():
+    """Opens a database session"""
+    return Session()
+
+
+class Repository:
+    table = "users"
+
+    def find_user(self, user_id):
+        return self.table
+
+    async def close_connection(self):
+        pass
+'''
+
+
+def test_chunks_follow_ast_boundaries():
+    chunks = chunk_python("repo.py", SOURCE)
+
+    assert [(chunk.name, chunk.start, chunk.end) for chunk in chunks] == [
+        ("repo.py", 1, 3),
+        ("open_session", 4, 7),
+        ("Repository", 10, 12),
+        ("Repository.find_user", 13, 14),
+        ("Repository.close_connection", 16, 17),
+    ]
+    assert chunks[1].text.startswith("@decorated")
+
+
+def test_search_and_incremental_updates(mock_ollama, tmp_path, monkeypatch):
+    (tmp_path / "repo.py").write_text(SOURCE)
+    (tmp_path / "notes.md").write_text("Deployment notes for the web server\n")
+    (tmp_path / ".env").write_text("PASSWORD=database session secret\n")
+    monkeypatch.chdir(tmp_path)
+
+    embedder = OllamaEmbedder(mock_ollama.address, batch_size=2)
+    index = EmbeddingIndex(str(tmp_path / "index"), embedder.embed)
+    assert index.update(".") == 6
+    assert all(".env" not in chunk["path"] for chunk in index.chunks)
+
+    score, best = index.search("where is the database session opened", top_k=2)[0]
+    assert best["name"] == "open_session"
+    assert 0 < score <= 1
+
+    # Only the changed chunk is embedded again, also after reopening
+    (tmp_path / "notes.md").write_text("Deployment notes for the proxy\n")
+    reopened = EmbeddingIndex(str(tmp_path / "index"), embedder.embed)
+    assert reopened.update(".") == 1
+    assert reopened.search("proxy", top_k=1)[0][1]["path"] == "notes.md"
+
+    set_index(reopened)
+    try:
+        result = TOOLS["semantic_search"]("close the connection", top_k=1)
+    finally:
+        set_index(None)
+    assert result.startswith("repo.py:16-17 Repository.close_connection")
+
+
+def test_search_is_only_offered_with_an_index(tmp_path):
+    def advertised() -> tuple[bool, bool]:
+        tools = generate_ollama_tools()
+        agent = CodeReviewAgent(OllamaApiClient("localhost:0", "none"), tools)
+        return (
+            any(tool.function.name == "semantic_search" for tool in tools),
+            "semantic_search" in agent.messages[0]["content"],
+        )
+
+    assert advertised() == (False, False)
+
+    set_index(EmbeddingIndex(str(tmp_path / "index"), lambda texts: []))
+    try:
+        assert advertised() == (True, True)
+    finally:
+        set_index(None)
@@ -0,0 +1,75 @@
+"""Priority and fairness of the shared request scheduler"""
+
+import asyncio
+
+from ai.communication import OllamaApiClient
+from ai.scheduler import Priority, RequestScheduler, use_priority
+from ai.telemetry import TelemetryCollector
+from mock_ollama import MockOllamaServer, Reply
+
+MESSAGES = [{"role": "user", "content": "Review main.py"}]
+
+
+async def _turn(model, order: list[str], name: str) -> None:
+    async for _ in model.chat(MESSAGES):
+        pass
+    order.append(name)
+
+
+def test_priority_classes_and_session_fairness():
+    scheduler = RequestScheduler(max_concurrency=1)
+    order: list[str] = []
+
+    with MockOllamaServer(
+        chat_replies=[Reply("ok " * 10)], tokens_per_second=100
+    ) as server:
+        client = OllamaApiClient(server.address, server.model)
+        batch_a = scheduler.client(client, "batch-a", Priority.BATCH)
+        batch_b = scheduler.client(client, "batch-b", Priority.BATCH)
+        interactive = scheduler.client(client, "ide", Priority.INTERACTIVE)
+
+        async def run() -> None:
+            # batch-a grabs the only slot, then everybody queues behind it
+            first = asyncio.create_task(_turn(batch_a, order, "a0"))
+            await asyncio.sleep(0.01)
+            tasks = [
+                asyncio.create_task(_turn(batch_a, order, f"a{i}")) for i in range(1, 4)
+            ]
+            tasks.append(asyncio.create_task(_turn(batch_b, order, "b1")))
+            await asyncio.sleep(0.01)
+            tasks.append(asyncio.create_task(_turn(interactive, order, "ide")))
+            await asyncio.sleep(0.01)
+
+            assert scheduler.queue_depth(Priority.BATCH) == 4
+            assert scheduler.queue_depth(Priority.INTERACTIVE) == 1
+            await asyncio.gather(first, *tasks)
+
+        asyncio.run(run())
+
+    # The interactive turn jumps the queue, batch sessions take turns
+    assert order == ["a0", "ide", "a1", "b1", "a2", "a3"]
+    metrics = scheduler.metrics()
+    assert metrics["running"] == 0
+    assert metrics["classes"]["batch"]["requests"] == 5
+    assert metrics["classes"]["batch"]["wait_seconds_max"] > 0
+
+
+def test_use_priority_overrides_the_session_priority():
+    scheduler = RequestScheduler()
+    model = scheduler.client(OllamaApiClient("localhost:0", "none"), "ide")
+
+    with use_priority(Priority.GATE):
+        assert model._priority() == Priority.GATE
+    assert model._priority() == Priority.INTERACTIVE
+
+
+def test_scheduler_gauges_are_exported():
+    scheduler = RequestScheduler()
+    telemetry = TelemetryCollector()
+    telemetry.register_gauges("scheduler", scheduler.gauges)
+
+    lines = telemetry.prometheus_text().splitlines()
+
+    assert "# TYPE review_agent_scheduler_batch_queue_depth gauge" in lines
+    assert "review_agent_scheduler_batch_queue_depth 0" in lines
+    assert "review_agent_scheduler_running 0" in lines
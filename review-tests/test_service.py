@@ -0,0 +1,122 @@
+"""The review service driven over HTTP against the mock model"""
+
+import asyncio
+import json
+
+import httpx
+
+from ai.communication import OllamaApiClient
+from ai.scheduler import Priority, RequestScheduler
+from ai.telemetry import TelemetryCollector
+from mock_ollama import MockOllamaServer, Reply
+from service.app import ReviewServer
+from service.jobs import JobManager
+
+
+async def _events(http: httpx.AsyncClient, job_id: str) -> list[tuple[str, dict]]:
+    events = []
+    async with http.stream("GET", f"/reviews/{job_id}/events") as response:
+        assert response.headers["content-type"] == "text/event-stream"
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line.removeprefix("event: ")
+            elif line.startswith("data: "):
+                events.append((event, json.loads(line.removeprefix("data: "))))
+    return events
+
+
+def test_sessions_run_concurrently_and_stream_their_progress():
+    with MockOllamaServer(chat_replies=[Reply("Nothing to review here.")]) as mock:
+        client = OllamaApiClient(mock.address, mock.model)
+
+        async def run() -> None:
+            jobs = JobManager(client, [], RequestScheduler(max_concurrency=2))
+            server = ReviewServer(jobs)
+            await server.start(port=0)
+
+            async with httpx.AsyncClient(
+                base_url=f"http://127.0.0.1:{server.port}"
+            ) as http:
+                created = [
+                    (await http.post("/reviews", json={"prompt": prompt})).json()
+                    for prompt in ("Review main.py", "Review db/")
+                ]
+                assert len({job["id"] for job in created}) == 2
+
+                for job in created:
+                    events = await _events(http, job["id"])
+                    assert ("content", {"text": "Nothing"}) in events
+                    assert events[-1] == (
+                        "status",
+                        {"status": "waiting_for_user", "error": None},
+                    )
+
+                job_id = created[0]["id"]
+                response = await http.post(
+                    f"/reviews/{job_id}/messages", json={"content": "Go on"}
+                )
+                assert response.status_code == 202
+                await _events(http, job_id)
+
+                summary = (await http.get(f"/reviews/{job_id}?messages=1")).json()
+                contents = [message["content"] for message in summary["messages"]]
+                assert "Go on" in contents
+
+                health = (await http.get("/health")).json()
+                assert health["jobs"] == 2
+                assert health["scheduler"]["running"] == 0
+
+                assert (await http.get("/reviews/unknown")).status_code == 404
+                assert (await http.post("/reviews", json={})).status_code == 400
+
+            await server.close()
+
+        asyncio.run(run())
+
+
+def test_finished_jobs_close_their_turn_and_expire():
+    telemetry = TelemetryCollector()
+    with MockOllamaServer(chat_replies=[Reply("Nothing to review here.")]) as mock:
+        client = OllamaApiClient(mock.address, mock.model, telemetry=telemetry)
+
+        async def run() -> None:
+            jobs = JobManager(client, [], RequestScheduler(), finished_ttl=0)
+            first = jobs.create("Review main.py", Priority.BATCH)
+            await first._task
+
+            # The job's last model request is accounted for right away
+            assert telemetry.turns and not telemetry._open_turns
+            assert jobs.jobs == {first.id: first}
+
+            second = jobs.create("Review db/", Priority.BATCH)
+            assert jobs.get(first.id) is None
+            await second._task
+
+        asyncio.run(run())
+
+
+def test_malformed_headers_are_bad_requests():
+    client = OllamaApiClient("localhost:0", "none")
+    server = ReviewServer(JobManager(client, [], RequestScheduler()))
+
+    async def send(request: bytes) -> bytes:
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response.split(b"\r\n", 1)[0]
+
+    async def run() -> list[bytes]:
+        await server.start(port=0)
+        try:
+            return [
+                await send(b"GET /health HTTP/1.1\r\nX-Name: \xff\xfe\r\n\r\n"),
+                await send(b"POST /reviews HTTP/1.1\r\nContent-Length: ten\r\n\r\n"),
+                await send(b"POST /reviews HTTP/1.1\r\nContent-Length: -1\r\n\r\n"),
+            ]
+        finally:
+            await server.close()
+
+    assert asyncio.run(run()) == [b"HTTP/1.1 400 Error"] * 3
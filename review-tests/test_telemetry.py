@@ -0,0 +1,76 @@
+"""Per-turn telemetry, its JSONL records and the Prometheus metrics"""
+
+import asyncio
+import json
+
+from ai.cancellation import StreamLimits
+from ai.communication import OllamaApiClient
+from ai.telemetry import TelemetryCollector
+from mock_ollama import MockOllamaServer, Reply
+
+MESSAGES = [{"role": "user", "content": "Review main.py"}]
+
+
+def _chat(reply: Reply, telemetry: TelemetryCollector, limits=None) -> list:
+    async def run(address: str, model: str) -> list:
+        client = OllamaApiClient(address, model, telemetry=telemetry)
+        return [chunk async for chunk in client.chat(MESSAGES, limits=limits)]
+
+    with MockOllamaServer(chat_replies=[reply]) as server:
+        chunks = asyncio.run(run(server.address, server.model))
+    telemetry.flush()
+    return chunks
+
+
+def test_turn_is_recorded(tmp_path):
+    jsonl = tmp_path / "telemetry.jsonl"
+    telemetry = TelemetryCollector(jsonl_path=str(jsonl))
+    # The mock reports 4 tokens in 4ms and 10 prompt tokens in 0.5s
+    reply = Reply(
+        "one two three four",
+        load_duration=2_000_000_000,
+        prompt_eval_duration=500_000_000,
+    )
+    _chat(reply, telemetry)
+
+    (record,) = [json.loads(line) for line in jsonl.read_text().splitlines()]
+    assert record["kind"] == "chat"
+    assert record["done_reason"] == "stop"
+    assert (record["eval_count"], record["prompt_eval_count"]) == (4, 10)
+    assert record["tokens_per_second"] == 1000
+    assert record["prompt_eval_rate"] == 20
+    assert 0 < record["time_to_first_token"] <= record["wall_time"]
+
+    lines = telemetry.prometheus_text().splitlines()
+    assert 'review_agent_turns_total{kind="chat"} 1' in lines
+    assert "review_agent_load_stalls_total 1" in lines
+    assert "review_agent_load_seconds_total 2.0" in lines
+    assert "review_agent_eval_tokens_total 4" in lines
+    assert "review_agent_tokens_per_second 1000.0" in lines
+    assert "review_agent_prompt_eval_tokens_per_second 20.0" in lines
+    assert "review_agent_time_to_first_token_seconds_count 1" in lines
+
+
+def test_short_loads_are_not_stalls():
+    telemetry = TelemetryCollector()
+    _chat(Reply("ok", load_duration=10_000_000), telemetry)
+
+    assert telemetry.load_stalls == 0
+    assert telemetry.turns == {"chat": 1}
+
+
+def test_turn_stopped_early(tmp_path):
+    jsonl = tmp_path / "telemetry.jsonl"
+    telemetry = TelemetryCollector(jsonl_path=str(jsonl))
+    _chat(
+        Reply("one two three four five six"),
+        telemetry,
+        limits=StreamLimits(max_tokens=2),
+    )
+
+    record = json.loads(jsonl.read_text())
+    assert record["done_reason"] == "stopped:max_tokens"
+    assert record["wall_time"] is not None
+    assert record["eval_count"] is None
+    assert telemetry.counters == {"stream_stopped_max_tokens": 1}
+    assert telemetry.last_tokens_per_second is None
@@ -0,0 +1,72 @@
+"""Tool arguments are validated and coerced before the tool runs"""
+
+import pytest
+
+from ai.agents.coding_agent import CodeReviewAgent
+from ai.communication import OllamaApiClient
+from ai.tool_definitions import (
+    ToolArgumentError,
+    ToolCall,
+    generate_ollama_tools,
+    validate_tool_arguments,
+)
+
+
+def test_safe_coercions():
+    arguments = validate_tool_arguments(
+        "explore_structure",
+        {"root_dir_path": ".", "depth": "2", "ignore_names": r"^\.git$"},
+    )
+    assert arguments == {"root_dir_path": ".", "depth": 2, "ignore_names": [r"^\.git$"]}
+
+    arguments = validate_tool_arguments(
+        "explore_structure", {"root_dir_path": ".", "ignore_names": '["a", "b"]'}
+    )
+    assert arguments["ignore_names"] == ["a", "b"]
+
+    arguments = validate_tool_arguments(
+        "update_todo", {"todo_id": "0", "new_status": "true"}
+    )
+    assert arguments == {"todo_id": 0, "new_status": True}
+
+
+def test_optional_parameters_written_with_a_bar_get_a_schema():
+    tools = {tool.function.name: tool.function for tool in generate_ollama_tools()}
+
+    # list[str] | None and str | None, not only Optional[...]
+    explore = tools["explore_structure"].parameters
+    assert explore["properties"]["ignore_names"]["type"] == "array"
+    assert explore["properties"]["ignore_names"]["items"] == {"type": "string"}
+    assert explore["required"] == ["root_dir_path"]
+    section = tools["write_review"].parameters["properties"]["section"]
+    assert section["type"] == "string"
+
+
+def test_precise_errors():
+    with pytest.raises(ToolArgumentError) as error:
+        validate_tool_arguments("update_todo", {"todo_id": "first", "status": True})
+
+    message = str(error.value)
+    assert "'todo_id'" in message
+    assert "'new_status' is required" in message
+    assert "'status' is not a parameter" in message
+
+
+def test_agent_rejects_bad_arguments_without_running_the_tool():
+    agent = CodeReviewAgent(OllamaApiClient("localhost:0", "none"), tools=[])
+    result = agent._call_tool(
+        ToolCall(
+            function={
+                "name": "write_todos",
+                "arguments": {"requirements": "Read main.py"},
+            }
+        )
+    )
+    assert result.is_ok()
+    assert [todo.requirement for todo in agent.todos] == ["Read main.py"]
+
+    result = agent._call_tool(
+        ToolCall(function={"name": "update_todo", "arguments": {"todo_id": 0}})
+    )
+    assert isinstance(result.get_err(), ToolArgumentError)
+    assert not agent.todos[0].is_complete
@@ -0,0 +1,98 @@
+"""Tools run while the model is still generating"""
+
+import asyncio
+
+from ai.agents.coding_agent import CodeReviewAgent
+from ai.cancellation import StreamLimits
+from ai.communication import OllamaApiClient
+from ai.tool_definitions import ToolCall, ToolCallFunction, ToolResult
+from ai.tool_dispatch import ToolDispatcher
+from mock_ollama import MockOllamaServer, Reply
+from tools import TOOLS
+from tools.todos import ToDoItem
+
+
+def _call(name: str) -> ToolCall:
+    return ToolCall(function=ToolCallFunction(name=name, arguments={}))
+
+
+def test_calls_run_in_order_of_arrival():
+    log = []
+
+    async def call(tool_call: ToolCall) -> ToolResult:
+        log.append(f"start {tool_call.function.name}")
+        # The first call is the slowest, the second must still wait for it
+        await asyncio.sleep(0.05 if tool_call.function.name == "slow" else 0)
+        log.append(f"end {tool_call.function.name}")
+        return ToolResult(ok=tool_call.function.name, err=None)
+
+    async def run() -> list[ToolResult]:
+        dispatcher = ToolDispatcher(call)
+        dispatcher.submit(_call("slow"))
+        dispatcher.submit(_call("fast"))
+        return await dispatcher.results()
+
+    results = asyncio.run(run())
+
+    assert [result.get_val() for result in results] == ["slow", "fast"]
+    assert log == ["start slow", "end slow", "start fast", "end fast"]
+
+
+def _agent(server: MockOllamaServer) -> CodeReviewAgent:
+    agent = CodeReviewAgent(OllamaApiClient(server.address, server.model), [])
+    agent.verbose = False
+    agent.todos_created = True
+    agent.todos.append(ToDoItem(requirement="Read main.py", is_complete=False))
+    agent.stream_limits = StreamLimits(stop_after_tool_call=False)
+    agent.add_user_message(
+        {"role": "user", "content": "Review", "images": None, "tool_calls": None}
+    )
+    return agent
+
+
+def test_tools_start_before_the_stream_ends(monkeypatch):
+    streamed = []
+    started_after = []
+
+    def read_file(file_path: str) -> str:
+        started_after.append(len(streamed))
+        return f"contents of {file_path}"
+
+    monkeypatch.setitem(TOOLS, "read_file", read_file)
+
+    reply = Reply.tool("read_file", file_path="main.py")
+    reply.trailing = " and then" * 20
+    with MockOllamaServer(chat_replies=[reply], tokens_per_second=200) as server:
+        agent = _agent(server)
+        agent.listeners.append(
+            lambda event, data: event == "content" and streamed.append(data)
+        )
+        asyncio.run(agent.invoke())
+
+    assert started_after[0] < len(streamed)
+    assert agent.messages[-2]["tool_calls"]
+    assert agent.messages[-1]["role"] == "tool"
+    assert "contents of main.py" in agent.messages[-1]["content"]
+
+
+def test_async_tools_are_awaited(monkeypatch):
+    async def read_file(file_path: str) -> str:
+        await asyncio.sleep(0)
+        return f"async contents of {file_path}"
+
+    monkeypatch.setitem(TOOLS, "read_file", read_file)
+
+    reply = Reply(
+        tool_calls=[
+            {"function": {"name": "read_file", "arguments": {"file_path": "a.py"}}},
+            {"function": {"name": "read_file", "arguments": {"file_path": "b.py"}}},
+        ]
+    )
+    with MockOllamaServer(chat_replies=[reply]) as server:
+        agent = _agent(server)
+        asyncio.run(agent.invoke())
+
+    assert [message["content"] for message in agent.messages[-2:]] == [
+        "async contents of a.py",
+        "async contents of b.py",
+    ]
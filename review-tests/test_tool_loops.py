@@ -0,0 +1,108 @@
+"""Repeated identical tool calls are answered from memory and cut short"""
+
+import asyncio
+
+from ai.agents.coding_agent import CodeReviewAgent
+from ai.communication import OllamaApiClient
+from ai.telemetry import TelemetryCollector
+from ai.tool_definitions import ToolResult
+from ai.tool_loops import ToolLoopDetector, call_key
+from mock_ollama import MockOllamaServer, Reply
+from program_state import ProgramState
+from tools import TOOLS
+from tools.todos import ToDoItem
+
+
+def test_arguments_are_normalized():
+    assert call_key("read_file", {"file_path": "./src/main.py"}) == call_key(
+        "read_file", {"file_path": "src//main.py "}
+    )
+    assert call_key("explore_structure", {"path": ".", "depth": 2}) == call_key(
+        "explore_structure", {"depth": 2, "path": ".", "ignore_names": None}
+    )
+    assert call_key("read_file", {"file_path": "a.py"}) != call_key(
+        "read_file", {"file_path": "b.py"}
+    )
+
+
+def test_repeats_get_the_cached_result_then_escalate():
+    detector = ToolLoopDetector(max_repeats=2)
+    arguments = {"file_path": "main.py"}
+    result = ToolResult(ok="print('hi')", err=None)
+
+    first = detector.check("read_file", arguments)
+    assert (first.repeats, first.cached, first.escalate) == (0, None, False)
+    detector.record("read_file", arguments, result)
+
+    second = detector.check("read_file", arguments)
+    assert (second.repeats, second.cached, second.escalate) == (1, result, False)
+    assert detector.check("read_file", arguments).escalate
+
+
+def test_writes_make_reading_again_legitimate():
+    detector = ToolLoopDetector()
+    arguments = {"file_path": "Review.md"}
+    detector.check("read_file", arguments)
+    detector.record("read_file", arguments, ToolResult(ok="old", err=None))
+
+    review = {"review": "new", "file_to_write": "Review.md"}
+    detector.check("write_review", review)
+    detector.record("write_review", review, ToolResult(ok=None, err=None))
+
+    assert detector.check("read_file", arguments).repeats == 0
+    # Writing the very same review again counts as a repeat, but is not skipped
+    again = detector.check("write_review", review)
+    assert (again.repeats, again.cached) == (1, None)
+
+
+def test_repeated_writes_still_run():
+    with MockOllamaServer(
+        chat_replies=[Reply.tool("remove_todo", todo_id=0)]
+    ) as server:
+        agent = CodeReviewAgent(OllamaApiClient(server.address, server.model), [])
+        agent.verbose = False
+        agent.todos_created = True
+        for requirement in ("Explore", "Read main.py", "Write the review"):
+            agent.todos.append(ToDoItem(requirement=requirement, is_complete=False))
+        agent.add_user_message(
+            {"role": "user", "content": "Review", "images": None, "tool_calls": None}
+        )
+
+        asyncio.run(agent.invoke())
+        asyncio.run(agent.invoke())
+
+    # Removing the first todo twice removes two todos
+    assert [todo.requirement for todo in agent.todos] == ["Write the review"]
+    assert "Make sure you are not repeating" in agent.messages[-1]["content"]
+
+
+def test_agent_stops_a_looping_model(monkeypatch):
+    reads = []
+
+    def read_file(file_path: str) -> str:
+        reads.append(file_path)
+        return "print('hi')"
+
+    monkeypatch.setitem(TOOLS, "read_file", read_file)
+
+    telemetry = TelemetryCollector()
+    with MockOllamaServer(
+        chat_replies=[Reply.tool("read_file", file_path="main.py")]
+    ) as server:
+        agent = CodeReviewAgent(
+            OllamaApiClient(server.address, server.model, telemetry=telemetry), []
+        )
+        agent.verbose = False
+        agent.todos_created = True
+        agent.todos.append(ToDoItem(requirement="Read main.py", is_complete=False))
+        agent.add_user_message(
+            {"role": "user", "content": "Review", "images": None, "tool_calls": None}
+        )
+
+        states = [asyncio.run(agent.invoke()) for _ in range(4)]
+
+    assert states == [ProgramState.AGENT_CONTROL] * 3 + [ProgramState.USER_CONTROL]
+    assert reads == ["main.py"]
+    assert "You already called read_file" in agent.messages[-1]["content"]
+    assert telemetry.counters["tool_loop_repeats"] == 3
+    assert telemetry.counters["tool_loop_escalations"] == 1
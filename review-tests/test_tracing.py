@@ -0,0 +1,71 @@
+"""Spans over a turn, exported as Chrome trace events"""
+
+import asyncio
+import json
+
+from ai import tracing
+from ai.agents.coding_agent import CodeReviewAgent
+from ai.communication import OllamaApiClient
+from ai.tracing import Tracer, span
+from mock_ollama import MockOllamaServer, Reply
+from tools.todos import ToDoItem
+
+
+def test_spans_are_free_when_tracing_is_off(monkeypatch):
+    monkeypatch.setattr(tracing, "_tracer", None)
+
+    assert span("chat") is span("tool", "tool", name="read_file")
+    with span("chat") as trace:
+        trace["parse_us"] = 10
+    assert dict(trace) == {}
+
+
+def test_agent_turn_is_traced(monkeypatch, large_tree, tmp_path):
+    tracer = Tracer()
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+
+    reply = Reply(
+        "Let me read it",
+        tool_calls=[
+            {"function": {"name": "read_file", "arguments": {"file_path": "main.py"}}}
+        ],
+    )
+    with MockOllamaServer(chat_replies=[reply]) as server:
+        agent = CodeReviewAgent(OllamaApiClient(server.address, server.model), [])
+        agent.verbose = False
+        agent.todos_created = True
+        agent.todos.append(ToDoItem(requirement="Read main.py", is_complete=False))
+        agent.add_user_message(
+            {"role": "user", "content": "Review", "images": None, "tool_calls": None}
+        )
+        asyncio.run(agent.invoke())
+
+    path = tmp_path / "trace.json"
+    tracer.export(str(path))
+    events = json.loads(path.read_text())["traceEvents"]
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+
+    assert set(spans) >= {
+        "invoke",
+        "chat",
+        "encode_body",
+        "http.connect",
+        "first_token",
+        "decode",
+        "read_file",
+        "tools.wait",
+        "tool_results",
+    }
+    assert spans["invoke"]["args"] == {"state": "AGENT_CONTROL"}
+    assert spans["chat"]["args"]["parse_us"] >= 0
+    assert spans["decode"]["args"]["chunks"] > 1
+    assert spans["read_file"]["cat"] == "tool"
+
+    # Nested spans lie within their parent
+    invoke = spans["invoke"]
+    for name in ("chat", "tool_results"):
+        assert invoke["ts"] <= spans[name]["ts"]
+        assert spans[name]["ts"] + spans[name]["dur"] <= invoke["ts"] + invoke["dur"]
+
+    tracks = {event["tid"] for event in events if event["ph"] == "M"}
+    assert {event["tid"] for event in spans.values()} <= tracks
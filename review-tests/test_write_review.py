@@ -0,0 +1,48 @@
+"""Sectioned, atomic and concurrent review writes"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tools.write_review import write_review
+
+
+def test_sections_are_replaced_and_appended(tmp_path):
+    review = tmp_path / "review.md"
+    write_review("# Review\n", str(review))
+    write_review("- global state", str(review), section="main.py")
+    write_review("- no index on chats", str(review), section="db/models.py")
+    write_review("- input() in a loop", str(review), section="main.py", mode="append")
+    write_review("- fixed", str(review), section="db/models.py")
+
+    assert review.read_text() == (
+        "# Review\n"
+        "<!-- section: main.py -->\n- global state\n- input() in a loop\n"
+        "<!-- /section: main.py -->\n"
+        "<!-- section: db/models.py -->\n- fixed\n<!-- /section: db/models.py -->\n"
+    )
+    # No temporary or lock files are left next to the review
+    assert [path.name for path in tmp_path.iterdir()] == ["review.md"]
+
+
+def test_concurrent_appends_are_all_kept(tmp_path):
+    review = str(tmp_path / "review.md")
+
+    def add(i: int) -> None:
+        write_review(
+            f"- finding {i}", review, section=f"file_{i % 4}.py", mode="append"
+        )
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(add, range(64)))
+
+    content = open(review).read()
+    assert all(f"- finding {i}\n" in content for i in range(64))
+    assert content.count("<!-- section: ") == 4
+
+
+def test_bad_arguments(tmp_path):
+    with pytest.raises(ValueError):
+        write_review("x", str(tmp_path / "review.md"), mode="prepend")
+    with pytest.raises(ValueError):
+        write_review("x", str(tmp_path / "review.md"), section="a -->")
@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import contextlib
+import os
+
+from ai.blobs import BlobStore, set_blob_store
+from ai.communication import OllamaApiClient, OllamaPool
+from ai.scheduler import RequestScheduler
+from ai.telemetry import TelemetryCollector
+from ai.tool_definitions import generate_ollama_tools
+from service.app import ReviewServer
+from service.jobs import JobManager
+
+
+async def serve(host: str, port: int, parallel: int) -> None:
+    telemetry = TelemetryCollector(
+        jsonl_path=os.getenv("TELEMETRY_JSONL", "telemetry.jsonl"),
+        prometheus_path=os.getenv("TELEMETRY_PROM"),
+    )
+
+    residency = {
+        "keep_alive": os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
+        "unload_on_exit": os.getenv("UNLOAD_ON_EXIT") == "1",
+    }
+
+    addresses = os.getenv("OLLAMA_HOSTS", "localhost:11434").split(",")
+    model = os.getenv("OLLAMA_MODEL", "qwen3:8b")
+    model_client = (
+        OllamaPool(addresses, model, telemetry=telemetry, **residency)
+        if len(addresses) > 1
+        else OllamaApiClient(addresses[0], model, telemetry=telemetry, **residency)
+    )
+
+    # Files the sessions read stay on disk, so the process does not grow with
+    # every session it hosts
+    blobs = None
+    if os.getenv("REVIEW_BLOBS", "1") == "1":
+        blobs = BlobStore(
+            os.getenv("REVIEW_BLOB_DIR"),
+            max_bytes=int(os.getenv("REVIEW_BLOB_MB", "1024")) * 1024 * 1024,
+        )
+        set_blob_store(blobs)
+        telemetry.register_gauges("blobs", blobs.stats)
+
+    # The model is loaded once and shared by every session
+    with (
+        model_client as client,
+        contextlib.closing(telemetry),
+        contextlib.closing(blobs) if blobs else contextlib.nullcontext(),
+    ):
+        scheduler = RequestScheduler(max_concurrency=parallel)
+        telemetry.register_gauges("scheduler", scheduler.gauges)
+
+        jobs = JobManager(
+            client,
+            generate_ollama_tools(),
+            scheduler,
+            finished_ttl=float(os.getenv("REVIEW_JOB_TTL", "3600")),
+        )
+        server = ReviewServer(jobs, telemetry)
+        await server.start(host, port)
+        print(f"Serving reviews on http://{host}:{server.port}")
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the review agent as a service")
+    parser.add_argument("--host", default=os.getenv("REVIEW_HOST", "127.0.0.1"))
+    parser.add_argument(
+        "--port", type=int, default=int(os.getenv("REVIEW_PORT", "8080"))
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=int(os.getenv("OLLAMA_NUM_PARALLEL", "1")),
+        help="Model requests that run at once, match it to the Ollama server",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.host, args.port, args.parallel))
@@ -0,0 +1,218 @@
+import asyncio
+import json
+import re
+from typing import Optional
+
+from ai.scheduler import Priority
+from ai.telemetry import TelemetryCollector
+from service.jobs import JobManager
+
+MAX_BODY_BYTES = 1_000_000
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class Request:
+    def __init__(self, method: str, path: str, headers: dict, body: bytes) -> None:
+        self.method = method
+        self.path, _, self.query = path.partition("?")
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> dict:
+        try:
+            data = json.loads(self.body or b"{}")
+        except json.JSONDecodeError as e:
+            raise HttpError(400, f"Invalid JSON body: {e}")
+        if not isinstance(data, dict):
+            raise HttpError(400, "The body must be a JSON object")
+        return data
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Optional[Request]:
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+
+    try:
+        method, path, _ = request_line.decode().split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        try:
+            name, _, value = line.decode().partition(":")
+        except UnicodeDecodeError:
+            raise HttpError(400, "Malformed header")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length")
+    if length < 0:
+        raise HttpError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "Request body too large")
+
+    body = await reader.readexactly(length) if length else b""
+    return Request(method, path, headers, body)
+
+
+def _response(status: int, body: bytes, content_type: str) -> bytes:
+    reason = {200: "OK", 201: "Created", 202: "Accepted"}.get(status, "Error")
+    return (
+        f"HTTP/1.1 {status} {reason}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode() + body
+
+
+def _json_response(status: int, data) -> bytes:
+    return _response(status, json.dumps(data).encode(), "application/json")
+
+
+class ReviewServer:
+    """
+    The review agent as a long running asyncio HTTP service.
+
+    POST   /reviews                 {"prompt": ..., "priority": "interactive"|"batch"}
+    GET    /reviews/{id}            status and todos (?messages=1 for the history)
+    GET    /reviews/{id}/events     progress as server-sent events
+    POST   /reviews/{id}/messages   {"content": ...} answers a session waiting on us
+    DELETE /reviews/{id}            cancels a session
+    GET    /health, GET /metrics
+    """
+
+    def __init__(
+        self,
+        jobs: JobManager,
+        telemetry: Optional[TelemetryCollector] = None,
+    ) -> None:
+        self.jobs = jobs
+        self.telemetry = telemetry
+        self._server: Optional[asyncio.Server] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+        self._server = await asyncio.start_server(self._handle, host, port)
+
+    @property
+    def port(self) -> int:
+        assert self._server, "Server is not running"
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        assert self._server, "Server is not running"
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request = await _read_request(reader)
+            if request:
+                await self._route(request, writer)
+        except HttpError as e:
+            writer.write(_json_response(e.status, {"error": str(e)}))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            writer.write(_json_response(500, {"error": str(e)}))
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _route(self, request: Request, writer: asyncio.StreamWriter) -> None:
+        route = (request.method, request.path)
+
+        if route == ("GET", "/health"):
+            writer.write(
+                _json_response(
+                    200,
+                    {
+                        "status": "ok",
+                        "jobs": len(self.jobs.jobs),
+                        "scheduler": self.jobs.scheduler.metrics(),
+                    },
+                )
+            )
+            return
+
+        if route == ("GET", "/metrics"):
+            text = self.telemetry.prometheus_text() if self.telemetry else ""
+            writer.write(_response(200, text.encode(), "text/plain; version=0.0.4"))
+            return
+
+        if route == ("POST", "/reviews"):
+            data = request.json()
+            if not isinstance(data.get("prompt"), str) or not data["prompt"]:
+                raise HttpError(400, "'prompt' is required")
+
+            try:
+                priority = Priority[data.get("priority", "interactive").upper()]
+            except KeyError:
+                raise HttpError(400, "Unknown priority")
+
+            job = self.jobs.create(data["prompt"], priority)
+            writer.write(_json_response(202, job.summary()))
+            return
+
+        match = re.fullmatch(r"/reviews/(\w+)(/events|/messages)?", request.path)
+        if not match:
+            raise HttpError(404, "Not found")
+
+        job = self.jobs.get(match.group(1))
+        if not job:
+            raise HttpError(404, "Unknown review")
+
+        action = (request.method, match.group(2))
+        if action == ("GET", None):
+            include_messages = "messages=1" in request.query
+            writer.write(_json_response(200, job.summary(include_messages)))
+        elif action == ("DELETE", None):
+            job.cancel()
+            writer.write(_json_response(202, job.summary()))
+        elif action == ("POST", "/messages"):
+            content = request.json().get("content")
+            if not isinstance(content, str) or not content:
+                raise HttpError(400, "'content' is required")
+            if not job.finished:
+                raise HttpError(409, "The review is still running")
+            job.reply(content)
+            writer.write(_json_response(202, job.summary()))
+        elif action == ("GET", "/events"):
+            await self._stream_events(job, writer)
+        else:
+            raise HttpError(405, "Method not allowed")
+
+    async def _stream_events(self, job, writer: asyncio.StreamWriter) -> None:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        await writer.drain()
+
+        async for record in job.subscribe():
+            writer.write(
+                f"event: {record['event']}\n"
+                f"data: {json.dumps(record['data'])}\n\n".encode()
+            )
+            await writer.drain()
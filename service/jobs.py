@@ -0,0 +1,174 @@
+import asyncio
+import time
+import uuid
+from enum import Enum
+from typing import Optional
+
+from ai.agents.coding_agent import CodeReviewAgent
+from ai.base_model import BaseAIModel
+from ai.scheduler import Priority, RequestScheduler
+from ai.tool_definitions import Tool
+from program_state import ProgramState
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    WAITING_FOR_USER = "waiting_for_user"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class ReviewJob:
+    """
+    One review session: its own agent (and so its own messages and todos),
+    the events it produced so far and the subscribers streaming them.
+    """
+
+    def __init__(self, job_id: str, agent: CodeReviewAgent, max_steps: int) -> None:
+        self.id = job_id
+        self.agent = agent
+        self.max_steps = max_steps
+        self.status = JobStatus.QUEUED
+        self.error: Optional[str] = None
+        self.events: list[dict] = []
+        # When the job last stopped running, for expiring it
+        self.finished_at: Optional[float] = None
+        self._subscribers: list[asyncio.Queue] = []
+        self._task: Optional[asyncio.Task] = None
+
+        agent.verbose = False
+        agent.listeners.append(self._on_agent_event)
+
+    @property
+    def finished(self) -> bool:
+        return self.status not in (JobStatus.QUEUED, JobStatus.RUNNING)
+
+    def _on_agent_event(self, event: str, data: dict) -> None:
+        self.publish(event, data)
+
+    def publish(self, event: str, data: dict) -> None:
+        record = {"event": event, "data": data}
+        self.events.append(record)
+        for queue in self._subscribers:
+            queue.put_nowait(record)
+
+    def _set_status(self, status: JobStatus) -> None:
+        self.status = status
+        self.finished_at = time.monotonic() if self.finished else None
+        self.publish("status", {"status": status.value, "error": self.error})
+
+    async def subscribe(self):
+        """Every event so far, then the new ones until the job stops running"""
+        queue: asyncio.Queue = asyncio.Queue()
+        for record in self.events:
+            queue.put_nowait(record)
+        self._subscribers.append(queue)
+
+        try:
+            while True:
+                if queue.empty() and self.finished:
+                    return
+                record = await queue.get()
+                yield record
+        finally:
+            self._subscribers.remove(queue)
+
+    def start(self, prompt: str) -> None:
+        self.agent.add_user_message(
+            {"role": "user", "content": prompt, "images": None, "tool_calls": None}
+        )
+        self.status = JobStatus.QUEUED
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        self._set_status(JobStatus.RUNNING)
+
+        try:
+            state = ProgramState.AGENT_CONTROL
+            for _ in range(self.max_steps):
+                state = await self.agent.invoke()
+                if state == ProgramState.USER_CONTROL:
+                    break
+
+            done = self.agent.todos_created and not self.agent._get_undone_todos()
+            self._set_status(JobStatus.DONE if done else JobStatus.WAITING_FOR_USER)
+        except asyncio.CancelledError:
+            self._set_status(JobStatus.CANCELLED)
+        except Exception as e:
+            self.error = str(e)
+            self._set_status(JobStatus.FAILED)
+        finally:
+            # Every run is a task of its own, its last turn would stay open
+            if self.agent.model.telemetry:
+                self.agent.model.telemetry.end_turn()
+
+    def reply(self, content: str) -> None:
+        """Continues a session that handed control back to the user"""
+        if not self.finished:
+            raise RuntimeError("The job is still running")
+        self.start(content)
+
+    def cancel(self) -> None:
+        self.agent.cancel("cancelled by the client")
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+    def summary(self, include_messages: bool = False) -> dict:
+        data = {
+            "id": self.id,
+            "status": self.status.value,
+            "error": self.error,
+            "todos": [todo.model_dump() for todo in self.agent.todos],
+            "message_count": len(self.agent.messages),
+        }
+        if include_messages:
+            data["messages"] = list(self.agent.messages)
+        return data
+
+
+class JobManager:
+    """Runs review sessions concurrently on one shared, warm model"""
+
+    def __init__(
+        self,
+        model: BaseAIModel,
+        tools: list[Tool],
+        scheduler: RequestScheduler,
+        max_steps: int = 100,
+        finished_ttl: float = 3600.0,
+    ) -> None:
+        self.model = model
+        self.tools = tools
+        self.scheduler = scheduler
+        self.max_steps = max_steps
+        # How long a finished job can still be read or replied to
+        self.finished_ttl = finished_ttl
+        self.jobs: dict[str, ReviewJob] = {}
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        for job_id, job in list(self.jobs.items()):
+            if (
+                job.finished_at is not None
+                and now - job.finished_at >= self.finished_ttl
+            ):
+                del self.jobs[job_id]
+                job.agent.close()
+
+    def create(self, prompt: str, priority: Priority) -> ReviewJob:
+        self._expire()
+        job_id = uuid.uuid4().hex[:12]
+        # Every job is its own scheduler session, so jobs get turns fairly
+        model = self.scheduler.client(self.model, job_id, priority)
+        job = ReviewJob(
+            job_id, CodeReviewAgent(model, tools=self.tools), self.max_steps
+        )
+        self.jobs[job.id] = job
+        job.start(prompt)
+        return job
+
+    def get(self, job_id: str) -> Optional[ReviewJob]:
+        self._expire()
+        return self.jobs.get(job_id)
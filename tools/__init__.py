@@ -5,6 +5,8 @@ from .write_review import write_review
 from .write_todos import write_todos
 from .update_todo import update_todo
 from .remove_todo import remove_todo
+from .read_more import read_more
+from .semantic_search import semantic_search
 
 _callables: list[Callable] = [
     explore_structure,
@@ -13,5 +15,7 @@ _callables: list[Callable] = [
     write_todos,
     update_todo,
     remove_todo,
+    read_more,
+    semantic_search,
 ]
 TOOLS = {func.__name__: func for func in _callables}
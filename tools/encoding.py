@@ -0,0 +1,219 @@
+"""
+Turns tool results into the text that goes into the conversation.
+
+Every token of a tool result is paid for again on every later turn, so each
+tool gets a compact encoding, and anything over the budget is split into
+pages the model can fetch with read_more. The pages belong to the session
+(its agent's PageStore): sessions neither evict nor read each other's.
+"""
+
+import difflib
+import os
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from pydantic import BaseModel
+
+from tools.schemas import Directory
+
+DEFAULT_TOKEN_BUDGET = 2000
+MAX_STORED_RESULTS = 32
+# Room left on every page for the read_more pointer, so a page and its pointer
+# still fit the budget and read_more's own result is never paged again
+PAGE_FOOTER_CHARS = 96
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly four characters per token, good enough for budgeting"""
+    return (len(text) + 3) // 4
+
+
+@dataclass
+class EncodedOutput:
+    text: str
+    tokens: int
+    truncated: bool = False
+    handle: Optional[str] = None
+
+
+def encode_directory(directory: Directory) -> str:
+    """
+    An indented tree relative to the explored root, directories end in "/".
+    Full paths, names, extensions and sizes are all implied by the tree.
+    """
+    root = os.path.relpath(directory.root_file_path) + "/"
+    lines = [root]
+
+    def walk(node: Directory, indent: str) -> None:
+        for child in node.children:
+            lines.append(f"{indent}{os.path.basename(child.root_file_path)}/")
+            walk(child, indent + "  ")
+        for file in node.files:
+            lines.append(f"{indent}{file.file_name}")
+
+    walk(directory, "  ")
+    return "\n".join(lines)
+
+
+def encode_default(value: Any) -> str:
+    if isinstance(value, BaseModel):
+        return value.model_dump_json()
+    return str(value)
+
+
+ENCODERS: dict[str, Callable[[Any], str]] = {
+    "explore_structure": encode_directory,
+}
+
+
+def _split_pages(text: str, budget: int) -> list[str]:
+    """Splits on line boundaries, a single huge line is cut where it has to be"""
+    max_chars = max(budget * 4 - PAGE_FOOTER_CHARS, 1)
+    pages: list[str] = []
+    current = ""
+
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                pages.append(current)
+                current = ""
+            pages.append(line[:max_chars])
+            line = line[max_chars:]
+
+        if len(current) + len(line) > max_chars:
+            pages.append(current)
+            current = ""
+        current += line
+
+    if current:
+        pages.append(current)
+    return pages
+
+
+def _page_text(handle: str, pages: list[str], page: int) -> str:
+    text = pages[page]
+    if page + 1 < len(pages):
+        text += (
+            f"\n[page {page + 1} of {len(pages)}, "
+            f'call read_more(handle="{handle}", page={page + 1}) for the next one]'
+        )
+    return text
+
+
+class PageStore:
+    """The results of one session that did not fit, by handle, oldest first"""
+
+    def __init__(self, max_results: int = MAX_STORED_RESULTS) -> None:
+        self.max_results = max_results
+        self._pages: OrderedDict[str, list[str]] = OrderedDict()
+
+    def put(self, pages: list[str]) -> str:
+        handle = uuid.uuid4().hex[:8]
+        self._pages[handle] = pages
+        if len(self._pages) > self.max_results:
+            self._pages.popitem(last=False)
+        return handle
+
+    def get(self, handle: str, page: int) -> str:
+        pages = self._pages.get(handle)
+        if pages is None:
+            raise KeyError(f"Unknown or expired handle: {handle}")
+        if not 0 <= page < len(pages):
+            raise IndexError(f"Page {page} out of range, there are {len(pages)} pages")
+
+        self._pages.move_to_end(handle)
+        return _page_text(handle, pages, page)
+
+    def to_dict(self) -> dict[str, list[str]]:
+        """For checkpoints: the history refers to the handles"""
+        return dict(self._pages)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, list[str]]) -> "PageStore":
+        store = cls()
+        for handle, pages in data.items():
+            store._pages[handle] = pages
+        while len(store._pages) > store.max_results:
+            store._pages.popitem(last=False)
+        return store
+
+
+def paginate(
+    text: str, pages: PageStore, budget: int = DEFAULT_TOKEN_BUDGET
+) -> EncodedOutput:
+    tokens = estimate_tokens(text)
+    if tokens <= budget:
+        return EncodedOutput(text, tokens)
+
+    split = _split_pages(text, budget)
+    handle = pages.put(split)
+
+    first = _page_text(handle, split, 0)
+    return EncodedOutput(first, estimate_tokens(first), truncated=True, handle=handle)
+
+
+def encode_tool_result(
+    tool_name: str,
+    value: Any,
+    budget: int = DEFAULT_TOKEN_BUDGET,
+    *,
+    pages: PageStore,
+) -> EncodedOutput:
+    encoder = ENCODERS.get(tool_name, encode_default)
+    return paginate(encoder(value), pages, budget)
+
+
+class FileReadLedger:
+    """
+    Remembers what read_file already put into the conversation.
+
+    Reading a file again adds a one line stub when it did not change, or just
+    the diff when it did. The earlier copy is left where it is, rewriting it
+    would throw away the server's cached prompt from that point on.
+    """
+
+    def __init__(self) -> None:
+        self._contents: dict[str, str] = {}
+        self.saved_chars = 0
+
+    def to_dict(self) -> dict:
+        return {"contents": self._contents, "saved_chars": self.saved_chars}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FileReadLedger":
+        ledger = cls()
+        ledger._contents = dict(data["contents"])
+        ledger.saved_chars = data["saved_chars"]
+        return ledger
+
+    def forget(self, file_path: str) -> None:
+        """The last read of file_path did not make it into the conversation whole"""
+        self._contents.pop(os.path.normpath(file_path), None)
+
+    def encode(self, file_path: str, content: str) -> str:
+        path = os.path.normpath(file_path)
+        previous = self._contents.get(path)
+        self._contents[path] = content
+
+        if previous is None:
+            return content
+
+        if previous == content:
+            self.saved_chars += len(content)
+            return f"[{path} is unchanged since you last read it above]"
+
+        diff = "".join(
+            difflib.unified_diff(
+                previous.splitlines(keepends=True),
+                content.splitlines(keepends=True),
+                f"{path} (last read)",
+                f"{path} (now)",
+            )
+        )
+        if len(diff) >= len(content):
+            return content
+
+        self.saved_chars += len(content) - len(diff)
+        return f"[{path} changed since you last read it, unified diff:]\n{diff}"
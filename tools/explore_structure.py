@@ -1,5 +1,5 @@
 import os
-import re
+from tools.ignore import IgnoreMatcher
 from tools.schemas import Directory, File
 
 
@@ -27,14 +27,13 @@ def explore_structure(
 
     root_dir_path = validate_safe_path(root_dir_path)
 
-    # Initialize ignore patterns
-    ignore_patterns = []
-    if ignore_names:
-        ignore_patterns = [re.compile(pattern) for pattern in ignore_names]
+    # Compiled once for the whole walk, .gitignore files are read on the way
+    matcher = IgnoreMatcher(ignore_names)
+    matcher.enter(root_dir_path)
+    return _explore(root_dir_path, depth, matcher)
 
-    def should_ignore(name: str) -> bool:
-        return any(pattern.search(name) for pattern in ignore_patterns)
 
+def _explore(root_dir_path: str, depth: int, matcher: IgnoreMatcher) -> Directory:
     directory = Directory(root_file_path=root_dir_path, files=[], children=[])
 
     try:
@@ -42,8 +41,9 @@ def explore_structure(
         entries = sorted(os.scandir(root_dir_path), key=lambda e: e.name)
 
         for entry in entries:
-            # Skip entries that match ignore patterns
-            if should_ignore(entry.name):
+            is_dir = entry.is_dir()
+            # Ignored directories are pruned before they are ever scanned
+            if matcher.is_ignored(entry.path, is_dir):
                 continue
             if entry.is_file():
                 try:
@@ -58,9 +58,10 @@ def explore_structure(
                 except OSError:
                     # Skip files we cannot access
                     continue
-            elif entry.is_dir():
+            elif is_dir:
                 if depth > 0:
-                    child_dir = explore_structure(entry.path, depth - 1, ignore_names)
+                    matcher.enter(entry.path)
+                    child_dir = _explore(entry.path, depth - 1, matcher)
                     directory.children.append(child_dir)
 
     except OSError:
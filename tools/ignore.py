@@ -0,0 +1,165 @@
+"""
+Decides which entries a directory walk skips.
+
+User patterns are regexes on entry names, merged into one alternation so each
+entry is tested once. .gitignore files are honoured with git's semantics
+(anchoring, directory only rules, negation, **), nested ones included, and an
+ignored directory is pruned as a whole: it is never scanned.
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+# Never worth walking into, whatever .gitignore says
+ALWAYS_IGNORED = {".git", "__pycache__", "node_modules", ".venv", "venv"}
+
+
+@dataclass(frozen=True)
+class GitignoreRule:
+    regex: re.Pattern
+    negated: bool
+    directory_only: bool
+    # Directory of the .gitignore relative to the walk root, "" for the root
+    base: str
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        if self.directory_only and not is_dir:
+            return False
+
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return False
+            rel_path = rel_path[len(self.base) + 1 :]
+
+        return self.regex.match(rel_path) is not None
+
+
+def _translate_glob(glob: str) -> str:
+    regex = ""
+    i = 0
+    while i < len(glob):
+        char = glob[i]
+        if glob.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if glob.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "\\" and i + 1 < len(glob):
+            i += 1
+            regex += re.escape(glob[i])
+        elif char == "[" and (end := glob.find("]", i + 2)) != -1:
+            content = glob[i + 1 : end]
+            if content.startswith("!"):
+                content = "^" + content[1:]
+            regex += f"[{content}]"
+            i = end
+        else:
+            regex += re.escape(char)
+        i += 1
+
+    return regex
+
+
+def parse_gitignore(text: str, base: str = "") -> list[GitignoreRule]:
+    rules = []
+
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+        if line.startswith("\\"):
+            line = line[1:]
+
+        directory_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+
+        # A slash anywhere but the end anchors the pattern to the .gitignore
+        anchored = "/" in line
+        pattern = _translate_glob(line.lstrip("/"))
+        if not anchored:
+            pattern = "(?:.*/)?" + pattern
+
+        rules.append(
+            GitignoreRule(re.compile(pattern + "$"), negated, directory_only, base)
+        )
+
+    return rules
+
+
+class IgnoreMatcher:
+    def __init__(
+        self,
+        ignore_names: Optional[list[str]] = None,
+        use_gitignore: bool = True,
+        root: str = ".",
+    ) -> None:
+        self.root = os.path.abspath(root)
+        self.use_gitignore = use_gitignore
+        self.rules: list[GitignoreRule] = []
+        self._loaded: set[str] = set()
+
+        self.names: Optional[re.Pattern] = None
+        if ignore_names:
+            try:
+                self.names = re.compile(
+                    "|".join(f"(?:{pattern})" for pattern in ignore_names)
+                )
+            except re.error as e:
+                raise ValueError(f"Invalid ignore_names pattern: {e}")
+
+    def _relative(self, path: str) -> str:
+        rel_path = os.path.relpath(os.path.abspath(path), self.root)
+        return "" if rel_path == "." else rel_path.replace(os.sep, "/")
+
+    def enter(self, directory: str) -> None:
+        """
+        Loads the .gitignore of directory, and of every directory between it
+        and the root, before its entries are tested
+        """
+        if not self.use_gitignore:
+            return
+
+        rel_dir = self._relative(directory)
+        parts = rel_dir.split("/") if rel_dir else []
+        for depth in range(len(parts) + 1):
+            base = "/".join(parts[:depth])
+            if base in self._loaded:
+                continue
+            self._loaded.add(base)
+
+            try:
+                with open(os.path.join(self.root, base, ".gitignore")) as f:
+                    self.rules.extend(parse_gitignore(f.read(), base))
+            except (OSError, UnicodeDecodeError):
+                pass
+
+    def is_ignored(self, path: str, is_dir: bool) -> bool:
+        name = os.path.basename(path)
+        if is_dir and name in ALWAYS_IGNORED:
+            return True
+        if self.names and self.names.search(name):
+            return True
+
+        rel_path = self._relative(path)
+        ignored = False
+        # The last matching rule wins, so a later ! rule can re-include
+        for rule in self.rules:
+            if rule.negated == ignored and rule.matches(rel_path, is_dir):
+                ignored = not rule.negated
+        return ignored
@@ -0,0 +1,251 @@
+"""
+A cache for read_file, and a prefetcher that fills it ahead of the agent.
+
+After a module is read, the agent very often reads its imports next. The
+prefetcher resolves a file's local imports (through a cached import graph) and
+loads them into the cache on a background thread, so the next read_file is a
+stat and a dictionary lookup.
+"""
+
+import ast
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_for
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class _Entry:
+    version: tuple[int, int]
+    content: str
+    prefetched: bool
+    # UTF-8 size, what the content takes up is closer to this than to len()
+    size: int
+
+
+def _version(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class FileCache:
+    """
+    File contents by path, least recently used out first once max_bytes is
+    reached. An entry is only served while the file's mtime and size match.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.prefetch_hits = 0
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read(self, file_path: str) -> str:
+        path = os.path.abspath(file_path)
+        version = _version(path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry.version == version:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                if entry.prefetched:
+                    self.prefetch_hits += 1
+                    entry.prefetched = False
+                return entry.content
+            self.misses += 1
+
+        with open(path, "r") as f:
+            content = f.read()
+        self._store(path, version, content, prefetched=False)
+        return content
+
+    def warm(self, file_path: str, max_file_bytes: int = 1024 * 1024) -> bool:
+        """Loads a file ahead of time, returns whether it did"""
+        path = os.path.abspath(file_path)
+        try:
+            version = _version(path)
+            with self._lock:
+                entry = self._entries.get(path)
+                if entry and entry.version == version:
+                    return False
+            # Don't let one huge file push out everything that was read
+            if version[1] > min(max_file_bytes, self.max_bytes // 4):
+                return False
+
+            with open(path, "r") as f:
+                content = f.read()
+        except (OSError, UnicodeDecodeError):
+            return False
+
+        self._store(path, version, content, prefetched=True)
+        with self._lock:
+            self.prefetched += 1
+        return True
+
+    def _store(
+        self, path: str, version: tuple[int, int], content: str, prefetched: bool
+    ) -> None:
+        with self._lock:
+            if old := self._entries.pop(path, None):
+                self.size -= old.size
+
+            entry = _Entry(version, content, prefetched, len(content.encode()))
+            self._entries[path] = entry
+            self.size += entry.size
+
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+
+    def stats(self) -> dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "prefetched": self.prefetched,
+                "prefetch_hits": self.prefetch_hits,
+                "bytes": self.size,
+            }
+
+
+class ImportGraph:
+    """The project files each Python file imports, cached per file version"""
+
+    def __init__(self, root: str = ".") -> None:
+        self.root = os.path.abspath(root)
+        self._imports: dict[str, tuple[tuple[int, int], list[str]]] = {}
+        self._lock = threading.Lock()
+
+    def _module_file(self, module: str) -> Optional[str]:
+        base = os.path.join(self.root, *module.split("."))
+        for candidate in (base + ".py", os.path.join(base, "__init__.py")):
+            if os.path.isfile(candidate):
+                return candidate
+        return None
+
+    def _package_of(self, path: str, level: int) -> str:
+        directory = os.path.dirname(path)
+        for _ in range(level - 1):
+            directory = os.path.dirname(directory)
+        return os.path.relpath(directory, self.root).replace(os.sep, ".")
+
+    def _resolve(self, path: str, source: str) -> list[str]:
+        try:
+            tree = ast.parse(source)
+        except SyntaxError:
+            return []
+
+        modules: list[str] = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                base = node.module or ""
+                if node.level:
+                    package = self._package_of(path, node.level)
+                    base = ".".join(
+                        part for part in (package, base) if part and part != "."
+                    )
+                modules.append(base)
+                # from package import module
+                modules.extend(f"{base}.{alias.name}" for alias in node.names)
+
+        files = []
+        for module in modules:
+            if module and (file := self._module_file(module)) and file != path:
+                if file not in files:
+                    files.append(file)
+        return files
+
+    def imports(self, file_path: str, source: Optional[str] = None) -> list[str]:
+        path = os.path.abspath(file_path)
+        if not path.endswith(".py"):
+            return []
+
+        try:
+            version = _version(path)
+        except OSError:
+            return []
+
+        with self._lock:
+            cached = self._imports.get(path)
+            if cached and cached[0] == version:
+                return cached[1]
+
+        if source is None:
+            try:
+                with open(path) as f:
+                    source = f.read()
+            except (OSError, UnicodeDecodeError):
+                return []
+
+        files = self._resolve(path, source)
+        with self._lock:
+            self._imports[path] = (version, files)
+        return files
+
+
+class Prefetcher:
+    """Warms the cache with a file's local imports as soon as it is read"""
+
+    def __init__(self, cache: FileCache, graph: ImportGraph, workers: int = 2) -> None:
+        self.cache = cache
+        self.graph = graph
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="prefetch")
+        # Done callbacks remove futures from worker threads
+        self._pending: set[Future] = set()
+        self._lock = threading.Lock()
+
+    def on_read(self, file_path: str, content: str) -> None:
+        future = self._pool.submit(self._prefetch, file_path, content)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+
+    def _prefetch(self, file_path: str, content: str) -> None:
+        for path in self.graph.imports(file_path, content):
+            self.cache.warm(path)
+
+    def wait(self) -> None:
+        """Blocks until the prefetches submitted so far are done"""
+        with self._lock:
+            pending = list(self._pending)
+        wait_for(pending)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+file_cache = FileCache()
+_prefetcher: Optional[Prefetcher] = None
+
+
+def enable_prefetching(root: str = ".", workers: int = 2) -> Prefetcher:
+    global _prefetcher
+    _prefetcher = Prefetcher(file_cache, ImportGraph(root), workers)
+    return _prefetcher
+
+
+def disable_prefetching() -> None:
+    global _prefetcher
+    if _prefetcher:
+        _prefetcher.close()
+    _prefetcher = None
+
+
+def get_prefetcher() -> Optional[Prefetcher]:
+    return _prefetcher
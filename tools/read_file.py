@@ -1,25 +1,34 @@
 import os
 from typing import NoReturn
 
+from tools.read_cache import file_cache, get_prefetcher
+
 
 class SecurityError(Exception):
     pass
 
 
+FORBIDDEN_PATTERNS = [".env", "secret", "password", "credential", "private_key"]
+
+
+def is_sensitive(file_path: str) -> bool:
+    normalized_path = os.path.normpath(file_path)
+    return any(pattern in normalized_path.lower() for pattern in FORBIDDEN_PATTERNS)
+
+
 def read_file(file_path: str) -> str:
     """
     Reads the file data and outputs the content of the file
     The file path passed should be the relative file path to the project
     """
     # Security check
-    normalized_path = os.path.normpath(file_path)
-    FORBIDDEN_PATTERNS = [".env", "secret", "password", "credential", "private_key"]
-
-    if any(pattern in normalized_path.lower() for pattern in FORBIDDEN_PATTERNS):
+    if is_sensitive(file_path):
         raise SecurityError(f"Access denied: Cannot read sensitive file {file_path}")
 
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
 
-    with open(file_path, "r") as f:
-        return f.read()
+    content = file_cache.read(file_path)
+    if prefetcher := get_prefetcher():
+        prefetcher.on_read(file_path, content)
+    return content
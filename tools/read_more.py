@@ -0,0 +1,7 @@
+def read_more(handle: str, page: int) -> str:
+    """
+    Returns another page of a tool result that was too long to show at once.
+    Use the handle and page number given at the end of the truncated result.
+    """
+    # Implementation is handled by the agent, the pages belong to its session
+    raise NotImplementedError
@@ -0,0 +1,22 @@
+def semantic_search(query: str, top_k: int = 5) -> str:
+    """
+    Finds the functions, classes and other code most related to a concern,
+    e.g. "where are database sessions opened and closed". Use it before
+    reading files one by one.
+    """
+    # Imported here, the index module itself depends on the tools package
+    from ai.retrieval import get_index
+
+    index = get_index()
+    if index is None:
+        raise RuntimeError("Semantic search is not enabled for this session")
+
+    results = []
+    for score, chunk in index.search(query, top_k):
+        preview = "\n".join(chunk["text"].splitlines()[:3])
+        results.append(
+            f"{chunk['path']}:{chunk['start']}-{chunk['end']} {chunk['name']} "
+            f"(score {score:.2f})\n{preview}"
+        )
+
+    return "\n\n".join(results) or "Nothing found, the index is empty"
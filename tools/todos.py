@@ -1,6 +1,8 @@
+import time
 from pydantic import BaseModel
 
-from ai.tool_definitions import Tool, ToolCall, ToolResult
+from ai.tool_definitions import Tool, ToolCall, ToolResult, validate_tool_arguments
+from ai.tracing import span
 from typing import TYPE_CHECKING, List
 
 if TYPE_CHECKING:
@@ -42,12 +44,19 @@ class SupportsToDoMixin:
 
         if has_tool:
             method = getattr(self, tool_call.function.name)
+            started = time.perf_counter()
             try:
-                # Methods are already bound, just unpack arguments
-                result = method(**tool_call.function.arguments)
+                with span(tool_call.function.name, "tool"):
+                    arguments = validate_tool_arguments(
+                        tool_call.function.name, tool_call.function.arguments
+                    )
+                    # Methods are already bound, just unpack arguments
+                    result = method(**arguments)
                 return ToolResult(ok=result, err=None)
             except Exception as e:
                 return ToolResult(ok=None, err=e)
+            finally:
+                getattr(self, "_record_tool_time")(tool_call.function.name, started)
 
         # Call parent class _call_tool for non-todo tools
         # First, check if we have a parent class with _call_tool method
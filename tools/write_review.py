@@ -1,3 +1,113 @@
-def write_review(review: str, file_to_write: str) -> None:
-    with open(file_to_write, "w") as f:
-        f.write(review)
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_SECTION = re.compile(
+    r"<!-- section: (?P<key>.+?) -->\n(?P<body>.*?)<!-- /section: (?P=key) -->\n",
+    re.DOTALL,
+)
+# Without fcntl, writers are at least serialized inside this process
+_local_lock = threading.Lock()
+
+
+def _lock_path(file_to_write: str) -> str:
+    """In the temp directory, not next to the review in the repository"""
+    digest = hashlib.sha1(os.path.realpath(file_to_write).encode()).hexdigest()
+    return os.path.join(tempfile.gettempdir(), f"review-{digest[:16]}.lock")
+
+
+@contextmanager
+def _locked(file_to_write: str):
+    """Serializes read-modify-write cycles between threads and processes"""
+    with _local_lock:
+        if fcntl is None:
+            yield
+            return
+
+        # Left behind on purpose, removing it would race with a waiting writer
+        with open(_lock_path(file_to_write), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _atomic_write(file_to_write: str, content: str) -> None:
+    directory = os.path.dirname(os.path.abspath(file_to_write))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        # mkstemp creates the file private, keep the review's usual mode
+        mode = (
+            os.stat(file_to_write).st_mode if os.path.exists(file_to_write) else 0o644
+        )
+        os.chmod(temp_path, mode & 0o777)
+        os.replace(temp_path, file_to_write)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _merge_section(document: str, section: str, review: str, mode: str) -> str:
+    if not review.endswith("\n"):
+        review += "\n"
+
+    for match in _SECTION.finditer(document):
+        if match.group("key") != section:
+            continue
+
+        body = match.group("body") + review if mode == "append" else review
+        replacement = (
+            f"<!-- section: {section} -->\n{body}<!-- /section: {section} -->\n"
+        )
+        return document[: match.start()] + replacement + document[match.end() :]
+
+    if document and not document.endswith("\n"):
+        document += "\n"
+    return (
+        document
+        + f"<!-- section: {section} -->\n{review}<!-- /section: {section} -->\n"
+    )
+
+
+def write_review(
+    review: str,
+    file_to_write: str,
+    section: str | None = None,
+    mode: str = "replace",
+) -> None:
+    """
+    Writes the review. With a section, only that section of the file is
+    written: mode "replace" rewrites the section, "append" adds the review to
+    its end, a new section is added at the end of the file. Prefer one section
+    per file or topic and append new findings instead of rewriting everything.
+    """
+    if mode not in ("replace", "append"):
+        raise ValueError(f"Unknown mode '{mode}', use 'replace' or 'append'")
+    if section is not None and ("\n" in section or "-->" in section):
+        raise ValueError("A section name must be a single line without '-->'")
+
+    with _locked(file_to_write):
+        if section is None:
+            if mode == "append" and os.path.exists(file_to_write):
+                with open(file_to_write) as f:
+                    review = f.read() + review
+            _atomic_write(file_to_write, review)
+            return
+
+        document = ""
+        if os.path.exists(file_to_write):
+            with open(file_to_write) as f:
+                document = f.read()
+
+        _atomic_write(file_to_write, _merge_section(document, section, review, mode))